@@ -23,7 +23,9 @@ from channels.auth import AuthMiddlewareStack
 from channels.routing import ProtocolTypeRouter, URLRouter
 from channels.security.websocket import OriginValidator, AllowedHostsOriginValidator
 from django.core.asgi import get_asgi_application
+from config.websocket_config import WebSocketAuthMiddleware
 from feedbacks import routing
+from video_planning import websocket_routing as video_planning_routing
 
 django_asgi_app = get_asgi_application()
 
@@ -32,7 +34,9 @@ application = ProtocolTypeRouter(
         "websocket": OriginValidator(
             AuthMiddlewareStack(
                 # URLRouter  ,    HTTP path 
-                URLRouter(routing.websocket_urlpatterns)
+                WebSocketAuthMiddleware(
+                    URLRouter(routing.websocket_urlpatterns + video_planning_routing.websocket_urlpatterns)
+                )
             ),
             [
                 ".localhost",
@@ -18,7 +18,34 @@ app.autodiscover_tasks()
 
 # Configure task routing
 app.conf.task_routes = {
+    # Scheduler ticks, upload assembly and cleanup must not wait behind
+    # multi-hour encodes on video_processing
+    'feedbacks.tasks.dispatch_video_jobs': {'queue': 'video_control'},
+    'feedbacks.tasks.assemble_chunked_upload': {'queue': 'video_control'},
+    'feedbacks.tasks.cleanup_expired_uploads': {'queue': 'video_control'},
+    'feedbacks.tasks.check_video_processing_status': {'queue': 'video_control'},
     'feedbacks.tasks.*': {'queue': 'video_processing'},
+    'video_planning.tasks.*': {'queue': 'storyboard_images'},
+}
+
+# Message priorities (0 first) for feedbacks.scheduler; one long job per
+# worker process at a time so a queued short clip is not stuck behind it
+app.conf.broker_transport_options = {
+    'priority_steps': list(range(10)),
+    'queue_order_strategy': 'priority',
+}
+app.conf.worker_prefetch_multiplier = 1
+
+# Periodic tasks (requires celery beat)
+app.conf.beat_schedule = {
+    'dispatch-video-jobs': {
+        'task': 'feedbacks.tasks.dispatch_video_jobs',
+        'schedule': 30,
+    },
+    'cleanup-expired-uploads': {
+        'task': 'feedbacks.tasks.cleanup_expired_uploads',
+        'schedule': 3600,
+    },
 }
 
 # Task time limits
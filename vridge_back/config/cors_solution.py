@@ -48,6 +48,9 @@ class RailwayCORSMiddleware(MiddlewareMixin):
             'cache-control',
             'pragma',
             'x-idempotency-key',
+            'range',
+            'if-range',
+            'if-none-match',
         ]
         
         #  
@@ -55,6 +58,9 @@ class RailwayCORSMiddleware(MiddlewareMixin):
             'Content-Type',
             'X-CSRFToken',
             'Content-Length',
+            'Content-Range',
+            'Accept-Ranges',
+            'ETag',
         ]
     
     def process_request(self, request):
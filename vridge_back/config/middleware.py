@@ -27,6 +27,8 @@ from rest_framework.exceptions import (
 )
 import json
 
+from core.metrics import http_request_duration
+
 logger = logging.getLogger(__name__)
 
 
@@ -467,6 +469,15 @@ class PerformanceMonitoringMiddleware(MiddlewareMixin):
             # Add performance header
             response['X-Response-Time'] = f"{response_time_ms}ms"
             
+            # Fleet-wide latency histogram; the route pattern keeps label cardinality bounded
+            match = getattr(request, 'resolver_match', None)
+            http_request_duration.observe(
+                response_time,
+                route=match.route if match else 'unmatched',
+                method=request.method,
+                status=response.status_code,
+            )
+            
             # Log slow requests (>200ms)
             if response_time_ms > 200:
                 logger = logging.getLogger(__name__)
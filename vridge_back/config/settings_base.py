@@ -75,6 +75,14 @@ HUGGINGFACE_API_KEY = os.environ.get('HUGGINGFACE_API_KEY', '')
 # Twelve Labs API Key (for video understanding)
 TWELVE_LABS_API_KEY = os.environ.get('TWELVE_LABS_API_KEY', '')
 
+# Bearer token for the Prometheus scraper (/api/monitoring/metrics/)
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+# Feedback media offload (feedbacks.media): '', 'x-accel-redirect' or 'x-sendfile'
+MEDIA_OFFLOAD = os.environ.get('MEDIA_OFFLOAD', '')
+# nginx `internal` location aliased to MEDIA_ROOT (VIDEO_ENCODING_SETUP.md)
+MEDIA_ACCEL_REDIRECT_PREFIX = os.environ.get('MEDIA_ACCEL_REDIRECT_PREFIX', '/protected-media/')
+
 # EXAONE API Key  - Gemini 
 
 # SECURITY WARNING: don't run with debug turned on in production!
@@ -264,6 +272,7 @@ WHITENOISE_ROOT = os.path.join(BASE_DIR, "../vridge_front/build")
 WHITENOISE_AUTOREFRESH = DEBUG
 
 # AWS Settings
+USE_S3 = os.environ.get('USE_S3', 'False').lower() == 'true'  # core.storage.MediaStorage on S3
 AWS_ACCESS_KEY_ID = os.environ.get('AWS_ACCESS_KEY_ID', None)
 AWS_SECRET_ACCESS_KEY = os.environ.get('AWS_SECRET_ACCESS_KEY', None)
 AWS_STORAGE_BUCKET_NAME = os.environ.get('AWS_STORAGE_BUCKET_NAME', None)
@@ -393,6 +402,19 @@ CELERY_TASK_TRACK_STARTED = True
 CELERY_TASK_TIME_LIMIT = 3600  # 1 hour
 CELERY_WORKER_HIJACK_ROOT_LOGGER = False
 
+# Video job scheduling (feedbacks.scheduler)
+VIDEO_MAX_CONCURRENCY = int(os.environ.get('VIDEO_MAX_CONCURRENCY', '2'))  # encodes at once, all workers
+VIDEO_PROJECT_CONCURRENCY = int(os.environ.get('VIDEO_PROJECT_CONCURRENCY', '1'))  # per project
+VIDEO_WORKER_CONCURRENCY = int(os.environ.get('VIDEO_WORKER_CONCURRENCY', '1'))  # -c of one video worker
+
+# AI provider limits (video_planning.providers), per process
+GEMINI_MAX_CONCURRENCY = int(os.environ.get('GEMINI_MAX_CONCURRENCY', '4'))  # requests in flight
+GEMINI_REQUESTS_PER_MINUTE = int(os.environ.get('GEMINI_REQUESTS_PER_MINUTE', '60'))  # 0 = unpaced
+DALLE_MAX_CONCURRENCY = int(os.environ.get('DALLE_MAX_CONCURRENCY', '2'))
+DALLE_IMAGES_PER_MINUTE = int(os.environ.get('DALLE_IMAGES_PER_MINUTE', '15'))
+STORYBOARD_CONCURRENCY = int(os.environ.get('STORYBOARD_CONCURRENCY', '4'))  # scenes of one generate_all_storyboards
+GEMINI_RESPONSE_CACHE_TTL = int(os.environ.get('GEMINI_RESPONSE_CACHE_TTL', '3600'))  # seconds, 0 = off (video_planning.response_cache)
+
 # CORS Settings - These are now handled by config.cors_solution.RailwayCORSMiddleware
 # The new middleware provides more reliable CORS handling for Railway deployment
 # Settings are kept here for reference but not actively used by django-cors-headers
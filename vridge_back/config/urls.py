@@ -81,6 +81,7 @@ from users import views as user_views
 from users.views_signup_safe import SafeSignUp, SafeSignIn
 from users.views_test import TestSignUp, TestCreate
 from rest_framework_simplejwt.views import TokenRefreshView
+from monitoring import views as monitoring_views
 
 # Import auth fallback views
 from .auth_fallback import get_auth_views
@@ -160,6 +161,9 @@ urlpatterns = [
     path('feedbacks/', include(('feedbacks.urls', 'feedbacks'), namespace='legacy_feedbacks')),
     path('onlines/', include('onlines.urls')),
     
+    # Monitoring
+    path('api/monitoring/metrics/', monitoring_views.prometheus_metrics, name='prometheus_metrics'),
+    
     # Utility endpoints
     path('cors-test/', cors_test_view, name='cors_test'),
     path('public/projects/', PublicProjectListView.as_view(), name='public_projects'),
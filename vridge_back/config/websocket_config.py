@@ -3,12 +3,17 @@
 Django Channels   
 """
 
+import logging
 import os
 from channels.auth import AuthMiddlewareStack
+from channels.db import database_sync_to_async
+from channels.middleware import BaseMiddleware
 from channels.routing import ProtocolTypeRouter, URLRouter
 from channels.security.websocket import AllowedHostsOriginValidator
 from django.core.asgi import get_asgi_application
 
+logger = logging.getLogger(__name__)
+
 
 def get_websocket_application():
     """
@@ -33,7 +38,7 @@ def get_websocket_application():
         "http": django_asgi_app,
         "websocket": AllowedHostsOriginValidator(
             AuthMiddlewareStack(
-                URLRouter(websocket_urlpatterns)
+                WebSocketAuthMiddleware(URLRouter(websocket_urlpatterns))
             )
         ),
     })
@@ -118,44 +123,34 @@ class WebSocketManager:
 ws_manager = WebSocketManager()
 
 
+@database_sync_to_async
+def _jwt_user(scope):
+    from users.principal import resolve_scope_user
+    try:
+        return resolve_scope_user(scope)
+    except Exception as e:
+        logger.info(f"WebSocket JWT authentication failed: {e}")
+        return None
+
+
 #  
-class WebSocketAuthMiddleware:
+class WebSocketAuthMiddleware(BaseMiddleware):
     """
-      
-    JWT   
+    scope["user"] from the API's JWT (vridge_session cookie, Bearer header or
+    ?token=, see users.principal) when the Django session did not
+    authenticate one. Goes inside AuthMiddlewareStack, which provides the
+    cookies and the session user.
     """
-    
-    def __init__(self, app):
-        self.app = app
-    
+
     async def __call__(self, scope, receive, send):
-        from urllib.parse import parse_qs
-        from channels.db import database_sync_to_async
-        from rest_framework_simplejwt.tokens import AccessToken
         from django.contrib.auth.models import AnonymousUser
-        
-        #    
-        query_string = scope.get('query_string', b'').decode()
-        query_params = parse_qs(query_string)
-        token = query_params.get('token', [None])[0]
-        
-        if token:
-            try:
-                #  
-                access_token = AccessToken(token)
-                user_id = access_token['user_id']
-                
-                #  
-                from users.models import User
-                scope['user'] = await database_sync_to_async(
-                    User.objects.get
-                )(id=user_id)
-            except Exception:
-                scope['user'] = AnonymousUser()
-        else:
-            scope['user'] = AnonymousUser()
-        
-        return await self.app(scope, receive, send)
+
+        scope = dict(scope)
+        user = scope.get("user")
+        if user is None or not user.is_authenticated:
+            jwt_user = await _jwt_user(scope)
+            scope["user"] = jwt_user if jwt_user is not None else (user or AnonymousUser())
+        return await self.inner(scope, receive, send)
 
 
 #  
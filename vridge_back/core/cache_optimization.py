@@ -5,9 +5,17 @@ Redis
 
 import hashlib
 import json
+import math
 import pickle
-from typing import Any, Optional, Callable, Union
+import random
+import threading
+import time
+import uuid
+import weakref
+from collections import OrderedDict
+from typing import Any, Optional, Callable, Iterable, Union
 from functools import wraps
+from itertools import islice
 from datetime import timedelta
 
 from django.core.cache import cache
@@ -17,6 +25,8 @@ from django.utils import timezone
 from django.db.models import QuerySet, Model
 import logging
 
+from core.metrics import cache_requests
+
 logger = logging.getLogger(__name__)
 
 #  TTL 
@@ -29,6 +39,10 @@ CACHE_TTL = {
 }
 
 
+# Distinguishes "not cached" from a cached None/falsy value
+_MISSING = object()
+
+
 class CacheKeyGenerator:
     """   """
     
@@ -69,56 +83,388 @@ class CacheKeyGenerator:
         return f"qs:{model_name}:{query_hash}"
 
 
+def get_redis_client(backend=None):
+    """Raw redis client of ``backend``, or None for non-Redis backends"""
+    backend = backend or cache
+    try:
+        # django_redis.cache.RedisCache
+        if hasattr(backend, 'client') and hasattr(backend.client, 'get_client'):
+            return backend.client.get_client(write=True)
+        # django.core.cache.backends.redis.RedisCache (Railway)
+        if backend.__class__.__name__ == 'RedisCache' and hasattr(backend, '_cache'):
+            return backend._cache.get_client(write=True)
+    except Exception as e:
+        logger.warning(f"Redis client unavailable: {e}")
+    return None
+
+
+class RedisTagIndex:
+    """Tag index stored as Redis sets
+
+    Each tag is a set ``tag:<name>`` holding the full cache keys registered
+    under it, so invalidation touches only the tagged keys
+    (SMEMBERS + UNLINK in one pipeline) instead of scanning the keyspace.
+    """
+
+    def __init__(self, backend, client):
+        self.backend = backend
+        self.client = client
+
+    def _tag_key(self, tag):
+        return self.backend.make_key(f"tag:{tag}")
+
+    def wrap(self, value, tags):
+        return value
+
+    def unwrap(self, entry):
+        return entry
+
+    def register(self, key, tags, timeout, version=None):
+        full_key = self.backend.make_key(key, version=version)
+        pipe = self.client.pipeline(transaction=False)
+        for tag in tags:
+            tag_key = self._tag_key(tag)
+            pipe.sadd(tag_key, full_key)
+            # Tag sets live at least as long as the entries registered in them
+            if timeout:
+                pipe.expire(tag_key, max(timeout, CACHE_TTL['week']))
+            else:
+                pipe.persist(tag_key)
+        pipe.execute()
+
+    def invalidate(self, tags) -> int:
+        tag_keys = [self._tag_key(tag) for tag in tags]
+        pipe = self.client.pipeline(transaction=False)
+        for tag_key in tag_keys:
+            pipe.smembers(tag_key)
+        members = set()
+        for result in pipe.execute():
+            members.update(result)
+
+        pipe = self.client.pipeline(transaction=False)
+        if members:
+            pipe.unlink(*members)
+        pipe.unlink(*tag_keys)
+        pipe.execute()
+        return len(members)
+
+
+class VersionedTagIndex:
+    """Tag index for backends without sets (DatabaseCache, LocMemCache)
+
+    Every tag has a version stamp in the cache.  Tagged entries are stored
+    together with the stamps of their tags at write time and are treated as
+    a miss once any of those stamps changed, so invalidating a tag is a
+    single write no matter how many entries carry it.
+    """
+
+    MARKER = '__tagged__'
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    def _tag_key(self, tag):
+        return f"tag_version:{tag}"
+
+    def _versions(self, tags):
+        keys = {self._tag_key(tag): tag for tag in tags}
+        current = self.backend.get_many(list(keys))
+        missing = {key: uuid.uuid4().hex for key in keys if key not in current}
+        if missing:
+            self.backend.set_many(missing, None)
+            current.update(missing)
+        return {tag: current[key] for key, tag in keys.items()}
+
+    def wrap(self, value, tags):
+        return {self.MARKER: True, 'tags': self._versions(tags), 'value': value}
+
+    def unwrap(self, entry):
+        if not isinstance(entry, dict) or not entry.get(self.MARKER):
+            return entry
+        tags = entry['tags']
+        current = self.backend.get_many([self._tag_key(tag) for tag in tags])
+        for tag, stamp in tags.items():
+            if current.get(self._tag_key(tag)) != stamp:
+                return None
+        return entry['value']
+
+    def register(self, key, tags, timeout, version=None):
+        pass
+
+    def invalidate(self, tags) -> int:
+        self.backend.set_many({self._tag_key(tag): uuid.uuid4().hex for tag in tags}, None)
+        return 0
+
+
+def get_tag_index(backend=None):
+    """Tag index matching the configured cache backend"""
+    backend = backend or cache
+    client = get_redis_client(backend)
+    if client is not None:
+        return RedisTagIndex(backend, client)
+    return VersionedTagIndex(backend)
+
+
+def user_tag(user_id) -> str:
+    return f"user:{user_id}"
+
+
+def project_tag(project_id) -> str:
+    return f"project:{project_id}"
+
+
+def model_tag(model_name: str, instance_id=None) -> str:
+    if instance_id is None:
+        return f"model:{model_name}"
+    return f"model:{model_name}:{instance_id}"
+
+
+class LocalLRUCache:
+    """Bounded per-process LRU with per-entry expiry
+
+    Sits in front of the shared cache for data that may be a few seconds
+    stale.  Entries are not invalidated across workers, so callers pick a
+    TTL they can tolerate as staleness.
+    """
+
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            value, expires_at, tags = item
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, timeout: float, tags: Iterable[str] = ()):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + timeout, frozenset(tags))
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def invalidate_tags(self, tags: Iterable[str]):
+        tags = set(tags)
+        with self._lock:
+            for key in [k for k, item in self._data.items() if item[2] & tags]:
+                del self._data[key]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
 class SmartCache:
-    """  """
+    """Two-tier cache: optional per-process LRU in front of the shared cache
+
+    get_or_set() stores values in an envelope so that a cached ``None`` is
+    a hit, recomputes at most once per key at a time (single-flight, both
+    within the process and across workers through a short ``add`` lock),
+    and refreshes entries probabilistically shortly before they expire
+    (XFetch) so hot keys do not all miss at the same moment.
+    """
+
+    ENVELOPE = '__smart__'
+    LOCK_TIMEOUT = 30        # seconds a distributed recompute lock is held at most
+    LOCK_WAIT = 5            # seconds a waiter polls for another worker's result
+    LOCK_POLL = 0.05
+    EARLY_REFRESH_BETA = 1.0
     
-    def __init__(self):
+    def __init__(self, local_maxsize: int = 1024):
         self.cache = cache
-        self.stats = {'hits': 0, 'misses': 0}
+        self.local = LocalLRUCache(local_maxsize)
+        self._tag_index = None
+        self._locks = weakref.WeakValueDictionary()
+        self._locks_guard = threading.Lock()
         
-    def get_or_set(self, key: str, func: Callable, timeout: int = None,
-                   version: int = None, force_refresh: bool = False) -> Any:
-        """  """
-        if force_refresh:
-            value = None
-        else:
-            value = self.cache.get(key, version=version)
-            
-        if value is None:
-            self.stats['misses'] += 1
-            value = func()
-            if value is not None:
-                self.cache.set(key, value, timeout or CACHE_TTL['medium'], version=version)
-                logger.debug(f"Cache miss and set: {key}")
+    @property
+    def tag_index(self):
+        if self._tag_index is None:
+            self._tag_index = get_tag_index(self.cache)
+        return self._tag_index
+
+    def _key_lock(self, key: str) -> threading.Lock:
+        with self._locks_guard:
+            lock = self._locks.get(key)
+            if lock is None:
+                lock = threading.Lock()
+                self._locks[key] = lock
+            return lock
+
+    def _read(self, key: str, version: int = None):
+        """Raw shared-tier read: the stored envelope/value, or _MISSING"""
+        entry = self.cache.get(key, _MISSING, version=version)
+        if entry is _MISSING:
+            return _MISSING
+        entry = self.tag_index.unwrap(entry)
+        return _MISSING if entry is None else entry
+
+    def _is_envelope(self, entry) -> bool:
+        return isinstance(entry, dict) and entry.get(self.ENVELOPE) == 1
+
+    def get(self, key: str, default: Any = None, version: int = None) -> Any:
+        """Read an entry written by set() or get_or_set(), tagged or not"""
+        entry = self._read(key, version)
+        if entry is _MISSING:
+            return default
+        if self._is_envelope(entry):
+            return entry['v']
+        return entry
+
+    def set(self, key: str, value: Any, timeout: int = None,
+            version: int = None, tags: Iterable[str] = None):
+        """Write an entry, registering it under ``tags`` for invalidate_tags()"""
+        timeout = timeout or CACHE_TTL['medium']
+        tags = list(tags or [])
+        if tags:
+            self.cache.set(key, self.tag_index.wrap(value, tags), timeout, version=version)
+            try:
+                self.tag_index.register(key, tags, timeout, version=version)
+            except Exception as e:
+                # An unregistered entry could not be invalidated; drop it
+                logger.error(f"Failed to register cache tags for {key}: {e}")
+                self.cache.delete(key, version=version)
         else:
-            self.stats['hits'] += 1
-            logger.debug(f"Cache hit: {key}")
-            
+            self.cache.set(key, value, timeout, version=version)
+
+    def _should_refresh_early(self, entry) -> bool:
+        delta, expires_at = entry.get('d') or 0, entry.get('x')
+        if not expires_at or not delta:
+            return False
+        gap = -delta * self.EARLY_REFRESH_BETA * math.log(1.0 - random.random())
+        return time.time() + gap >= expires_at
+
+    def get_or_set(self, key: str, func: Callable, timeout: int = None,
+                   version: int = None, force_refresh: bool = False,
+                   tags: Iterable[str] = None, local_timeout: float = None) -> Any:
+        """Cached ``func()``; ``local_timeout`` also keeps it in the process LRU"""
+        timeout = timeout or CACHE_TTL['medium']
+        local_key = f"{key}:{version}" if version else key
+
+        stale = _MISSING
+        if not force_refresh:
+            if local_timeout:
+                value = self.local.get(local_key, _MISSING)
+                if value is not _MISSING:
+                    cache_requests.inc(result='local_hit')
+                    return value
+
+            entry = self._read(key, version)
+            if self._is_envelope(entry):
+                if not self._should_refresh_early(entry):
+                    cache_requests.inc(result='hit')
+                    logger.debug(f"Cache hit: {key}")
+                    if local_timeout:
+                        self.local.set(local_key, entry['v'], local_timeout, tags or ())
+                    return entry['v']
+                stale = entry['v']
+
+        cache_requests.inc(result='miss')
+        value = self._recompute(key, func, timeout, version, tags, force_refresh, stale)
+        if local_timeout:
+            self.local.set(local_key, value, local_timeout, tags or ())
         return value
+
+    def _recompute(self, key, func, timeout, version, tags, force_refresh, stale):
+        with self._key_lock(key):
+            # Another thread of this process may have filled it meanwhile
+            if not force_refresh and stale is _MISSING:
+                entry = self._read(key, version)
+                if self._is_envelope(entry):
+                    return entry['v']
+
+            lock_key = f"lock:{key}"
+            acquired = self.cache.add(lock_key, 1, self.LOCK_TIMEOUT, version=version)
+            if not acquired:
+                # Early refresh already running elsewhere: keep serving stale
+                if stale is not _MISSING:
+                    return stale
+                deadline = time.monotonic() + self.LOCK_WAIT
+                while time.monotonic() < deadline:
+                    time.sleep(self.LOCK_POLL)
+                    entry = self._read(key, version)
+                    if self._is_envelope(entry):
+                        return entry['v']
+                logger.warning(f"Cache recompute lock wait timed out: {key}")
+
+            try:
+                started = time.time()
+                value = func()
+                delta = time.time() - started
+                envelope = {self.ENVELOPE: 1, 'v': value, 'd': delta, 'x': time.time() + timeout}
+                self.set(key, envelope, timeout, version=version, tags=tags)
+                logger.debug(f"Cache miss and set: {key}")
+                return value
+            finally:
+                if acquired:
+                    self.cache.delete(lock_key, version=version)
+
+    def invalidate_tags(self, *tags: str) -> int:
+        """Drop every entry registered under any of ``tags``
+
+        The process LRU is purged for this worker only; other workers keep
+        their local copy until its local_timeout.
+        """
+        tags = [tag for tag in tags if tag]
+        if not tags:
+            return 0
+        self.local.invalidate_tags(tags)
+        try:
+            deleted = self.tag_index.invalidate(tags)
+            logger.debug(f"Invalidated cache tags {tags} ({deleted} keys)")
+            return deleted
+        except Exception as e:
+            logger.error(f"Failed to invalidate cache tags {tags}: {e}")
+            return 0
         
     def delete_pattern(self, pattern: str):
-        """    """
-        if hasattr(self.cache, '_cache'):
-            # Redis 
-            try:
-                from django_redis import get_redis_connection
-                con = get_redis_connection("default")
-                keys = con.keys(f"*{pattern}*")
-                if keys:
-                    con.delete(*keys)
-                    logger.info(f"Deleted {len(keys)} cache keys matching pattern: {pattern}")
-                    return len(keys)
-            except Exception as e:
-                logger.error(f"Failed to delete cache pattern {pattern}: {e}")
+        """Deprecated: prefer tags and invalidate_tags()
+
+        Walks the keyspace with SCAN instead of KEYS so Redis is never
+        blocked, but still costs O(total keys).
+        """
+        client = get_redis_client(self.cache)
+        if client is None:
+            return 0
+        try:
+            deleted = 0
+            batch = []
+            for key in client.scan_iter(match=f"*{pattern}*", count=1000):
+                batch.append(key)
+                if len(batch) >= 1000:
+                    deleted += client.unlink(*batch)
+                    batch = []
+            if batch:
+                deleted += client.unlink(*batch)
+            if deleted:
+                logger.info(f"Deleted {deleted} cache keys matching pattern: {pattern}")
+            return deleted
+        except Exception as e:
+            logger.error(f"Failed to delete cache pattern {pattern}: {e}")
         return 0
         
     def get_stats(self) -> dict:
         """  """
-        total = self.stats['hits'] + self.stats['misses']
-        hit_rate = (self.stats['hits'] / total * 100) if total > 0 else 0
+        stats = {result: cache_requests.value(result=result) for result in ('hit', 'local_hit', 'miss')}
+        hits = stats['hit'] + stats['local_hit']
+        total = hits + stats['miss']
+        hit_rate = (hits / total * 100) if total > 0 else 0
         return {
-            'hits': self.stats['hits'],
-            'misses': self.stats['misses'],
+            'hits': stats['hit'],
+            'local_hits': stats['local_hit'],
+            'misses': stats['miss'],
             'total': total,
             'hit_rate': hit_rate
         }
@@ -130,8 +476,15 @@ smart_cache = SmartCache()
 
 def cache_result(timeout: Union[int, str] = 'medium', 
                 key_prefix: str = None,
-                vary_on_user: bool = False):
-    """   """
+                vary_on_user: bool = False,
+                tags: Union[Iterable[str], Callable] = None,
+                local_timeout: float = None):
+    """   
+
+    ``tags`` is a list of tags or a callable receiving the wrapped call's
+    arguments and returning one; see SmartCache.invalidate_tags().
+    ``local_timeout`` additionally keeps the result in the per-process LRU.
+    """
     def decorator(func):
         @wraps(func)
         def wrapper(*args, **kwargs):
@@ -141,11 +494,14 @@ def cache_result(timeout: Union[int, str] = 'medium',
             else:
                 cache_key = f"{func.__module__}.{func.__name__}"
                 
+            entry_tags = list(tags(*args, **kwargs) if callable(tags) else tags or [])
+
             #  
             if vary_on_user and 'request' in kwargs:
                 request = kwargs['request']
                 if hasattr(request, 'user') and request.user.is_authenticated:
                     cache_key = f"{cache_key}:user_{request.user.id}"
+                    entry_tags.append(user_tag(request.user.id))
                     
             #    
             cache_key = CacheKeyGenerator.generate_key(cache_key, *args, **kwargs)
@@ -160,7 +516,9 @@ def cache_result(timeout: Union[int, str] = 'medium',
             return smart_cache.get_or_set(
                 cache_key,
                 lambda: func(*args, **kwargs),
-                timeout=actual_timeout
+                timeout=actual_timeout,
+                tags=entry_tags,
+                local_timeout=local_timeout
             )
             
         return wrapper
@@ -201,26 +559,16 @@ def cache_queryset(timeout: Union[int, str] = 'medium'):
 
 
 class CacheInvalidator:
-    """   """
+    """Tag-based invalidation of entries written through smart_cache"""
     
     @staticmethod
     def invalidate_model_cache(model_class: type, instance_id: int = None):
         """   """
         model_name = model_class.__name__
-        
         if instance_id:
-            #    
-            patterns = [
-                f"*{model_name}*{instance_id}*",
-                f"*pk={instance_id}*"
-            ]
+            deleted_count = smart_cache.invalidate_tags(model_tag(model_name, instance_id))
         else:
-            #    
-            patterns = [f"*{model_name}*"]
-            
-        deleted_count = 0
-        for pattern in patterns:
-            deleted_count += smart_cache.delete_pattern(pattern)
+            deleted_count = smart_cache.invalidate_tags(model_tag(model_name))
             
         logger.info(f"Invalidated {deleted_count} cache entries for {model_name}")
         return deleted_count
@@ -228,32 +576,14 @@ class CacheInvalidator:
     @staticmethod
     def invalidate_user_cache(user_id: int):
         """    """
-        patterns = [
-            f"*user_{user_id}*",
-            f"*user_id={user_id}*",
-            f"*owner_id={user_id}*"
-        ]
-        
-        deleted_count = 0
-        for pattern in patterns:
-            deleted_count += smart_cache.delete_pattern(pattern)
-            
+        deleted_count = smart_cache.invalidate_tags(user_tag(user_id))
         logger.info(f"Invalidated {deleted_count} cache entries for user {user_id}")
         return deleted_count
         
     @staticmethod
     def invalidate_project_cache(project_id: int):
         """    """
-        patterns = [
-            f"*project_{project_id}*",
-            f"*project_id={project_id}*",
-            f"*projects*{project_id}*"
-        ]
-        
-        deleted_count = 0
-        for pattern in patterns:
-            deleted_count += smart_cache.delete_pattern(pattern)
-            
+        deleted_count = smart_cache.invalidate_tags(project_tag(project_id))
         logger.info(f"Invalidated {deleted_count} cache entries for project {project_id}")
         return deleted_count
 
@@ -272,12 +602,12 @@ class CacheWarmer:
             
             #   
             cache_key = f"user:profile:{user_id}"
-            cache.set(cache_key, user, CACHE_TTL['long'])
+            smart_cache.set(cache_key, user, CACHE_TTL['long'], tags=[user_tag(user_id)])
             
             #    
             projects = Project.objects.filter(user=user).select_related('basic_plan')
             cache_key = f"user:projects:{user_id}"
-            cache.set(cache_key, list(projects), CACHE_TTL['medium'])
+            smart_cache.set(cache_key, list(projects), CACHE_TTL['medium'], tags=[user_tag(user_id)])
             
             logger.info(f"Warmed cache for user {user_id}")
             return True
@@ -301,14 +631,14 @@ class CacheWarmer:
             
             #   
             cache_key = f"project:detail:{project_id}"
-            cache.set(cache_key, project, CACHE_TTL['medium'])
+            smart_cache.set(cache_key, project, CACHE_TTL['medium'], tags=[project_tag(project_id)])
             
             #    
             feedbacks = Feedback.objects.filter(
                 project=project
             ).select_related('user')
             cache_key = f"project:feedbacks:{project_id}"
-            cache.set(cache_key, list(feedbacks), CACHE_TTL['short'])
+            smart_cache.set(cache_key, list(feedbacks), CACHE_TTL['short'], tags=[project_tag(project_id)])
             
             logger.info(f"Warmed cache for project {project_id}")
             return True
@@ -390,12 +720,10 @@ class CacheHealthMonitor:
         }
         
         try:
-            if hasattr(cache, '_cache') and 'Redis' in cache._cache.__class__.__name__:
-                from django_redis import get_redis_connection
-                con = get_redis_connection("default")
-                
-                #    
-                all_keys = con.keys('*')
+            con = get_redis_client(cache)
+            if con is not None:
+                #    (SCAN sample, KEYS would block Redis)
+                all_keys = list(islice(con.scan_iter(count=1000), 1000))
                 key_patterns = {}
                 
                 for key in all_keys[:1000]:  #  1000 
@@ -14,6 +14,7 @@ from django.core.cache import cache
 from django.utils import timezone
 from django.conf import settings
 from .error_tracking import error_tracker, ErrorSeverity, ErrorCategory, ErrorContext
+from .cache_optimization import smart_cache, model_tag, user_tag
 
 logger = logging.getLogger('data_consistency')
 
@@ -221,39 +222,16 @@ class DataConsistencyManager:
     def _invalidate_related_cache(self, operation: DataOperation):
         """  """
         try:
-            #    
-            cache_patterns = [
-                f"{operation.model_name.lower()}:*",
-                f"user:{operation.user_id}:*" if operation.user_id else None,
-                f"{operation.model_name.lower()}:{operation.instance_id}:*" if operation.instance_id else None,
-            ]
-            
-            for pattern in cache_patterns:
-                if pattern:
-                    self._invalidate_cache_pattern(pattern)
+            tags = [model_tag(operation.model_name)]
+            if operation.instance_id:
+                tags.append(model_tag(operation.model_name, operation.instance_id))
+            if operation.user_id:
+                tags.append(user_tag(operation.user_id))
+            smart_cache.invalidate_tags(*tags)
             
         except Exception as e:
             logger.warning(f"  : {str(e)}")
     
-    def _invalidate_cache_pattern(self, pattern: str):
-        """   """
-        try:
-            # Redis  
-            from django_redis import get_redis_connection
-            redis_conn = get_redis_connection("default")
-            
-            keys = redis_conn.keys(pattern)
-            if keys:
-                redis_conn.delete(*keys)
-                logger.debug(f"  {len(keys)} : {pattern}")
-                
-        except ImportError:
-            # Redis     
-            cache.clear()
-            logger.debug("  ")
-        except Exception as e:
-            logger.warning(f"  : {str(e)}")
-    
     def _record_violation(self, rule: ConsistencyRule, operation: DataOperation, description: str):
         """  """
         violation = ConsistencyViolation(
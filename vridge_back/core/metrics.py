@@ -0,0 +1,275 @@
+"""
+Process-wide metrics registry
+
+Counters and fixed-bucket histograms are kept per process under a single
+lock and pushed to a shared Redis hash with HINCRBY/HINCRBYFLOAT, so that
+every gunicorn worker contributes to the same totals. render() returns
+the fleet-wide values in the Prometheus text exposition format; without a
+Redis cache backend it falls back to this process's values. Gauges are not
+recorded at all: their callback is read when the metrics are rendered.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from typing import Iterable
+
+logger = logging.getLogger(__name__)
+
+METRICS_KEY = 'metrics:registry'
+FLUSH_INTERVAL = 10  # seconds between pushes of a worker's deltas to Redis
+
+# Latency buckets in seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_value(value) -> str:
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def _format_le(bound: float) -> str:
+    return '+Inf' if bound == float('inf') else repr(float(bound))
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Counter:
+    """Monotonic counter, optionally labelled"""
+
+    type = 'counter'
+
+    def __init__(self, registry, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def _labels(self, labels: dict) -> tuple:
+        return tuple((name, str(labels.get(name, ''))) for name in self.labelnames)
+
+    def inc(self, amount=1, **labels):
+        self.registry._add([(self.name, self._labels(labels), amount)])
+
+    def value(self, **labels):
+        """This process's value"""
+        return self.registry.local_value(self.name, self._labels(labels))
+
+
+class Histogram(Counter):
+    """Fixed-bucket histogram; buckets are stored cumulatively"""
+
+    type = 'histogram'
+
+    def __init__(self, registry, name: str, documentation: str,
+                 labelnames: Iterable[str] = (), buckets: Iterable[float] = DEFAULT_BUCKETS):
+        super().__init__(registry, name, documentation, labelnames)
+        self.buckets = tuple(sorted(float(b) for b in buckets)) + (float('inf'),)
+
+    def observe(self, value: float, **labels):
+        labels = self._labels(labels)
+        # Every bucket is touched so that empty ones are still exported as 0
+        samples = [
+            (f'{self.name}_bucket', labels + (('le', _format_le(bound)),), int(value <= bound))
+            for bound in self.buckets
+        ]
+        samples.append((f'{self.name}_sum', labels, float(value)))
+        samples.append((f'{self.name}_count', labels, 1))
+        self.registry._add(samples)
+
+
+class Gauge:
+    """Current value read from ``callback`` at render time
+
+    For state that already lives in a shared store (queue depth and the
+    like); nothing is recorded per process.
+    """
+
+    type = 'gauge'
+    labelnames = ()
+
+    def __init__(self, registry, name: str, documentation: str, callback):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.callback = callback
+
+    def read(self):
+        try:
+            return self.callback()
+        except Exception as e:
+            logger.error(f"Failed to read gauge {self.name}: {e}")
+            return None
+
+
+class MetricsRegistry:
+    """Holds the metric families and their samples for this process"""
+
+    def __init__(self, key: str = METRICS_KEY, flush_interval: float = FLUSH_INTERVAL):
+        self.key = key
+        self.flush_interval = flush_interval
+        self._families = {}
+        self._values = {}
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        # Deltas recorded before the fork were already counted by the parent
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pending = {}
+        self._values = {}
+        self._last_flush = time.monotonic()
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._families.get(metric.name)
+            if existing is not None:
+                if type(existing) is not type(metric):
+                    raise ValueError(f"Metric {metric.name} already registered as {existing.type}")
+                return existing
+            self._families[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self._register(Counter(self, name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                  buckets: Iterable[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(self, name, documentation, labelnames, buckets))
+
+    def gauge(self, name: str, documentation: str, callback) -> Gauge:
+        return self._register(Gauge(self, name, documentation, callback))
+
+    def _add(self, samples):
+        with self._lock:
+            for name, labels, amount in samples:
+                sample = (name, labels)
+                self._values[sample] = self._values.get(sample, 0) + amount
+                self._pending[sample] = self._pending.get(sample, 0) + amount
+            due = time.monotonic() - self._last_flush >= self.flush_interval
+        if due:
+            self.flush()
+
+    def local_value(self, name: str, labels: tuple = ()):
+        with self._lock:
+            return self._values.get((name, labels), 0)
+
+    def _client(self):
+        from core.cache_optimization import get_redis_client
+        try:
+            return get_redis_client()
+        except Exception:
+            return None
+
+    def flush(self) -> bool:
+        """Push this process's deltas to Redis; False if there is no Redis"""
+        if not self._flush_lock.acquire(blocking=False):
+            return True
+        try:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+                self._last_flush = time.monotonic()
+            if not pending:
+                return True
+            client = self._client()
+            if client is None:
+                return False
+            try:
+                pipe = client.pipeline(transaction=False)
+                for (name, labels), amount in pending.items():
+                    field = json.dumps([name, labels])
+                    if isinstance(amount, float):
+                        pipe.hincrbyfloat(self.key, field, amount)
+                    else:
+                        pipe.hincrby(self.key, field, amount)
+                pipe.execute()
+                return True
+            except Exception as e:
+                logger.error(f"Failed to flush metrics: {e}")
+                # Keep the deltas for the next attempt
+                with self._lock:
+                    for sample, amount in pending.items():
+                        self._pending[sample] = self._pending.get(sample, 0) + amount
+                return False
+        finally:
+            self._flush_lock.release()
+
+    def collect(self) -> dict:
+        """Fleet-wide samples {(name, labels): value}, or local ones without Redis"""
+        if self.flush():
+            client = self._client()
+            if client is not None:
+                try:
+                    samples = {}
+                    for field, value in client.hgetall(self.key).items():
+                        name, labels = json.loads(field)
+                        value = float(value)
+                        samples[(name, tuple(tuple(pair) for pair in labels))] = value
+                    return samples
+                except Exception as e:
+                    logger.error(f"Failed to read metrics from Redis: {e}")
+        with self._lock:
+            return dict(self._values)
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)"""
+        samples = self.collect()
+        with self._lock:
+            families = list(self._families.values())
+
+        lines = []
+        for family in families:
+            lines.append(f'# HELP {family.name} {family.documentation}')
+            lines.append(f'# TYPE {family.name} {family.type}')
+            if family.type == 'gauge':
+                value = family.read()
+                if value is not None:
+                    lines.append(f'{family.name} {_format_value(value)}')
+                continue
+            if family.type == 'histogram':
+                names = (f'{family.name}_bucket', f'{family.name}_sum', f'{family.name}_count')
+            else:
+                names = (family.name,)
+            for name in names:
+                rows = [(labels, value) for (sample, labels), value in samples.items() if sample == name]
+                rows.sort(key=lambda row: tuple(
+                    float(v) if k == 'le' else v for k, v in row[0]
+                ))
+                if not rows and not family.labelnames:
+                    rows = [((), 0)]
+                for labels, value in rows:
+                    if labels:
+                        text = ','.join(f'{k}="{_escape(v)}"' for k, v in labels)
+                        lines.append(f'{name}{{{text}}} {_format_value(value)}')
+                    else:
+                        lines.append(f'{name} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+# Shared registry and the metrics recorded across the project
+registry = MetricsRegistry()
+
+cache_requests = registry.counter(
+    'smartcache_requests_total',
+    'Cache lookups by result (local_hit, hit, miss)',
+    ['result'],
+)
+http_request_duration = registry.histogram(
+    'http_request_duration_seconds',
+    'Request latency by resolved route, method and status code',
+    ['route', 'method', 'status'],
+)
+slow_db_queries = registry.counter(
+    'db_slow_queries_total',
+    'Database queries slower than 100ms',
+)
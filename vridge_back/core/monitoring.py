@@ -5,12 +5,16 @@
 import time
 import logging
 import functools
+import threading
+from collections import deque
 from datetime import datetime
 from django.conf import settings
 from django.core.cache import cache
 from django.db import connection
 from django.utils.decorators import method_decorator
 
+from core.metrics import cache_requests, slow_db_queries
+
 
 logger = logging.getLogger('performance')
 
@@ -20,54 +24,61 @@ class PerformanceMonitor:
       
     """
     
+    MAX_SAMPLES = 100  # recent slow queries/requests kept per process
+    
     def __init__(self):
-        self.metrics = {
-            'db_queries': [],
-            'cache_hits': 0,
-            'cache_misses': 0,
-            'slow_requests': [],
-            'api_calls': {},
-        }
+        self._lock = threading.Lock()
+        self.reset_metrics()
     
     def log_db_query(self, query, duration):
         """  """
         if duration > 0.1:  # 100ms 
-            self.metrics['db_queries'].append({
-                'query': query,
-                'duration': duration,
-                'timestamp': datetime.now().isoformat()
-            })
+            slow_db_queries.inc()
+            with self._lock:
+                self.metrics['db_queries'].append({
+                    'query': query,
+                    'duration': duration,
+                    'timestamp': datetime.now().isoformat()
+                })
     
     def log_cache_hit(self):
         """  """
-        self.metrics['cache_hits'] += 1
+        cache_requests.inc(result='hit')
     
     def log_cache_miss(self):
         """  """
-        self.metrics['cache_misses'] += 1
+        cache_requests.inc(result='miss')
     
     def log_slow_request(self, path, duration):
         """  """
         if duration > 1.0:  # 1 
-            self.metrics['slow_requests'].append({
-                'path': path,
-                'duration': duration,
-                'timestamp': datetime.now().isoformat()
-            })
+            with self._lock:
+                self.metrics['slow_requests'].append({
+                    'path': path,
+                    'duration': duration,
+                    'timestamp': datetime.now().isoformat()
+                })
     
     def get_metrics(self):
         """ """
-        return self.metrics.copy()
+        with self._lock:
+            return {
+                'db_queries': list(self.metrics['db_queries']),
+                'cache_hits': cache_requests.value(result='hit'),
+                'cache_misses': cache_requests.value(result='miss'),
+                'slow_requests': list(self.metrics['slow_requests']),
+                'api_calls': dict(self.metrics['api_calls']),
+            }
     
     def reset_metrics(self):
         """ """
-        self.metrics = {
-            'db_queries': [],
-            'cache_hits': 0,
-            'cache_misses': 0,
-            'slow_requests': [],
-            'api_calls': {},
-        }
+        # Counters live in core.metrics and are not reset here
+        with self._lock:
+            self.metrics = {
+                'db_queries': deque(maxlen=self.MAX_SAMPLES),
+                'slow_requests': deque(maxlen=self.MAX_SAMPLES),
+                'api_calls': {},
+            }
 
 
 #   
@@ -5,3 +5,7 @@ class FeedbacksConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "feedbacks"
     verbose_name = " "
+
+    def ready(self):
+        # Registers the video queue gauges with core.metrics
+        import feedbacks.scheduler
@@ -0,0 +1,338 @@
+"""
+Feedback review chat over WebSocket (ChatConsumer)
+
+Client events are JSON objects with a ``type``:
+
+    message   {"text"}                          -> FeedBackMessage
+    comment   {"text", "timestamp", "comment_type", "title", "section",
+               "security", "display_mode", "nickname"}  -> FeedBackComment
+    typing    {"typing": bool}
+    cursor    {"position": seconds}
+
+plus an optional ``client_id`` that is echoed back with the stored row.
+parse_event() validates them; anything else is answered with an error event.
+
+Writes are not made per event. RoomBatcher collects the rows of every room
+of the process and, FLUSH_INTERVAL after the first one, stores them with one
+bulk_create per model and publishes one ``chat.batch`` group message per
+room. typing/cursor events ride on the same tick and are coalesced to the
+latest value per user, so a room of typists costs one publish per tick.
+
+Each connection has token buckets for stored and for presence events, and
+a bounded outbox: presence updates overwrite each other, and a client that
+falls SEND_QUEUE_SIZE stored events behind is disconnected (it reloads the
+history over REST when it reconnects).
+"""
+
+import asyncio
+import json
+import logging
+import math
+import time
+
+from channels.db import database_sync_to_async
+from channels.layers import get_channel_layer
+from django.db import transaction
+
+from .models import FeedBack, FeedBackComment, FeedBackMessage
+from .serializers import FeedBackCommentSerializer
+from .views import has_project_access
+
+logger = logging.getLogger(__name__)
+
+STORED_EVENTS = ('message', 'comment')
+PRESENCE_EVENTS = ('typing', 'cursor')
+
+MAX_FRAME_SIZE = 16 * 1024
+MAX_TEXT_LENGTH = 5000
+MAX_FIELD_LENGTH = 500
+MAX_CLIENT_ID_LENGTH = 64
+
+FLUSH_INTERVAL = 0.1  # seconds between the first queued event and its write
+MAX_BATCH_SIZE = 500  # rows that trigger an early flush
+
+# (events per second, burst) per connection
+STORED_RATE = (2.0, 10)
+PRESENCE_RATE = (20.0, 40)
+
+# Stored events a connection may have waiting to be sent
+SEND_QUEUE_SIZE = 200
+CLOSE_UNAUTHORIZED = 4403
+CLOSE_TOO_SLOW = 4008
+
+
+def group_name(feedback_id):
+    return f"chat_{feedback_id}"
+
+
+class InvalidEvent(ValueError):
+    pass
+
+
+def _text(data, key, required=False, max_length=MAX_FIELD_LENGTH):
+    value = data.get(key)
+    if value is None and not required:
+        return None
+    if not isinstance(value, str) or (required and not value.strip()):
+        raise InvalidEvent(f"'{key}' must be a non-empty string" if required else f"'{key}' must be a string")
+    if len(value) > max_length:
+        raise InvalidEvent(f"'{key}' is longer than {max_length} characters")
+    return value
+
+
+def _choice(data, key, choices, default):
+    value = data.get(key, default)
+    if value not in dict(choices):
+        raise InvalidEvent(f"'{key}' must be one of {', '.join(dict(choices))}")
+    return value
+
+
+def _seconds(data, key, required=False):
+    value = data.get(key)
+    if value is None and not required:
+        return None
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value) or value < 0:
+        raise InvalidEvent(f"'{key}' must be a non-negative number")
+    return float(value)
+
+
+def parse_event(text_data):
+    """Validated, normalised event dict; raises InvalidEvent"""
+    if not text_data or len(text_data) > MAX_FRAME_SIZE:
+        raise InvalidEvent("Empty or oversized frame")
+    try:
+        data = json.loads(text_data)
+    except ValueError:
+        raise InvalidEvent("Frame is not JSON")
+    if not isinstance(data, dict):
+        raise InvalidEvent("Event must be an object")
+
+    event_type = data.get('type')
+    event = {'type': event_type}
+    client_id = data.get('client_id')
+    if client_id is not None:
+        if not isinstance(client_id, (str, int)) or isinstance(client_id, bool) or len(str(client_id)) > MAX_CLIENT_ID_LENGTH:
+            raise InvalidEvent("'client_id' must be a short string or number")
+        event['client_id'] = client_id
+
+    if event_type == 'message':
+        event['text'] = _text(data, 'text', required=True, max_length=MAX_TEXT_LENGTH)
+    elif event_type == 'comment':
+        event['text'] = _text(data, 'text', required=True, max_length=MAX_TEXT_LENGTH)
+        event['timestamp'] = _seconds(data, 'timestamp')
+        event['comment_type'] = _choice(data, 'comment_type', FeedBackComment.TYPE_CHOICES, 'general')
+        event['display_mode'] = _choice(data, 'display_mode', FeedBackComment.DISPLAY_MODE_CHOICES, 'anonymous')
+        event['title'] = _text(data, 'title')
+        event['section'] = _text(data, 'section')
+        event['nickname'] = _text(data, 'nickname', max_length=20)
+        security = data.get('security', False)
+        if not isinstance(security, bool):
+            raise InvalidEvent("'security' must be a boolean")
+        event['security'] = security
+    elif event_type == 'typing':
+        typing = data.get('typing', True)
+        if not isinstance(typing, bool):
+            raise InvalidEvent("'typing' must be a boolean")
+        event['typing'] = typing
+    elif event_type == 'cursor':
+        event['position'] = _seconds(data, 'position', required=True)
+    else:
+        raise InvalidEvent(f"Unknown event type {event_type!r}")
+    return event
+
+
+def build_row(event, feedback_id, user):
+    """Unsaved FeedBackMessage / FeedBackComment for a stored event"""
+    if event['type'] == 'message':
+        return FeedBackMessage(feedback_id=feedback_id, user=user, text=event['text'])
+    return FeedBackComment(
+        feedback_id=feedback_id,
+        user=user,
+        text=event['text'],
+        timestamp=event['timestamp'],
+        type=event['comment_type'],
+        title=event['title'],
+        section=event['section'],
+        security=event['security'],
+        display_mode=event['display_mode'],
+        nickname=event['nickname'],
+    )
+
+
+def row_data(row):
+    if isinstance(row, FeedBackComment):
+        data = FeedBackCommentSerializer(row).data
+        return {**data, 'type': 'comment', 'comment_type': data['type']}
+    # FeedBackMessageSerializer without the reaction queries; a new message has none
+    return {
+        'type': 'message',
+        'id': row.id,
+        'feedback': row.feedback_id,
+        'user': row.user_id,
+        'user_name': row.user.username,
+        'text': row.text,
+        'status': row.status,
+        'reactions': [],
+        'reaction_counts': {},
+        'created': row.created.isoformat(),
+        'updated': row.updated.isoformat(),
+    }
+
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def take(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+def _bulk_store(rows):
+    with transaction.atomic():
+        for model in (FeedBackMessage, FeedBackComment):
+            batch = [row for row in rows if isinstance(row, model)]
+            if batch:
+                model.objects.bulk_create(batch)
+
+
+def _store(rows):
+    """bulk_create per model; returns the rows' data in order, None for rows that could not be stored"""
+    try:
+        _bulk_store(rows)
+        stored = rows
+    except Exception as e:
+        # One bad row (feedback or user deleted mid-tick) must not reject every room's events
+        logger.warning(f"Chat batch of {len(rows)} events failed, storing them one by one: {e}")
+        stored = []
+        for row in rows:
+            row.pk = None  # may be set by a rolled-back insert
+            row._state.adding = True
+            try:
+                _bulk_store([row])
+            except Exception as e:
+                logger.error(f"Failed to store chat event of feedback {row.feedback_id}: {e}")
+                continue
+            stored.append(row)
+
+    # bulk_create sends no post_save; do what projects.signals does for comments once
+    feedback_ids = {row.feedback_id for row in stored if isinstance(row, FeedBackComment)}
+    if feedback_ids:
+        from projects import dashboard
+        project_ids = FeedBack.objects.filter(id__in=feedback_ids).values_list('project_id', flat=True)
+        dashboard.invalidate_users(dashboard.project_user_ids(list(project_ids)))
+    stored_ids = {id(row) for row in stored}
+    return [row_data(row) if id(row) in stored_ids else None for row in rows]
+
+
+class RoomBatcher:
+    """Per-process write and publish batching of all chat rooms (one event loop)"""
+
+    def __init__(self, flush_interval=FLUSH_INTERVAL, max_batch_size=MAX_BATCH_SIZE):
+        self.flush_interval = flush_interval
+        self.max_batch_size = max_batch_size
+        self._rows = []      # (group, sender channel, row, client_id)
+        self._presence = {}  # group -> {(user id, type): event}
+        self._timer = None
+        self._tasks = set()
+        self._lock = asyncio.Lock()
+
+    def _spawn(self, coro):
+        task = asyncio.ensure_future(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    def _schedule(self):
+        if len(self._rows) >= self.max_batch_size:
+            self._spawn(self.flush())
+        elif self._timer is None:
+            self._timer = self._spawn(self._flush_later())
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.flush_interval)
+        self._timer = None
+        await self.flush()
+
+    def add_row(self, group, channel, row, client_id=None):
+        self._rows.append((group, channel, row, client_id))
+        self._schedule()
+
+    def add_presence(self, group, user_id, event):
+        self._presence.setdefault(group, {})[(user_id, event['type'])] = event
+        self._schedule()
+
+    async def flush(self):
+        rows, self._rows = self._rows, []
+        presence, self._presence = self._presence, {}
+        if not rows and not presence:
+            return
+
+        channel_layer = get_channel_layer()
+        events = {group: list(updates.values()) for group, updates in presence.items()}
+        async with self._lock:  # keeps the order of stored events across flushes
+            if rows:
+                try:
+                    stored = await database_sync_to_async(_store)([row for _, _, row, _ in rows])
+                except Exception as e:
+                    logger.error(f"Failed to store {len(rows)} chat events: {e}")
+                    stored = None
+                for index, (group, channel, _, client_id) in enumerate(rows):
+                    data = stored[index] if stored else None
+                    if data is None:
+                        # Only the sender learns about it
+                        error = error_event('not_saved', "Event could not be saved", client_id)
+                        await self._publish(channel_layer.send, channel, [error])
+                        continue
+                    if client_id is not None:
+                        data = {**data, 'client_id': client_id}
+                    events.setdefault(group, []).append(data)
+
+            for group, group_events in events.items():
+                await self._publish(channel_layer.group_send, group, group_events)
+
+    async def _publish(self, send, name, events):
+        try:
+            await send(name, {'type': 'chat.batch', 'events': events})
+        except Exception as e:
+            logger.warning(f"Failed to publish chat events to {name}: {e}")
+
+
+def error_event(code, message, client_id=None):
+    event = {'type': 'error', 'code': code, 'message': message}
+    if client_id is not None:
+        event['client_id'] = client_id
+    return event
+
+
+_batchers = {}
+
+
+def get_batcher():
+    """The RoomBatcher of the running event loop"""
+    loop = asyncio.get_running_loop()
+    batcher = _batchers.get(loop)
+    if batcher is None:
+        for other in [other for other in _batchers if other.is_closed()]:
+            del _batchers[other]
+        batcher = _batchers[loop] = RoomBatcher()
+    return batcher
+
+
+@database_sync_to_async
+def load_room(feedback_id, user):
+    """The feedback if ``user`` may chat in its room, else None"""
+    if not user or not user.is_authenticated:
+        return None
+    feedback = FeedBack.objects.select_related('project').filter(id=feedback_id).first()
+    if feedback is None or not has_project_access(feedback.project, user):
+        return None
+    return feedback
@@ -1,57 +1,129 @@
-from asgiref.sync import async_to_sync
+from asgiref.sync import async_to_sync, sync_to_async
 from channels.generic.websocket import WebsocketConsumer, AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
+import asyncio
 import json
+import logging
+from collections import deque
 from users.models import User
+from . import chat, progress
+
+logger = logging.getLogger(__name__)
 
 
 class ChatConsumer(AsyncWebsocketConsumer):
-    # async def connect(self):
-    #     self.username = await self.get_name()
-    #     # await database_sync_to_async(self.get_name)()
-
-    # @database_sync_to_async
-    # def get_name(self):
-    #     user = User.objects.get(id=self.user_id)
-    #     if user.nickname:
-    #         return user.nickname
-    #     else:
-    #         return user.username
-
-    #    
+    """Review chat of one feedback; see feedbacks.chat for the protocol"""
+
     async def connect(self):
         # self.scope['url_route'] = /ws/localhost:8000/ws/chat/1
         self.feedback = self.scope["url_route"]["kwargs"]["feedback_id"]
+        self.user = self.scope.get("user")
+
+        if await chat.load_room(self.feedback, self.user) is None:
+            await self.close(code=chat.CLOSE_UNAUTHORIZED)
+            return
 
-        #     -> 
-        self.feedback_group_name = "chat_%s" % self.feedback
+        self.feedback_group_name = chat.group_name(self.feedback)
+        self.batcher = chat.get_batcher()
+        self.stored_bucket = chat.TokenBucket(*chat.STORED_RATE)
+        self.presence_bucket = chat.TokenBucket(*chat.PRESENCE_RATE)
+        self.typing = False
+
+        # Outgoing events; the writer drains them into one frame per send
+        self.outbox = deque()
+        self.presence = {}
+        self.outbox_ready = asyncio.Event()
+        self.writer = asyncio.ensure_future(self.write_outbox())
 
-        # Join room group -> group     
-        # ->     
         await self.channel_layer.group_add(self.feedback_group_name, self.channel_name)
+        await self.accept()
+
+    async def disconnect(self, close_code):
+        if not hasattr(self, "writer"):
+            return
+        self.writer.cancel()
+        if self.typing:
+            self.batcher.add_presence(
+                self.feedback_group_name, self.user.id, {"type": "typing", "user": self.user.id, "typing": False}
+            )
+        await self.channel_layer.group_discard(self.feedback_group_name, self.channel_name)
+
+    async def receive(self, text_data=None, bytes_data=None):
+        try:
+            event = chat.parse_event(text_data)
+        except chat.InvalidEvent as e:
+            self.queue([chat.error_event("invalid", str(e))])
+            return
+
+        if event["type"] in chat.PRESENCE_EVENTS:
+            # Dropped silently over the limit; the next one carries the state anyway
+            if self.presence_bucket.take():
+                if event["type"] == "typing":
+                    self.typing = event["typing"]
+                event["user"] = self.user.id
+                self.batcher.add_presence(self.feedback_group_name, self.user.id, event)
+            return
+
+        client_id = event.get("client_id")
+        if not self.stored_bucket.take():
+            self.queue([chat.error_event("rate_limited", "Too many messages", client_id)])
+            return
+        row = chat.build_row(event, self.feedback, self.user)
+        self.batcher.add_row(self.feedback_group_name, self.channel_name, row, client_id)
+
+    async def chat_batch(self, event):
+        # event => {"type": "chat.batch", "events": [...]} from chat.RoomBatcher
+        self.queue(event["events"])
 
+    def queue(self, events):
+        for event in events:
+            if event["type"] in chat.PRESENCE_EVENTS:
+                if event["user"] != self.user.id:
+                    self.presence[(event["user"], event["type"])] = event
+            else:
+                self.outbox.append(event)
+        if len(self.outbox) > chat.SEND_QUEUE_SIZE:
+            logger.warning(f"Closing slow chat connection {self.channel_name}")
+            self.outbox.clear()
+            self.writer.cancel()
+            asyncio.ensure_future(self.close(code=chat.CLOSE_TOO_SLOW))
+            return
+        self.outbox_ready.set()
+
+    async def write_outbox(self):
+        while True:
+            await self.outbox_ready.wait()
+            self.outbox_ready.clear()
+            events = list(self.outbox) + list(self.presence.values())
+            self.outbox.clear()
+            self.presence.clear()
+            if events:
+                await self.send(text_data=json.dumps({"result": events}))
+
+
+class EncodingProgressConsumer(AsyncWebsocketConsumer):
+    """Pushes feedbacks.progress updates of one feedback's encoding"""
+
+    async def connect(self):
+        self.feedback = self.scope["url_route"]["kwargs"]["feedback_id"]
+
+        # Same audience as the feedback's chat room
+        if await chat.load_room(self.feedback, self.scope.get("user")) is None:
+            await self.close(code=chat.CLOSE_UNAUTHORIZED)
+            return
+
+        self.progress_group_name = progress.group_name(self.feedback)
+        await self.channel_layer.group_add(self.progress_group_name, self.channel_name)
         await self.accept()
 
-    #     
+        # Current value first, so a late subscriber does not wait for the next update
+        latest = await sync_to_async(progress.get_progress)(self.feedback)
+        if latest:
+            await self.send(text_data=json.dumps({"result": latest}))
+
     async def disconnect(self, close_code):
-        # Leave room group
-        await self.channel_layer.group_discard(
-            self.feedback_group_name, self.channel_name
-        )
-
-    #    
-    async def receive(self, text_data):
-        # receive react to django
-        text_data_json = json.loads(text_data)
-        # message = text_data_json["message"]
-        await self.channel_layer.group_send(
-            self.feedback_group_name,
-            {"type": "chat_message", "message": text_data_json},
-        )
-
-    #    
-    async def chat_message(self, event):
-        # event => {"type": "chat_message", "message": text_data}
-        message = event["message"]
-        # Send message to WebSocket django to react
-        await self.send(text_data=json.dumps({"result": message}))
+        if hasattr(self, "progress_group_name"):
+            await self.channel_layer.group_discard(self.progress_group_name, self.channel_name)
+
+    async def encoding_progress(self, event):
+        await self.send(text_data=json.dumps({"result": event["progress"]}))
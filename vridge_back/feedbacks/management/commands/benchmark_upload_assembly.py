@@ -0,0 +1,69 @@
+"""
+Chunked upload assembly throughput benchmark
+: python manage.py benchmark_upload_assembly --size-mb 2048 --chunk-mb 10
+"""
+import os
+import resource
+import time
+import uuid
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from feedbacks import uploads
+
+
+class Command(BaseCommand):
+    help = 'Measure chunk assembly and storage throughput for large uploads'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size-mb', type=int, default=2048, help='Total upload size (default 2GB)')
+        parser.add_argument('--chunk-mb', type=int, default=10, help='Chunk size sent by the client')
+        parser.add_argument('--legacy', action='store_true', help='Also time the old read()/write() assembly')
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_mb'] * 1024 * 1024
+        total_size = options['size_mb'] * 1024 * 1024
+        total_chunks = -(-total_size // chunk_size)
+        upload_id = f"benchmark-{uuid.uuid4()}"
+        stored_name = None
+
+        try:
+            self.stdout.write(f"Writing {total_chunks} chunks of {options['chunk_mb']}MB...")
+            os.makedirs(uploads.upload_dir(upload_id), exist_ok=True)
+            block = os.urandom(chunk_size)
+            for index in range(total_chunks):
+                with open(uploads.chunk_path(upload_id, index), 'wb') as f:
+                    f.write(block[:min(chunk_size, total_size - index * chunk_size)])
+
+            if options['legacy']:
+                legacy_path = os.path.join(uploads.upload_dir(upload_id), 'legacy')
+                started = time.perf_counter()
+                with open(legacy_path, 'wb') as final_file:
+                    for index in range(total_chunks):
+                        with open(uploads.chunk_path(upload_id, index), 'rb') as chunk_file:
+                            final_file.write(chunk_file.read())
+                self._report('legacy assembly', total_size, time.perf_counter() - started)
+                os.remove(legacy_path)
+
+            started = time.perf_counter()
+            assembled_path = uploads.assemble_chunks(upload_id, total_chunks)
+            self._report('assembly', total_size, time.perf_counter() - started)
+
+            started = time.perf_counter()
+            with open(assembled_path, 'rb') as f:
+                stored_name = default_storage.save(
+                    f'{uploads.TEMP_UPLOAD_DIR}/{upload_id}.bin', uploads.AssembledFile(f, name='benchmark.bin')
+                )
+            self._report('storage', total_size, time.perf_counter() - started)
+
+            peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+            self.stdout.write(self.style.SUCCESS(f"Peak RSS: {peak_mb:.0f}MB"))
+        finally:
+            uploads.remove_upload(upload_id)
+            if stored_name:
+                default_storage.delete(stored_name)
+
+    def _report(self, label, size, elapsed):
+        throughput = size / (1024 * 1024) / elapsed if elapsed else float('inf')
+        self.stdout.write(f"{label}: {elapsed:.2f}s ({throughput:.0f}MB/s)")
@@ -0,0 +1,15 @@
+"""
+Remove expired chunked upload sessions and orphaned temp_uploads/ directories
+: python manage.py cleanup_uploads
+"""
+from django.core.management.base import BaseCommand
+
+from feedbacks import uploads
+
+
+class Command(BaseCommand):
+    help = 'Garbage-collect expired chunked uploads'
+
+    def handle(self, *args, **options):
+        removed = uploads.cleanup_expired_uploads()
+        self.stdout.write(self.style.SUCCESS(f"Removed {removed} expired uploads"))
@@ -0,0 +1,255 @@
+"""
+Conditional and partial-content responses for feedback media
+
+serve_file() answers If-None-Match / If-Modified-Since with 304 and a
+single-range ``Range`` header (honouring ``If-Range``) with 206. The bytes
+themselves are handed to the front server when MEDIA_OFFLOAD is set:
+
+    'x-accel-redirect'  nginx; X-Accel-Redirect to MEDIA_ACCEL_REDIRECT_PREFIX
+                        (an ``internal`` location aliased to MEDIA_ROOT, see
+                        nginx.conf). nginx applies Range/If-Range itself.
+    'x-sendfile'        Apache mod_xsendfile / lighttpd; X-Sendfile with the
+                        absolute path.
+
+Without offload the file is returned as a FileResponse, which gunicorn
+sends with sendfile(2) from the requested offset.
+"""
+
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified
+from django.utils.http import http_date, parse_http_date_safe, parse_etags
+
+OFFLOAD_ACCEL_REDIRECT = 'x-accel-redirect'
+OFFLOAD_SENDFILE = 'x-sendfile'
+
+CACHE_CONTROL = 'private, max-age=3600'
+# For URLs that change whenever the content does (versioned sprite directories)
+IMMUTABLE_CACHE_CONTROL = 'private, max-age=31536000, immutable'
+
+# Only single ranges are served partially; anything else gets the whole file
+_RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+MIME_TYPES = {
+    '.m3u8': 'application/vnd.apple.mpegurl',
+    '.mpd': 'application/dash+xml',
+    '.m4s': 'video/iso.segment',
+    '.ts': 'video/mp2t',
+    '.vtt': 'text/vtt',
+    '.webp': 'image/webp',
+}
+
+FILE_FIELDS = {
+    'original': 'files',
+    'web': 'video_file_web',
+    'thumbnail': 'thumbnail',
+}
+QUALITY_FIELDS = {
+    'high': 'video_file_high',
+    'medium': 'video_file_medium',
+    'low': 'video_file_low',
+}
+
+
+class RangeNotSatisfiable(ValueError):
+    pass
+
+
+class RangeFile:
+    """``length`` bytes of ``file`` starting at ``start``
+
+    fileno() is kept so that the WSGI server can still sendfile(); the
+    descriptor is positioned at ``start`` and Content-Length bounds the count.
+    """
+
+    def __init__(self, file, start, length):
+        file.seek(start)
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size is None or size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
+
+
+def file_etag(stat):
+    """Strong validator in nginx's format, so offloaded responses agree"""
+    return f'"{int(stat.st_mtime):x}-{stat.st_size:x}"'
+
+
+def content_type_for(path):
+    ext = os.path.splitext(path)[1].lower()
+    if ext in MIME_TYPES:
+        return MIME_TYPES[ext]
+    content_type, _ = mimetypes.guess_type(path)
+    return content_type or 'application/octet-stream'
+
+
+def parse_range(header, size):
+    """(start, end) inclusive for a single-range header, or None to send it all
+
+    Raises RangeNotSatisfiable when the range lies beyond the file.
+    """
+    match = _RANGE_RE.match(header.strip())
+    if not match or not any(match.groups()):
+        return None
+    first, last = match.groups()
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            raise RangeNotSatisfiable(header)
+        return max(size - length, 0), size - 1
+    start = int(first)
+    if start >= size:
+        raise RangeNotSatisfiable(header)
+    end = int(last) if last else size - 1
+    if end < start:
+        return None
+    return start, min(end, size - 1)
+
+
+def _within(path, root):
+    root = os.path.realpath(root)
+    path = os.path.realpath(path)
+    return os.path.commonpath([path, root]) == root
+
+
+def _media_url_dir(url):
+    """Directory under MEDIA_ROOT of a MEDIA_URL-based file URL"""
+    if not url or not url.startswith(settings.MEDIA_URL):
+        return None
+    return os.path.join(settings.MEDIA_ROOT, os.path.dirname(url[len(settings.MEDIA_URL):]))
+
+
+def sprite_track_name(feedback):
+    """``name`` of the WebVTT preview track for the 'sprites' variant, or None"""
+    sprites_dir = _media_url_dir(feedback.thumbnail_track_url)
+    if not sprites_dir:
+        return None
+    version = sprites_dir.rsplit('_', 1)[-1]
+    return f'{version}/{os.path.basename(feedback.thumbnail_track_url)}'
+
+
+def feedback_media_path(feedback, variant, name=None):
+    """Absolute path of one of ``feedback``'s files, or None
+
+    variant: 'original', 'web', 'thumbnail', 'high', 'medium', 'low',
+    'hls' with ``name`` a file inside the adaptive streaming directory, or
+    'sprites' with ``name`` '<version>/<file>' (see sprite_track_name()).
+    """
+    path = None
+    if variant in FILE_FIELDS:
+        field_file = getattr(feedback, FILE_FIELDS[variant])
+        if field_file:
+            path = field_file.path
+    elif variant in QUALITY_FIELDS:
+        path = getattr(feedback, QUALITY_FIELDS[variant]) or None
+    elif variant == 'hls' and name:
+        hls_dir = _media_url_dir(feedback.hls_playlist_url)
+        if hls_dir:
+            path = os.path.join(hls_dir, name)
+            if not _within(path, hls_dir):
+                return None
+    elif variant == 'sprites' and name:
+        sprites_dir = _media_url_dir(feedback.thumbnail_track_url)
+        version, _, name = name.partition('/')
+        # A stale version must not be served under the immutable headers
+        if sprites_dir and name and sprites_dir.endswith(f'_{version}'):
+            path = os.path.join(sprites_dir, name)
+            if not _within(path, sprites_dir):
+                return None
+    if not path or not _within(path, settings.MEDIA_ROOT):
+        return None
+    return path
+
+
+def _not_modified(request, etag, mtime):
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match:
+        etags = parse_etags(if_none_match)
+        return '*' in etags or etag in etags or f'W/{etag}' in etags
+    if_modified_since = parse_http_date_safe(request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+    return if_modified_since is not None and int(mtime) <= if_modified_since
+
+
+def _range_applies(request, etag, mtime):
+    """If-Range: only a validator matching the current file keeps the Range"""
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if not if_range:
+        return True
+    if if_range.startswith('"') or if_range.startswith('W/'):
+        return if_range == etag
+    return parse_http_date_safe(if_range) == int(mtime)
+
+
+def _offload(path, content_type):
+    backend = getattr(settings, 'MEDIA_OFFLOAD', '')
+    if backend == OFFLOAD_ACCEL_REDIRECT:
+        relative = os.path.relpath(path, settings.MEDIA_ROOT).replace(os.sep, '/')
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = settings.MEDIA_ACCEL_REDIRECT_PREFIX + quote(relative)
+        return response
+    if backend == OFFLOAD_SENDFILE:
+        response = HttpResponse(content_type=content_type)
+        response['X-Sendfile'] = path
+        return response
+    return None
+
+
+def serve_file(request, path, content_type=None, cache_control=CACHE_CONTROL):
+    """Response for a file under MEDIA_ROOT; raises FileNotFoundError"""
+    stat = os.stat(path)
+    etag = file_etag(stat)
+    content_type = content_type or content_type_for(path)
+
+    if _not_modified(request, etag, stat.st_mtime):
+        response = HttpResponseNotModified()
+    else:
+        response = _offload(path, content_type)
+        if response is None:
+            response = _file_response(request, path, stat, etag, content_type)
+
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    response['Accept-Ranges'] = 'bytes'
+    response['Cache-Control'] = cache_control
+    return response
+
+
+def _file_response(request, path, stat, etag, content_type):
+    size = stat.st_size
+    byte_range = None
+    range_header = request.META.get('HTTP_RANGE')
+    if range_header and _range_applies(request, etag, stat.st_mtime):
+        try:
+            byte_range = parse_range(range_header, size)
+        except RangeNotSatisfiable:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+
+    if byte_range is None:
+        response = FileResponse(open(path, 'rb'), content_type=content_type)
+        response['Content-Length'] = str(size)
+        return response
+
+    start, end = byte_range
+    length = end - start + 1
+    response = FileResponse(RangeFile(open(path, 'rb'), start, length), status=206, content_type=content_type)
+    response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response['Content-Length'] = str(length)
+    return response
@@ -0,0 +1,95 @@
+"""
+Content-addressed index of encoded feedback videos
+
+Every processed upload is recorded as a MediaAsset under the SHA-256 of the
+original file, together with its probe metadata and the feedback that owns
+the encoded outputs. An upload whose hash is already indexed (the same cut
+sent again for the next review round) reuses those outputs instead of being
+encoded again.
+"""
+
+import hashlib
+import logging
+import os
+
+from django.db import IntegrityError
+
+from .models import MediaAsset
+
+logger = logging.getLogger(__name__)
+
+HASH_BUFFER_SIZE = 1024 * 1024
+
+# Everything process_video_upload produces for a feedback
+ENCODED_FIELDS = (
+    'video_file_web',
+    'thumbnail',
+    'video_file_high',
+    'video_file_medium',
+    'video_file_low',
+    'hls_playlist_url',
+    'thumbnail_track_url',
+    'duration',
+    'width',
+    'height',
+)
+
+
+def update_digest(digest, fd, count):
+    """Feed ``count`` bytes of ``fd`` (from offset 0) into ``digest``"""
+    offset = 0
+    while offset < count:
+        data = os.pread(fd, min(HASH_BUFFER_SIZE, count - offset), offset)
+        if not data:
+            break
+        digest.update(data)
+        offset += len(data)
+    return offset
+
+
+def file_sha256(path):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        digest = hashlib.sha256()
+        update_digest(digest, fd, os.fstat(fd).st_size)
+        return digest.hexdigest()
+    finally:
+        os.close(fd)
+
+
+def get_asset(sha256):
+    return MediaAsset.objects.select_related('feedback').filter(sha256=sha256).first()
+
+
+def _encoded_files_exist(feedback):
+    if feedback.encoding_status != 'completed' or not feedback.video_file_web:
+        return False
+    paths = [feedback.video_file_web.path]
+    paths += [getattr(feedback, f'video_file_{q}') for q in ('high', 'medium', 'low')]
+    return all(path and os.path.exists(path) for path in paths)
+
+
+def reuse_encoding(feedback, asset):
+    """Point ``feedback`` at the outputs of ``asset``; False if they are gone
+
+    Only the model is updated (not saved).
+    """
+    source = asset.feedback if asset else None
+    if source is None or source.pk == feedback.pk or not _encoded_files_exist(source):
+        return False
+    for field in ENCODED_FIELDS:
+        setattr(feedback, field, getattr(source, field))
+    feedback.encoding_status = 'completed'
+    return True
+
+
+def record(feedback, info):
+    """Index ``feedback``'s encoded outputs under its content hash"""
+    if not feedback.content_sha256:
+        return
+    defaults = {'size': info.get('size') or 0, 'info': info, 'feedback': feedback}
+    try:
+        MediaAsset.objects.update_or_create(sha256=feedback.content_sha256, defaults=defaults)
+    except IntegrityError:
+        # Indexed concurrently by an identical upload; either owner will do
+        logger.info(f"Media asset {feedback.content_sha256} already indexed")
@@ -1,3 +1,5 @@
+import uuid
+
 from django.db import models
 from core import models as core_model
 
@@ -77,6 +79,11 @@ class FeedBack(core_model.TimeStampedModel):
         verbose_name="HLS  URL", max_length=500, null=True, blank=True
     )
     
+    # Scrub previews: WebVTT track over the sprite sheets (versioned directory)
+    thumbnail_track_url = models.CharField(
+        verbose_name="  URL", max_length=500, null=True, blank=True
+    )
+    
     # Encoding status
     ENCODING_STATUS_CHOICES = [
         ('pending', ''),
@@ -99,6 +106,10 @@ class FeedBack(core_model.TimeStampedModel):
     width = models.IntegerField(verbose_name=" ", null=True, blank=True)
     height = models.IntegerField(verbose_name=" ", null=True, blank=True)
     file_size = models.BigIntegerField(verbose_name=" (bytes)", null=True, blank=True)
+    # SHA-256 of the original file; key into MediaAsset
+    content_sha256 = models.CharField(
+        verbose_name="SHA-256", max_length=64, null=True, blank=True, db_index=True
+    )
 
     class Meta:
         verbose_name = " "
@@ -344,3 +355,86 @@ class FeedbackFile(core_model.TimeStampedModel):
     
     def __str__(self):
         return f"{self.feedback} - {self.filename}"
+
+
+class UploadSession(core_model.TimeStampedModel):
+    """Resumable chunked video upload (feedbacks.uploads)"""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    project = models.ForeignKey(
+        "projects.Project",
+        related_name="upload_sessions",
+        on_delete=models.CASCADE,
+        verbose_name=""
+    )
+    user = models.ForeignKey(
+        "users.User",
+        related_name="upload_sessions",
+        on_delete=models.CASCADE,
+        verbose_name=""
+    )
+    filename = models.CharField(verbose_name="", max_length=255)
+    total_size = models.BigIntegerField(verbose_name=" (bytes)", null=True, blank=True)
+    total_chunks = models.PositiveIntegerField(verbose_name=" ")
+    expires_at = models.DateTimeField(verbose_name=" ", db_index=True)
+    feedback = models.OneToOneField(
+        FeedBack,
+        related_name="upload_session",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        verbose_name=""
+    )
+    
+    class Meta:
+        verbose_name = " "
+        verbose_name_plural = " "
+    
+    def __str__(self):
+        return f"{self.user} - {self.filename}"
+
+
+class UploadChunk(models.Model):
+    """One received chunk; the rows of a session form its chunk bitmap"""
+    session = models.ForeignKey(
+        UploadSession,
+        related_name="chunks",
+        on_delete=models.CASCADE,
+        verbose_name=""
+    )
+    index = models.PositiveIntegerField(verbose_name="")
+    size = models.BigIntegerField(verbose_name=" (bytes)")
+    checksum = models.CharField(verbose_name="SHA-256", max_length=64)
+    
+    class Meta:
+        verbose_name = " "
+        verbose_name_plural = " "
+        constraints = [
+            models.UniqueConstraint(fields=['session', 'index'], name='unique_upload_chunk'),
+        ]
+    
+    def __str__(self):
+        return f"{self.session_id} - {self.index}"
+
+
+class MediaAsset(core_model.TimeStampedModel):
+    """Content-addressed index of encoded videos (feedbacks.media_index)"""
+    sha256 = models.CharField(verbose_name="SHA-256", max_length=64, unique=True)
+    size = models.BigIntegerField(verbose_name=" (bytes)")
+    # VideoProcessor.get_video_info() of the content
+    info = models.JSONField(verbose_name=" ", default=dict, blank=True)
+    # Feedback whose encoded files (renditions, HLS, thumbnail) are shared
+    feedback = models.ForeignKey(
+        FeedBack,
+        related_name="+",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        verbose_name=""
+    )
+    
+    class Meta:
+        verbose_name = " "
+        verbose_name_plural = " "
+    
+    def __str__(self):
+        return self.sha256
@@ -0,0 +1,67 @@
+"""
+Encoding progress for feedback videos
+
+VideoProcessor reports ffmpeg's -progress output here; the latest value is
+kept in the cache for the status endpoints and pushed to the Channels group
+of the feedback (EncodingProgressConsumer), at most once per MIN_INTERVAL.
+"""
+
+import logging
+import time
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+PROGRESS_KEY = 'encoding_progress:{feedback_id}'
+PROGRESS_TIMEOUT = 86400
+MIN_INTERVAL = 1.0  # seconds between published updates
+
+
+def group_name(feedback_id):
+    return f"encoding_{feedback_id}"
+
+
+def get_progress(feedback_id):
+    """Latest {'status', 'progress', 'eta', 'speed', 'updated'} or None"""
+    return cache.get(PROGRESS_KEY.format(feedback_id=feedback_id))
+
+
+def publish(feedback_id, status, progress=0, eta=None, speed=None):
+    payload = {
+        'status': status,
+        'progress': round(progress, 1),
+        'eta': round(eta, 1) if eta is not None else None,
+        'speed': speed,
+        'updated': time.time(),
+    }
+    cache.set(PROGRESS_KEY.format(feedback_id=feedback_id), payload, PROGRESS_TIMEOUT)
+    try:
+        channel_layer = get_channel_layer()
+        if channel_layer is not None:
+            async_to_sync(channel_layer.group_send)(
+                group_name(feedback_id),
+                {'type': 'encoding_progress', 'progress': payload},
+            )
+    except Exception as e:
+        # Clients still see the value through the status endpoint
+        logger.warning(f"Failed to publish encoding progress for {feedback_id}: {e}")
+    return payload
+
+
+class ProgressReporter:
+    """Throttled ``on_progress`` callback for VideoProcessor"""
+
+    def __init__(self, feedback_id, min_interval=MIN_INTERVAL):
+        self.feedback_id = feedback_id
+        self.min_interval = min_interval
+        self._last_sent = 0.0
+
+    def __call__(self, progress, eta=None, speed=None):
+        now = time.monotonic()
+        if now - self._last_sent < self.min_interval:
+            return
+        self._last_sent = now
+        publish(self.feedback_id, 'processing', progress, eta, speed)
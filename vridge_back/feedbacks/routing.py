@@ -4,4 +4,5 @@ from . import consumers
 websocket_urlpatterns = [
     # url("ws/chat/<int:feedback>/<int:user_id>", consumers.ChatConsumer),
     path("ws/chat/<int:feedback_id>/", consumers.ChatConsumer.as_asgi()),
+    path("ws/encoding/<int:feedback_id>/", consumers.EncodingProgressConsumer.as_asgi()),
 ]
@@ -0,0 +1,260 @@
+"""
+Scheduling of video-processing jobs
+
+Encodes are not sent to the video_processing queue as soon as an upload
+finishes. submit() puts the job into a pending set in Redis and dispatch()
+hands jobs to Celery only while a worker slot is free:
+
+- Fairness: pending jobs are ordered by weighted-fair-queuing finish tags
+  per uploading user (start = max(virtual time, the user's last finish tag),
+  finish = start + cost / weight). A user who uploads thirty raw files
+  interleaves with everyone else instead of occupying the workers first.
+- Priority: a job's cost is its duration (estimated from the size when it
+  cannot be probed), so short clips get earlier tags; the Celery message
+  priority is derived from the same cost.
+- Caps: VIDEO_MAX_CONCURRENCY jobs run at once in total, at most
+  VIDEO_PROJECT_CONCURRENCY of them for the same project.
+
+A running job holds its slot until finish(), or until SLOT_TIMEOUT passes
+for a worker that died; the periodic dispatch task reclaims such slots. It
+also resubmits assembled uploads whose submit failed (requeue_stranded).
+Without a Redis cache backend jobs go straight to Celery.
+"""
+
+import json
+import logging
+import math
+import os
+import time
+import uuid
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from core.cache_optimization import get_redis_client
+from core.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+PENDING_KEY = 'video_jobs:pending'  # zset job id -> finish tag
+RUNNING_KEY = 'video_jobs:running'  # zset job id -> slot deadline
+JOBS_KEY = 'video_jobs:jobs'        # hash job id -> job
+FINISH_KEY = 'video_jobs:finish'    # hash user id -> last finish tag
+VTIME_KEY = 'video_jobs:vtime'      # start tag of the last dispatched job
+LOCK_KEY = 'video_jobs:lock'
+
+# Hard time limit plus the retries of process_video_upload
+SLOT_TIMEOUT = 4 * 3600
+# Cost of a job that could not be probed: ~8 Mbit/s source
+BYTES_PER_SECOND = 1024 * 1024
+# Age of an assembled, still pending upload without a job before it is resubmitted
+STRANDED_AFTER = 600
+# Pending jobs looked at per dispatch (jobs of capped projects are skipped)
+SCAN_LIMIT = 200
+# (cost up to, Celery priority); 0 is served first by the Redis transport
+PRIORITY_STEPS = ((120, 0), (600, 3), (1800, 6))
+LOWEST_PRIORITY = 9
+
+job_wait = registry.histogram(
+    'video_job_wait_seconds',
+    'Time video jobs spent pending before dispatch',
+    buckets=(1, 5, 15, 30, 60, 120, 300, 600, 1800, 3600),
+)
+
+
+def _client():
+    return get_redis_client()
+
+
+def _zcard(key):
+    client = _client()
+    return client.zcard(key) if client is not None else None
+
+
+registry.gauge('video_jobs_pending', 'Video jobs waiting for a worker slot', lambda: _zcard(PENDING_KEY))
+registry.gauge('video_jobs_running', 'Video jobs holding a worker slot', lambda: _zcard(RUNNING_KEY))
+
+
+def cpu_count():
+    """CPUs this process may use: its affinity mask, capped by a cgroup v2 quota"""
+    try:
+        count = len(os.sched_getaffinity(0))
+    except AttributeError:
+        count = os.cpu_count() or 1
+    try:
+        with open('/sys/fs/cgroup/cpu.max') as f:
+            quota, period = f.read().split()
+        if quota != 'max':
+            count = min(count, max(1, math.ceil(int(quota) / int(period))))
+    except (OSError, ValueError):
+        pass
+    return count
+
+
+def ffmpeg_threads():
+    """Thread budget of one encode, sharing the cores with the other worker slots"""
+    return max(1, cpu_count() // max(1, settings.VIDEO_WORKER_CONCURRENCY))
+
+
+def priority_for(cost):
+    for limit, priority in PRIORITY_STEPS:
+        if cost <= limit:
+            return priority
+    return LOWEST_PRIORITY
+
+
+def _send(job):
+    from .tasks import process_video_upload
+    process_video_upload.apply_async(
+        args=(job['feedback_id'],),
+        kwargs={'job_id': job['id']},
+        priority=job['priority'],
+    )
+
+
+def submit(feedback_id, project_id, user_id, size=0, duration=None, weight=1.0):
+    """Queue the encode of a feedback and return the job id"""
+    cost = duration or max(size / BYTES_PER_SECOND, 1.0)
+    job = {
+        'id': uuid.uuid4().hex,
+        'feedback_id': feedback_id,
+        'project_id': project_id,
+        'user_id': user_id,
+        'cost': cost,
+        'priority': priority_for(cost),
+        'submitted': time.time(),
+    }
+    client = _client()
+    if client is None:
+        _send(job)
+        return job['id']
+
+    with client.lock(LOCK_KEY, timeout=10, blocking_timeout=10):
+        vtime = float(client.get(VTIME_KEY) or 0)
+        last_finish = float(client.hget(FINISH_KEY, user_id) or 0)
+        job['start'] = max(vtime, last_finish)
+        job['finish'] = job['start'] + cost / weight
+        pipe = client.pipeline()
+        pipe.hset(JOBS_KEY, job['id'], json.dumps(job))
+        pipe.zadd(PENDING_KEY, {job['id']: job['finish']})
+        pipe.hset(FINISH_KEY, user_id, job['finish'])
+        pipe.execute()
+
+    dispatch()
+    return job['id']
+
+
+def submit_feedback(feedback):
+    """submit() with the cost taken from the media index or the (cached) probe"""
+    from . import media_index
+    from .video_utils import VideoProcessor
+
+    path = feedback.files.path
+    asset = media_index.get_asset(feedback.content_sha256) if feedback.content_sha256 else None
+    info = (asset.info if asset else None) or VideoProcessor.get_video_info(path) or {}
+    size = info.get('size') or os.path.getsize(path)
+    return submit(feedback.id, feedback.project_id, feedback.user_id, size, info.get('duration'))
+
+
+def requeue_stranded():
+    """submit_feedback() the assembled uploads that have no job; returns how many"""
+    from .models import FeedBack
+
+    client = _client()
+    if client is None:
+        # Jobs went straight to Celery: nothing tells a queued one apart
+        return 0
+    queued = {json.loads(data)['feedback_id'] for data in client.hvals(JOBS_KEY)}
+    stranded = (
+        FeedBack.objects.filter(
+            encoding_status='pending',
+            content_sha256__isnull=False,
+            updated__lt=timezone.now() - timedelta(seconds=STRANDED_AFTER),
+        )
+        .exclude(files='')
+        .exclude(id__in=queued)
+        .order_by('updated')[:SCAN_LIMIT]
+    )
+    requeued = 0
+    for feedback in stranded:
+        try:
+            submit_feedback(feedback)
+        except Exception as e:
+            logger.error(f"Failed to requeue the encode of feedback {feedback.id}: {e}")
+            continue
+        requeued += 1
+    return requeued
+
+
+def _load(client, job_id):
+    data = client.hget(JOBS_KEY, job_id)
+    return json.loads(data) if data else None
+
+
+def dispatch():
+    """Send pending jobs to Celery while slots are free; returns how many"""
+    client = _client()
+    if client is None:
+        return 0
+
+    now = time.time()
+    dispatched = []
+    with client.lock(LOCK_KEY, timeout=10, blocking_timeout=10):
+        # Slots of workers that died without finish()
+        for job_id in client.zrangebyscore(RUNNING_KEY, '-inf', now):
+            logger.warning(f"Reclaiming video job slot {job_id}")
+            client.zrem(RUNNING_KEY, job_id)
+            client.hdel(JOBS_KEY, job_id)
+
+        running = [_load(client, job_id) for job_id in client.zrange(RUNNING_KEY, 0, -1)]
+        free = settings.VIDEO_MAX_CONCURRENCY - len(running)
+        if free <= 0:
+            return 0
+        per_project = Counter(job['project_id'] for job in running if job)
+
+        for job_id in client.zrange(PENDING_KEY, 0, SCAN_LIMIT - 1):
+            job = _load(client, job_id)
+            if job is None:
+                client.zrem(PENDING_KEY, job_id)
+                continue
+            if per_project[job['project_id']] >= settings.VIDEO_PROJECT_CONCURRENCY:
+                continue
+            per_project[job['project_id']] += 1
+
+            pipe = client.pipeline()
+            pipe.zrem(PENDING_KEY, job_id)
+            pipe.zadd(RUNNING_KEY, {job_id: now + SLOT_TIMEOUT})
+            pipe.set(VTIME_KEY, max(job['start'], float(client.get(VTIME_KEY) or 0)))
+            pipe.execute()
+            dispatched.append(job)
+
+            free -= 1
+            if free == 0:
+                break
+
+    for job in dispatched:
+        job_wait.observe(now - job['submitted'])
+        try:
+            _send(job)
+        except Exception as e:
+            # Back in line with its old tag; the periodic dispatch retries it
+            logger.error(f"Failed to send video job {job['id']}: {e}")
+            pipe = client.pipeline()
+            pipe.zrem(RUNNING_KEY, job['id'])
+            pipe.zadd(PENDING_KEY, {job['id']: job['finish']})
+            pipe.execute()
+    return len(dispatched)
+
+
+def finish(job_id):
+    """Release the slot of a job and start the next ones"""
+    client = _client()
+    if client is None:
+        return
+    pipe = client.pipeline()
+    pipe.zrem(RUNNING_KEY, job_id)
+    pipe.hdel(JOBS_KEY, job_id)
+    pipe.execute()
+    dispatch()
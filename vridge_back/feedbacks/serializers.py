@@ -92,7 +92,7 @@ class FeedBackSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'project', 'project_name', 'user', 'user_name',
             'title', 'description', 'status',
-            'files', 'video_file', 'video_url', 'hls_url',
+            'files', 'video_file', 'video_url', 'hls_url', 'thumbnail_track_url',
             'video_file_web', 'video_file_high', 'video_file_medium', 'video_file_low',
             'thumbnail', 'encoding_status', 
             'duration', 'width', 'height', 'file_size',
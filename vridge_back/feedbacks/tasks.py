@@ -2,24 +2,34 @@
 Celery tasks for asynchronous video processing
 """
 from celery import shared_task
-from django.core.files.base import ContentFile
+from django.conf import settings
 from .models import FeedBack
 from .video_utils import VideoProcessor
+from . import media_index, progress, scheduler, uploads
+import hashlib
 import os
+import shutil
 import logging
+import tempfile
+import uuid
 from pathlib import Path
 
 logger = logging.getLogger(__name__)
 
 @shared_task(bind=True, max_retries=3)
-def process_video_upload(self, feedback_id):
+def process_video_upload(self, feedback_id, job_id=None):
     """
-    Process uploaded video file:
-    1. Create optimized web version
-    2. Generate thumbnail
-    3. Create multiple quality versions
-    4. Update feedback model with processed files
+    Process uploaded video file in a single ffmpeg pass:
+    0. Reuse the outputs of an identical earlier upload (media_index) instead
+    1. Create high/medium/low quality versions
+    2. Create HLS segments, a thumbnail and preview sprites from the same decode
+    3. Reuse the matching quality version as the web version
+    4. Move the outputs into place (rename, no copy) and update the model
+    
+    job_id is the feedbacks.scheduler slot, released when the task is done.
     """
+    work_dir = None
+    release_slot = True
     try:
         feedback = FeedBack.objects.get(id=feedback_id)
         if not feedback.video_file:
@@ -34,35 +44,94 @@ def process_video_upload(self, feedback_id):
         # Update status
         feedback.encoding_status = 'processing'
         feedback.save()
+        reporter = progress.ProgressReporter(feedback_id)
+        progress.publish(feedback_id, 'processing')
         
-        # 1. Generate thumbnail
-        thumbnail_path = file_dir / f"{file_name}_thumb.jpg"
-        if VideoProcessor.generate_thumbnail(original_path, str(thumbnail_path)):
-            with open(thumbnail_path, 'rb') as f:
-                feedback.thumbnail.save(f"{file_name}_thumb.jpg", ContentFile(f.read()))
-        
-        # 2. Create optimized web version
-        web_path = file_dir / f"{file_name}_web.mp4"
-        if VideoProcessor.optimize_for_web(original_path, str(web_path)):
-            with open(web_path, 'rb') as f:
-                feedback.video_file_web.save(f"{file_name}_web.mp4", ContentFile(f.read()))
-        
-        # 3. Create quality versions
-        quality_levels = ['high', 'medium', 'low']
-        for quality in quality_levels:
+        # Same content already encoded for another feedback: share its outputs
+        if not feedback.content_sha256:
+            feedback.content_sha256 = media_index.file_sha256(original_path)
+        asset = media_index.get_asset(feedback.content_sha256)
+        if media_index.reuse_encoding(feedback, asset):
+            feedback.save()
+            progress.publish(feedback_id, 'completed', 100)
+            logger.info(f"Reused encoding of feedback {asset.feedback_id} for feedback {feedback_id}")
+            return
+        
+        info = asset.info if asset and asset.info else VideoProcessor.get_video_info(original_path)
+        if not info:
+            raise RuntimeError(f"Could not probe {original_path}")
+        
+        # Same filesystem as the final location, so outputs are renamed into place
+        work_dir = tempfile.mkdtemp(prefix=f".{file_name}_", dir=file_dir)
+        encode = VideoProcessor.encode_renditions
+        if info['duration'] >= VideoProcessor.SEGMENTED_MIN_DURATION:
+            # Long edits: keyframe-aligned pieces encoded in parallel
+            encode = VideoProcessor.encode_segmented
+        mp4_qualities = ('high', 'medium', 'low')
+        outputs = encode(
+            original_path, work_dir, info,
+            # Never upscale: a 480p source gets no 1080p/720p rungs
+            qualities=VideoProcessor.source_ladder(info, mp4_qualities=mp4_qualities),
+            mp4_qualities=mp4_qualities,
+            abr_dir=os.path.join(work_dir, 'abr'),
+            sprites_dir=os.path.join(work_dir, 'sprites'),
+            on_progress=reporter,
+            threads=scheduler.ffmpeg_threads(),
+        )
+        if not outputs:
+            raise RuntimeError(f"Encoding failed for {original_path}")
+        
+        feedback.duration = info['duration']
+        feedback.width = info['width']
+        feedback.height = info['height']
+        
+        # 1. Thumbnail; a failed grab does not fail the encode
+        if outputs['thumbnail']:
+            uploads.store_upload(feedback.thumbnail, outputs['thumbnail'], f"{file_name}_thumb.jpg")
+        else:
+            logger.warning(f"No thumbnail for feedback {feedback_id}")
+        
+        # 2. Web version: a hard link to the rendition optimize_for_web() would pick,
+        #    or the highest one encoded when that rung is above the source
+        renditions = outputs['renditions']
+        web_quality = VideoProcessor.web_quality(info)
+        if web_quality not in renditions:
+            web_quality = next(quality for quality in VideoProcessor.ABR_LADDER if quality in renditions)
+        web_path = os.path.join(work_dir, 'web.mp4')
+        os.link(renditions[web_quality], web_path)
+        uploads.store_upload(feedback.video_file_web, web_path, f"{file_name}_web.mp4")
+        
+        # 3. Quality versions
+        for quality, rendition_path in outputs['renditions'].items():
             output_path = file_dir / f"{file_name}_{quality}.mp4"
-            if VideoProcessor.encode_video(original_path, str(output_path), quality):
-                # Save path to model (you'll need to add these fields)
-                setattr(feedback, f'video_file_{quality}', str(output_path))
+            os.replace(rendition_path, output_path)
+            setattr(feedback, f'video_file_{quality}', str(output_path))
+        
+        # 4. Adaptive streaming (HLS master playlist and DASH manifest)
+        if outputs['hls_playlist']:
+            hls_dir = file_dir / f"{file_name}_hls"
+            shutil.rmtree(hls_dir, ignore_errors=True)
+            os.replace(os.path.dirname(outputs['hls_playlist']), hls_dir)
+            relative_dir = os.path.relpath(hls_dir, settings.MEDIA_ROOT).replace(os.sep, '/')
+            feedback.hls_playlist_url = f"{settings.MEDIA_URL.rstrip('/')}/{relative_dir}/master.m3u8"
+        
+        # 5. Scrub preview sprites; the directory name changes with the content,
+        #    so they can be cached as immutable
+        if outputs['sprites']:
+            version = (feedback.content_sha256 or uuid.uuid4().hex)[:12]
+            sprites_dir = file_dir / f"{file_name}_sprites_{version}"
+            shutil.rmtree(sprites_dir, ignore_errors=True)
+            os.replace(os.path.dirname(outputs['sprites']), sprites_dir)
+            relative_dir = os.path.relpath(sprites_dir, settings.MEDIA_ROOT).replace(os.sep, '/')
+            feedback.thumbnail_track_url = (
+                f"{settings.MEDIA_URL.rstrip('/')}/{relative_dir}/{VideoProcessor.SPRITE_TRACK}"
+            )
         
         # Update status
         feedback.encoding_status = 'completed'
         feedback.save()
-        
-        # Clean up temporary files
-        for temp_file in [thumbnail_path, web_path]:
-            if temp_file.exists():
-                temp_file.unlink()
+        media_index.record(feedback, info)
+        progress.publish(feedback_id, 'completed', 100)
         
         logger.info(f"Successfully processed video for feedback {feedback_id}")
         
@@ -75,15 +144,23 @@ def process_video_upload(self, feedback_id):
             feedback = FeedBack.objects.get(id=feedback_id)
             feedback.encoding_status = 'failed'
             feedback.save()
+            progress.publish(feedback_id, 'failed')
         except:
             pass
-        # Retry the task
+        # Retry the task; the retry keeps the scheduler slot
+        release_slot = self.request.retries >= self.max_retries
         raise self.retry(exc=e, countdown=60)
+    finally:
+        # Clean up temporary files
+        if work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+        if job_id and release_slot:
+            scheduler.finish(job_id)
 
 @shared_task
 def create_hls_stream(feedback_id):
     """
-    Create HLS stream for video
+    Create the adaptive HLS/DASH ladder for video
     """
     try:
         feedback = FeedBack.objects.get(id=feedback_id)
@@ -95,7 +172,8 @@ def create_hls_stream(feedback_id):
         hls_dir = Path(original_path).parent / f"{file_name}_hls"
         
         if VideoProcessor.create_hls_stream(original_path, str(hls_dir)):
-            feedback.hls_playlist_url = f"/media/feedback_file/{file_name}_hls/playlist.m3u8"
+            relative_dir = os.path.relpath(hls_dir, settings.MEDIA_ROOT).replace(os.sep, '/')
+            feedback.hls_playlist_url = f"{settings.MEDIA_URL.rstrip('/')}/{relative_dir}/master.m3u8"
             feedback.save()
             logger.info(f"Created HLS stream for feedback {feedback_id}")
         
@@ -122,4 +200,67 @@ def check_video_processing_status(feedback_id):
         feedback.save()
         
     except Exception as e:
-        logger.error(f"Error checking video status: {str(e)}")
\ No newline at end of file
+        logger.error(f"Error checking video status: {str(e)}")
+
+@shared_task(bind=True, max_retries=3)
+def assemble_chunked_upload(self, feedback_id, upload_id, total_chunks, filename):
+    """
+    Concatenate the chunks of a finished chunked upload into feedback.files
+    """
+    try:
+        feedback = FeedBack.objects.get(id=feedback_id)
+        digest = hashlib.sha256()
+        assembled_path = uploads.assemble_chunks(upload_id, total_chunks, digest=digest)
+        uploads.store_upload(feedback.files, assembled_path, filename)
+        feedback.content_sha256 = digest.hexdigest()
+        feedback.save(update_fields=['files', 'content_sha256', 'updated'])
+        logger.info(f"Assembled upload {upload_id} for feedback {feedback_id}")
+        
+    except FeedBack.DoesNotExist:
+        logger.error(f"Feedback {feedback_id} not found")
+        uploads.remove_upload(upload_id)
+        return
+    except Exception as e:
+        logger.error(f"Error assembling upload {upload_id}: {str(e)}")
+        if self.request.retries >= self.max_retries:
+            FeedBack.objects.filter(id=feedback_id).update(encoding_status='failed')
+            uploads.remove_upload(upload_id)
+            raise
+        raise self.retry(exc=e, countdown=60)
+    
+    # The file is stored: a failed submit must not retry the assembly;
+    # dispatch_video_jobs queues the feedback later (scheduler.requeue_stranded)
+    try:
+        scheduler.submit_feedback(feedback)
+    except Exception as e:
+        logger.error(f"Error queueing the encode of feedback {feedback_id}: {str(e)}")
+    uploads.remove_upload(upload_id)
+
+
+@shared_task
+def dispatch_video_jobs():
+    """
+    Start pending video jobs and reclaim the slots of dead workers
+    """
+    try:
+        requeued = scheduler.requeue_stranded()
+        if requeued:
+            logger.info(f"Requeued {requeued} stranded video jobs")
+        dispatched = scheduler.dispatch()
+        if dispatched:
+            logger.info(f"Dispatched {dispatched} video jobs")
+    except Exception as e:
+        logger.error(f"Error dispatching video jobs: {str(e)}")
+
+
+@shared_task
+def cleanup_expired_uploads():
+    """
+    Garbage-collect expired upload sessions and their temp_uploads/ chunks
+    """
+    try:
+        removed = uploads.cleanup_expired_uploads()
+        if removed:
+            logger.info(f"Removed {removed} expired uploads")
+    except Exception as e:
+        logger.error(f"Error cleaning up uploads: {str(e)}")
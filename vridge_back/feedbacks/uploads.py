@@ -0,0 +1,230 @@
+"""
+Chunked video upload sessions and assembly
+
+An UploadSession records the upload; every received chunk is one
+UploadChunk row (unique per index), so chunks may arrive in any order, in
+parallel or more than once, and the rows tell a client what to resume.
+Each chunk is written to its own file and renamed into place once its
+SHA-256 is known.
+
+On completion the chunks are concatenated inside the kernel
+(copy_file_range, falling back to sendfile and then a plain pread/write
+loop), and the assembled file is handed to the storage backend as a
+temporary file: FileSystemStorage moves it into place with a rename
+instead of copying it a second time, remote storages stream it.
+"""
+
+import errno
+import hashlib
+import os
+import shutil
+import time
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.db import IntegrityError
+from django.utils import timezone
+
+from . import media_index
+from .models import UploadChunk, UploadSession
+
+TEMP_UPLOAD_DIR = 'temp_uploads'
+ASSEMBLED_NAME = 'assembled'
+
+# An idle session (no chunk for this long) is garbage-collected
+SESSION_TTL = timedelta(hours=24)
+
+# Bytes per copy_file_range/sendfile call; Linux caps a single call just under 2GB
+COPY_BLOCK_SIZE = 256 * 1024 * 1024
+# Buffer size of the userspace fallback
+FALLBACK_BUFFER_SIZE = 1024 * 1024
+
+# Errors meaning "this syscall cannot copy between these two files"
+_UNSUPPORTED_ERRNOS = {errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.EBADF}
+
+
+def upload_dir(upload_id):
+    return os.path.join(settings.MEDIA_ROOT, TEMP_UPLOAD_DIR, upload_id)
+
+
+def chunk_path(upload_id, index):
+    return os.path.join(upload_dir(upload_id), f'chunk_{index}')
+
+
+class ChunkChecksumMismatch(ValueError):
+    pass
+
+
+def write_chunk(upload_id, index, uploaded_file, expected_checksum=None):
+    """Store one chunk atomically and return (size, sha256 hex)
+
+    The data goes to a private file first, so parallel or repeated uploads
+    of the same index never leave a partially written chunk behind.
+    """
+    os.makedirs(upload_dir(upload_id), exist_ok=True)
+    final_path = chunk_path(upload_id, index)
+    part_path = f'{final_path}.{uuid.uuid4().hex}.part'
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with open(part_path, 'wb') as f:
+            for data in uploaded_file.chunks():
+                digest.update(data)
+                size += len(data)
+                f.write(data)
+        checksum = digest.hexdigest()
+        if expected_checksum and expected_checksum.lower() != checksum:
+            raise ChunkChecksumMismatch(f"Chunk {index} checksum mismatch")
+        os.replace(part_path, final_path)
+    finally:
+        if os.path.exists(part_path):
+            os.remove(part_path)
+    return size, checksum
+
+
+def record_chunk(session, index, size, checksum):
+    """Set the session's bit for ``index`` and push its expiry back"""
+    try:
+        UploadChunk.objects.create(session=session, index=index, size=size, checksum=checksum)
+    except IntegrityError:
+        # Re-sent chunk: the file was replaced, keep the row in step
+        UploadChunk.objects.filter(session=session, index=index).update(size=size, checksum=checksum)
+    UploadSession.objects.filter(pk=session.pk).update(expires_at=timezone.now() + SESSION_TTL)
+
+
+def missing_chunks(session):
+    received = set(session.chunks.values_list('index', flat=True))
+    return [index for index in range(session.total_chunks) if index not in received]
+
+
+def _copy_file_range(src_fd, dst_fd, offset, count):
+    while offset < count:
+        copied = os.copy_file_range(src_fd, dst_fd, min(COPY_BLOCK_SIZE, count - offset), offset_src=offset)
+        if not copied:
+            break
+        offset += copied
+    return offset
+
+
+def _sendfile(src_fd, dst_fd, offset, count):
+    while offset < count:
+        sent = os.sendfile(dst_fd, src_fd, offset, min(COPY_BLOCK_SIZE, count - offset))
+        if not sent:
+            break
+        offset += sent
+    return offset
+
+
+def _buffered_copy(src_fd, dst_fd, offset, count):
+    while offset < count:
+        data = os.pread(src_fd, min(FALLBACK_BUFFER_SIZE, count - offset), offset)
+        if not data:
+            break
+        view = memoryview(data)
+        while view:
+            written = os.write(dst_fd, view)
+            view = view[written:]
+        offset += len(data)
+    return offset
+
+
+_COPY_STRATEGIES = tuple(
+    copy for copy, available in (
+        (_copy_file_range, hasattr(os, 'copy_file_range')),
+        (_sendfile, hasattr(os, 'sendfile')),
+    )
+    if available
+)
+
+
+def append_file(src_fd, dst_fd, count):
+    """Append ``count`` bytes of ``src_fd`` at ``dst_fd``'s current position"""
+    start = os.lseek(dst_fd, 0, os.SEEK_CUR)
+    offset = 0
+    for copy in _COPY_STRATEGIES:
+        try:
+            offset = copy(src_fd, dst_fd, offset, count)
+        except OSError as e:
+            if e.errno not in _UNSUPPORTED_ERRNOS:
+                raise
+            # A strategy may fail after copying part of the chunk
+            offset = os.lseek(dst_fd, 0, os.SEEK_CUR) - start
+        if offset >= count:
+            return offset
+    return _buffered_copy(src_fd, dst_fd, offset, count)
+
+
+def assemble_chunks(upload_id, total_chunks, digest=None):
+    """Concatenate chunk_0..chunk_{n-1} into one file and return its path
+
+    With ``digest`` (a hashlib object) each chunk is also hashed right after
+    it is copied, while it is still in the page cache.
+
+    Chunks are left in place so that a retried assembly starts over cleanly;
+    remove_upload() drops them once the file is stored.
+    """
+    dest_path = os.path.join(upload_dir(upload_id), ASSEMBLED_NAME)
+    dst_fd = os.open(dest_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        for index in range(total_chunks):
+            src_fd = os.open(chunk_path(upload_id, index), os.O_RDONLY)
+            try:
+                size = os.fstat(src_fd).st_size
+                if append_file(src_fd, dst_fd, size) != size:
+                    raise IOError(f"Short copy of chunk {index} of upload {upload_id}")
+                if digest is not None:
+                    media_index.update_digest(digest, src_fd, size)
+            finally:
+                os.close(src_fd)
+    except BaseException:
+        os.close(dst_fd)
+        os.remove(dest_path)
+        raise
+    os.close(dst_fd)
+    return dest_path
+
+
+class AssembledFile(File):
+    """Lets FileSystemStorage move the file into place instead of copying it"""
+
+    def temporary_file_path(self):
+        return self.file.name
+
+
+def store_upload(field_file, path, filename):
+    """Save the assembled file at ``path`` into ``field_file`` (not the model)"""
+    with open(path, 'rb') as f:
+        field_file.save(filename, AssembledFile(f, name=filename), save=False)
+
+
+def remove_upload(upload_id):
+    shutil.rmtree(upload_dir(upload_id), ignore_errors=True)
+
+
+def cleanup_expired_uploads():
+    """Delete expired sessions and temp_uploads/ directories nobody owns
+
+    Returns the number of directories removed.
+    """
+    now = timezone.now()
+    expired = UploadSession.objects.filter(expires_at__lt=now)
+    removed = 0
+    for upload_id in expired.values_list('id', flat=True):
+        remove_upload(str(upload_id))
+        removed += 1
+    expired.delete()
+    
+    # Leftovers of the cache-based protocol, crashed assemblies, etc.
+    root = os.path.join(settings.MEDIA_ROOT, TEMP_UPLOAD_DIR)
+    if not os.path.isdir(root):
+        return removed
+    live = {str(upload_id) for upload_id in UploadSession.objects.values_list('id', flat=True)}
+    cutoff = time.time() - SESSION_TTL.total_seconds()
+    with os.scandir(root) as entries:
+        for entry in entries:
+            if entry.is_dir() and entry.name not in live and entry.stat().st_mtime < cutoff:
+                shutil.rmtree(entry.path, ignore_errors=True)
+                removed += 1
+    return removed
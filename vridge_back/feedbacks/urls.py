@@ -40,6 +40,9 @@ urlpatterns = [
     path('projects/<int:project_id>/feedbacks/upload/complete/', 
          views.VideoUploadCompleteView.as_view(), 
          name='upload-complete'),
+    path('projects/<int:project_id>/feedbacks/upload/<uuid:upload_id>/', 
+         views.VideoUploadStatusView.as_view(), 
+         name='upload-status'),
     
     #    
     path('projects/<int:project_id>/feedbacks/<int:feedback_id>/encoding-status/', 
@@ -49,6 +52,17 @@ urlpatterns = [
          views.FeedbackStreamView.as_view(), 
          name='feedback-stream'),
     
+    #   (Range, X-Accel-Redirect)
+    path('feedbacks/<int:feedback_id>/media/hls/<path:name>', 
+         views.FeedbackMediaView.as_view(), {'variant': 'hls'}, 
+         name='feedback-media-hls'),
+    path('feedbacks/<int:feedback_id>/media/sprites/<path:name>', 
+         views.FeedbackMediaView.as_view(), {'variant': 'sprites'}, 
+         name='feedback-media-sprites'),
+    path('feedbacks/<int:feedback_id>/media/<str:variant>/', 
+         views.FeedbackMediaView.as_view(), 
+         name='feedback-media'),
+    
     #      ( )
     path('<int:id>', views.FeedbackDetail.as_view(), name='feedback-detail-legacy'),
 ]
\ No newline at end of file
@@ -8,6 +8,7 @@ import subprocess
 import logging
 from pathlib import Path
 from django.conf import settings
+from django.core.cache import cache
 from celery import shared_task
 
 logger = logging.getLogger(__name__)
@@ -76,48 +77,39 @@ class VideoConverter:
 
     @staticmethod
     def convert_to_hls(input_path, output_dir):
-        """ HLS   """
+        """ HLS/DASH    (master.m3u8  ) """
+        from .video_utils import VideoProcessor
+        
         output_dir = Path(output_dir)
-        output_dir.mkdir(parents=True, exist_ok=True)
+        playlist_path = output_dir / 'master.m3u8'
         
-        playlist_path = output_dir / 'playlist.m3u8'
+        logger.info(f"Converting to HLS: {input_path} -> {playlist_path}")
+        if not VideoProcessor.create_hls_stream(str(input_path), str(output_dir)):
+            raise Exception(f"HLS conversion failed: {input_path}")
         
-        try:
-            command = [
-                'ffmpeg',
-                '-i', str(input_path),
-                '-c:v', 'libx264',
-                '-preset', 'medium',
-                '-crf', '23',
-                '-c:a', 'aac',
-                '-b:a', '128k',
-                '-hls_time', '10',              #    ()
-                '-hls_list_size', '0',          #   
-                '-hls_segment_filename', str(output_dir / 'segment_%03d.ts'),
-                '-f', 'hls',
-                str(playlist_path)
-            ]
-            
-            logger.info(f"Converting to HLS: {input_path} -> {playlist_path}")
-            
-            result = subprocess.run(
-                command,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                check=True
-            )
-            
-            logger.info(f"HLS conversion completed: {playlist_path}")
-            return str(playlist_path)
-            
-        except subprocess.CalledProcessError as e:
-            logger.error(f"HLS conversion failed: {e.stderr}")
-            raise Exception(f"HLS conversion failed: {e.stderr}")
+        logger.info(f"HLS conversion completed: {playlist_path}")
+        return str(playlist_path)
 
     @staticmethod
     def get_video_info(file_path):
         """   """
+        from .video_utils import PROBE_CACHE_TIMEOUT, probe_cache_key
+        
+        # Cached per file path, size and mtime, like VideoProcessor.get_video_info
+        try:
+            key = probe_cache_key('video_converter_info', file_path)
+        except OSError as e:
+            logger.error(f"Failed to get video info: {str(e)}")
+            return None
+        info = cache.get(key)
+        if info is None:
+            info = VideoConverter._probe(file_path)
+            if info is not None:
+                cache.set(key, info, PROBE_CACHE_TIMEOUT)
+        return info
+
+    @staticmethod
+    def _probe(file_path):
         try:
             command = [
                 'ffprobe',
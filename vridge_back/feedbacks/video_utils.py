@@ -1,15 +1,38 @@
 """
 Video processing utilities for encoding and optimization
 """
+import hashlib
 import os
 import ffmpeg
 import logging
+import shutil
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from django.conf import settings
+from django.core.cache import cache
 from pathlib import Path
 import tempfile
 
 logger = logging.getLogger(__name__)
 
+PROBE_CACHE_TIMEOUT = 7 * 86400
+
+
+def probe_cache_key(prefix, path):
+    """Cache key of a probe result; changes whenever the file is replaced"""
+    stat = os.stat(path)
+    path_hash = hashlib.sha1(os.path.realpath(path).encode()).hexdigest()
+    return f"{prefix}:{path_hash}:{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def _tee_escape(path):
+    """Escape a file name for a tee muxer slave"""
+    for char in ('\\', "'", '|', '[', ']'):
+        path = path.replace(char, '\\' + char)
+    return path
+
+
 class VideoProcessor:
     """Handle video encoding and optimization"""
     
@@ -38,31 +61,114 @@ class VideoProcessor:
             'preset': 'fast',
             'width': 854,
             'height': 480
+        },
+        # ABR ladder only (no progressive file)
+        'mobile': {
+            'video_bitrate': '600k',
+            'audio_bitrate': '96k',
+            'crf': 28,
+            'preset': 'fast',
+            'width': 640,
+            'height': 360
         }
     }
     
+    # Adaptive streaming ladder, highest first
+    ABR_LADDER = ('high', 'medium', 'low', 'mobile')
+    SEGMENT_DURATION = 4  # seconds; every rendition has a keyframe on this grid
+    AUDIO_BITRATE = '128k'  # one AAC track shared by every rendition
+    
+    # Sources at least this long are encoded in parallel pieces (encode_segmented)
+    SEGMENTED_MIN_DURATION = 600
+    SPLIT_SEGMENT_DURATION = 60  # target piece length in seconds
+    THREADS_PER_PIECE = 2  # thread budget below which pieces are not run side by side
+    
+    # Scrub previews: tiled sprite sheets indexed by a WebVTT track
+    SPRITE_INTERVAL = 5  # seconds between preview frames
+    SPRITE_WIDTH = 160  # width of one preview frame
+    SPRITE_COLUMNS = 10
+    SPRITE_ROWS = 10
+    SPRITE_FORMAT = 'jpg'  # or 'webp' when ffmpeg has libwebp
+    SPRITE_TRACK = 'thumbnails.vtt'
+    
+    @staticmethod
+    def run_with_progress(output, duration, on_progress):
+        """
+        Run an ffmpeg-python graph, reporting progress from ``-progress pipe:1``
+        
+        Args:
+            output: ffmpeg-python output node
+            duration: Probed source duration in seconds
+            on_progress: Called with (percent, eta_seconds, speed) per progress block
+        
+        Raises:
+            ffmpeg.Error: ffmpeg exited with a non-zero status
+        """
+        args = ffmpeg.compile(output, overwrite_output=True)
+        args[1:1] = ['-progress', 'pipe:1', '-nostats']
+        
+        # stderr goes to a file so a chatty ffmpeg can never block on a full pipe
+        with tempfile.TemporaryFile() as stderr:
+            process = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=stderr)
+            started = time.monotonic()
+            block = {}
+            fraction = 0.0
+            for raw in process.stdout:
+                key, _, value = raw.decode(errors='replace').strip().partition('=')
+                if key != 'progress':
+                    block[key] = value
+                    continue
+                # out_time_ms is in microseconds as well (historical ffmpeg naming)
+                out_time = block.get('out_time_us') or block.get('out_time_ms') or ''
+                if value == 'continue' and out_time.isdigit() and duration:
+                    # With several outputs the reported time can step back; keep it monotonic
+                    fraction = max(fraction, min(int(out_time) / 1e6 / duration, 1.0))
+                    elapsed = time.monotonic() - started
+                    eta = elapsed / fraction - elapsed if fraction > 0 else None
+                    try:
+                        speed = float(block.get('speed', '').rstrip('x'))
+                    except ValueError:
+                        speed = None
+                    on_progress(min(fraction * 100, 99.9), eta, speed)
+                block = {}
+            process.wait()
+            stderr.seek(0)
+            error_output = stderr.read()
+        
+        if process.returncode:
+            raise ffmpeg.Error('ffmpeg', None, error_output)
+    
     @staticmethod
     def get_video_info(input_path):
-        """Get video metadata"""
+        """Get video metadata (cached per file path, size and mtime)"""
         try:
-            probe = ffmpeg.probe(input_path)
-            video_info = next(s for s in probe['streams'] if s['codec_type'] == 'video')
-            audio_info = next((s for s in probe['streams'] if s['codec_type'] == 'audio'), None)
-            
-            return {
-                'duration': float(probe['format']['duration']),
-                'width': int(video_info['width']),
-                'height': int(video_info['height']),
-                'fps': eval(video_info['r_frame_rate']),
-                'video_codec': video_info['codec_name'],
-                'audio_codec': audio_info['codec_name'] if audio_info else None,
-                'size': int(probe['format']['size']),
-                'bitrate': int(probe['format']['bit_rate'])
-            }
+            key = probe_cache_key('video_info', input_path)
+            info = cache.get(key)
+            if info is None:
+                info = VideoProcessor._probe(input_path)
+                cache.set(key, info, PROBE_CACHE_TIMEOUT)
+            return info
         except Exception as e:
             logger.error(f"Error getting video info: {str(e)}")
             return None
     
+    @staticmethod
+    def _probe(input_path):
+        probe = ffmpeg.probe(input_path)
+        video_info = next(s for s in probe['streams'] if s['codec_type'] == 'video')
+        audio_info = next((s for s in probe['streams'] if s['codec_type'] == 'audio'), None)
+        
+        return {
+            'duration': float(probe['format']['duration']),
+            'width': int(video_info['width']),
+            'height': int(video_info['height']),
+            'fps': eval(video_info['r_frame_rate']),
+            'video_codec': video_info['codec_name'],
+            'audio_codec': audio_info['codec_name'] if audio_info else None,
+            'size': int(probe['format']['size']),
+            'bitrate': int(probe['format']['bit_rate'])
+        }
+    
     @staticmethod
     def encode_video(input_path, output_path, quality='medium'):
         """
@@ -79,6 +185,21 @@ class VideoProcessor:
         try:
             preset = VideoProcessor.ENCODING_PRESETS.get(quality, VideoProcessor.ENCODING_PRESETS['medium'])
             
+            # Long sources: parallel pieces, stitched back together
+            info = VideoProcessor.get_video_info(input_path)
+            if info and info['duration'] >= VideoProcessor.SEGMENTED_MIN_DURATION:
+                quality = quality if quality in VideoProcessor.ENCODING_PRESETS else 'medium'
+                output_dir = os.path.dirname(os.path.abspath(output_path))
+                result = VideoProcessor.encode_segmented(
+                    input_path, output_dir, info,
+                    qualities=(quality,), mp4_qualities=(quality,), thumbnail_offset=None
+                )
+                if not result:
+                    return False
+                os.replace(result['renditions'][quality], output_path)
+                logger.info(f"Successfully encoded video: {output_path}")
+                return True
+            
             # Input stream
             stream = ffmpeg.input(input_path)
             
@@ -114,6 +235,406 @@ class VideoProcessor:
             logger.error(f"Encoding error: {str(e)}")
             return False
     
+    @staticmethod
+    def web_quality(info):
+        """Preset optimize_for_web() picks for a source of this size"""
+        if info['width'] > 1920 or info['height'] > 1080:
+            return 'high'
+        elif info['width'] > 1280 or info['height'] > 720:
+            return 'medium'
+        return 'low'
+    
+    @staticmethod
+    def source_ladder(info, qualities=ABR_LADDER, mp4_qualities=()):
+        """
+        ``qualities`` without the rungs above the source height (never upscale)
+        
+        A source smaller than every rung keeps the lowest of ``mp4_qualities``
+        (or of ``qualities``), so there is always a rendition to play.
+        """
+        kept = [
+            quality for quality in qualities
+            if VideoProcessor.ENCODING_PRESETS[quality]['height'] <= info['height']
+        ]
+        playable = [quality for quality in qualities if quality in mp4_qualities] or list(qualities)
+        if not any(quality in playable for quality in kept):
+            kept.append(playable[-1])
+        return tuple(sorted(kept, key=qualities.index))
+    
+    @staticmethod
+    def encode_renditions(input_path, output_dir, info, qualities=ABR_LADDER,
+                          mp4_qualities=('high', 'medium', 'low'), abr_dir=None,
+                          thumbnail_offset=2.0, on_progress=None, single_file=False, threads=None,
+                          sprites_dir=None):
+        """
+        Encode every rendition, the ABR stream, the thumbnail and the preview
+        sprites with one decode
+        
+        The decoded video is fanned out with a split filter into one scaled
+        H.264 encode per quality, all with keyframes on the same
+        SEGMENT_DURATION grid. The tee muxer writes those encodes (plus one
+        shared AAC track) both as progressive MP4 files and as a CMAF ladder:
+        fMP4 segments referenced by a DASH manifest and by HLS media
+        playlists under one master playlist. The thumbnail and the preview
+        sprites are taken from further split branches.
+        
+        Args:
+            input_path: Path to input video
+            output_dir: Directory for {quality}.mp4 and thumbnail.jpg
+            info: get_video_info() result for input_path
+            qualities: ENCODING_PRESETS keys to encode (the ABR ladder)
+            mp4_qualities: Subset of qualities also written as progressive MP4
+            abr_dir: Directory for manifest.mpd, master.m3u8 and segments, or None
+            thumbnail_offset: Time in seconds to capture the thumbnail, or None
+            on_progress: Optional (percent, eta_seconds, speed) callback
+            single_file: One byte-range addressed file per ladder stream
+            threads: Encoder thread budget, split between the renditions
+            sprites_dir: Directory for the sprite sheets and their WebVTT track, or None
+        
+        Returns:
+            dict: {'renditions': {quality: path}, 'hls_playlist': path or None,
+                   'dash_manifest': path or None, 'thumbnail': path or None,
+                   'sprites': WebVTT path or None},
+                  or None on failure
+        """
+        try:
+            os.makedirs(output_dir, exist_ok=True)
+            stream = ffmpeg.input(input_path)
+            has_audio = bool(info.get('audio_codec'))
+            branch_count = len(qualities) + (thumbnail_offset is not None) + bool(sprites_dir)
+            branches = stream.video.filter_multi_output('split', branch_count)
+            
+            result = {'renditions': {}, 'hls_playlist': None, 'dash_manifest': None, 'thumbnail': None,
+                      'sprites': None}
+            videos = []
+            codec_options = {}
+            slaves = []
+            for index, quality in enumerate(qualities):
+                preset = VideoProcessor.ENCODING_PRESETS[quality]
+                videos.append(branches[index].filter('scale', preset['width'], preset['height']))
+                codec_options[f'b:v:{index}'] = preset['video_bitrate']
+                codec_options[f'crf:v:{index}'] = preset['crf']
+                codec_options[f'preset:v:{index}'] = preset['preset']
+                if quality in mp4_qualities:
+                    mp4_path = os.path.join(output_dir, f'{quality}.mp4')
+                    select = f'v:{index},a' if has_audio else f'v:{index}'
+                    slaves.append(f"[f=mp4:movflags=+faststart:select=\\'{select}\\']{_tee_escape(mp4_path)}")
+                    result['renditions'][quality] = mp4_path
+            
+            if abr_dir:
+                os.makedirs(abr_dir, exist_ok=True)
+                adaptation_sets = 'id=0,streams=v id=1,streams=a' if has_audio else 'id=0,streams=v'
+                manifest_path = os.path.join(abr_dir, 'manifest.mpd')
+                slaves.append(
+                    f"[f=dash:seg_duration={VideoProcessor.SEGMENT_DURATION}:use_template=1:use_timeline=1"
+                    f":hls_playlist=1:single_file={int(single_file)}"
+                    f":adaptation_sets=\\'{adaptation_sets}\\']{_tee_escape(manifest_path)}"
+                )
+                result['dash_manifest'] = manifest_path
+                result['hls_playlist'] = os.path.join(abr_dir, 'master.m3u8')
+            
+            if threads:
+                # -threads is per encoder
+                codec_options['threads'] = max(1, threads // len(qualities))
+            
+            streams = videos + ([stream.audio] if has_audio else [])
+            outputs = [ffmpeg.output(
+                *streams, '|'.join(slaves),
+                format='tee',
+                vcodec='libx264',
+                acodec='aac',
+                audio_bitrate=VideoProcessor.AUDIO_BITRATE,
+                pix_fmt='yuv420p',
+                # Aligned keyframes let players switch rungs at every segment boundary
+                force_key_frames=f'expr:gte(t,n_forced*{VideoProcessor.SEGMENT_DURATION})',
+                sc_threshold=0,
+                flags='+global_header',
+                **codec_options
+            )]
+            
+            if thumbnail_offset is not None:
+                # Short clips: take the frame from the middle instead
+                offset = min(thumbnail_offset, info['duration'] / 2)
+                thumbnail_path = os.path.join(output_dir, 'thumbnail.jpg')
+                thumbnail = branches[len(qualities)].filter('select', f'gte(t,{offset})')
+                outputs.append(ffmpeg.output(thumbnail, thumbnail_path, vframes=1))
+                result['thumbnail'] = thumbnail_path
+            
+            if sprites_dir:
+                outputs.append(VideoProcessor._sprite_output(branches[branch_count - 1], sprites_dir, info))
+            
+            graph = ffmpeg.merge_outputs(*outputs)
+            if on_progress:
+                VideoProcessor.run_with_progress(graph, info['duration'], on_progress)
+            else:
+                ffmpeg.run(graph, overwrite_output=True, capture_stdout=True, capture_stderr=True)
+            
+            if sprites_dir:
+                result['sprites'] = VideoProcessor.write_sprite_track(sprites_dir, info)
+            
+            logger.info(f"Encoded {len(qualities)} renditions of {input_path} in one pass")
+            return result
+            
+        except ffmpeg.Error as e:
+            logger.error(f"FFmpeg error: {e.stderr.decode()}")
+            return None
+        except Exception as e:
+            logger.error(f"Encoding error: {str(e)}")
+            return None
+    
+    @staticmethod
+    def sprite_size(info):
+        """(width, height) of one preview frame, keeping the aspect ratio"""
+        width = VideoProcessor.SPRITE_WIDTH
+        height = max(2, round(width * info['height'] / info['width'] / 2) * 2)
+        return width, height
+    
+    @staticmethod
+    def _sprite_output(video, sprites_dir, info):
+        """Output node tiling one frame per SPRITE_INTERVAL into sprite sheets"""
+        os.makedirs(sprites_dir, exist_ok=True)
+        width, height = VideoProcessor.sprite_size(info)
+        tiles = video.filter('fps', f'1/{VideoProcessor.SPRITE_INTERVAL}').filter(
+            'scale', width, height
+        ).filter('tile', f'{VideoProcessor.SPRITE_COLUMNS}x{VideoProcessor.SPRITE_ROWS}')
+        pattern = os.path.join(sprites_dir, f'sprite_%03d.{VideoProcessor.SPRITE_FORMAT}')
+        if VideoProcessor.SPRITE_FORMAT == 'webp':
+            # One still image per sheet (ffmpeg would pick animated WebP otherwise)
+            options = {'vcodec': 'libwebp', 'quality': 70}
+        else:
+            options = {'vcodec': 'mjpeg', 'q:v': 5}
+        return ffmpeg.output(tiles, pattern, f='image2', start_number=0, **options)
+    
+    @staticmethod
+    def write_sprite_track(sprites_dir, info):
+        """
+        Write the WebVTT track mapping each SPRITE_INTERVAL to its tile
+        
+        Cues point at the sheets with media fragments
+        (sprite_000.jpg#xywh=x,y,w,h), relative to the track itself.
+        
+        Returns:
+            str: Path of the track
+        """
+        width, height = VideoProcessor.sprite_size(info)
+        interval = VideoProcessor.SPRITE_INTERVAL
+        per_sheet = VideoProcessor.SPRITE_COLUMNS * VideoProcessor.SPRITE_ROWS
+        
+        def timestamp(seconds):
+            hours, rest = divmod(seconds, 3600)
+            minutes, seconds = divmod(rest, 60)
+            return f'{int(hours):02d}:{int(minutes):02d}:{seconds:06.3f}'
+        
+        lines = ['WEBVTT', '']
+        index = 0
+        while index * interval < info['duration']:
+            sheet, position = divmod(index, per_sheet)
+            name = f'sprite_{sheet:03d}.{VideoProcessor.SPRITE_FORMAT}'
+            if not os.path.exists(os.path.join(sprites_dir, name)):
+                break
+            row, column = divmod(position, VideoProcessor.SPRITE_COLUMNS)
+            start = index * interval
+            end = min(start + interval, info['duration'])
+            lines.append(f'{timestamp(start)} --> {timestamp(end)}')
+            lines.append(f'{name}#xywh={column * width},{row * height},{width},{height}')
+            lines.append('')
+            index += 1
+        
+        track_path = os.path.join(sprites_dir, VideoProcessor.SPRITE_TRACK)
+        with open(track_path, 'w') as f:
+            f.write('\n'.join(lines))
+        return track_path
+    
+    @staticmethod
+    def generate_sprites(input_path, sprites_dir, info):
+        """
+        Preview sprite sheets and their WebVTT track in a pass of their own
+        
+        Returns:
+            str: Path of the WebVTT track, or None on failure
+        """
+        try:
+            output = VideoProcessor._sprite_output(ffmpeg.input(input_path).video, sprites_dir, info)
+            ffmpeg.run(output, overwrite_output=True, capture_stdout=True, capture_stderr=True)
+            return VideoProcessor.write_sprite_track(sprites_dir, info)
+        except ffmpeg.Error as e:
+            logger.error(f"FFmpeg error: {e.stderr.decode()}")
+            return None
+    
+    @staticmethod
+    def split_at_keyframes(input_path, output_dir, segment_duration=None):
+        """
+        Cut the video stream of input_path at keyframes (stream copy, no re-encode)
+        
+        Each piece starts on a keyframe at or after a multiple of
+        segment_duration, so the pieces decode independently.
+        
+        Returns:
+            list: Paths of the pieces in order
+        """
+        segment_duration = segment_duration or VideoProcessor.SPLIT_SEGMENT_DURATION
+        os.makedirs(output_dir, exist_ok=True)
+        pattern = os.path.join(output_dir, 'part_%05d.mkv')
+        output = ffmpeg.input(input_path).output(
+            pattern,
+            map='0:v:0',
+            c='copy',
+            f='segment',
+            segment_time=segment_duration,
+            reset_timestamps=1,
+        )
+        ffmpeg.run(output, overwrite_output=True, capture_stdout=True, capture_stderr=True)
+        return sorted(
+            os.path.join(output_dir, name) for name in os.listdir(output_dir)
+            if name.startswith('part_')
+        )
+    
+    @staticmethod
+    def package_abr(renditions, abr_dir, has_audio, single_file=False):
+        """
+        Write the HLS/DASH ladder of already encoded MP4s (stream copy)
+        
+        Args:
+            renditions: Paths of the renditions, highest first; the audio of
+                the first one is used for all of them
+            abr_dir: Directory for manifest.mpd, master.m3u8 and segments
+            has_audio: Whether the renditions carry audio
+            single_file: One byte-range addressed file per stream
+        
+        Returns:
+            str: Path of master.m3u8
+        """
+        os.makedirs(abr_dir, exist_ok=True)
+        inputs = [ffmpeg.input(path) for path in renditions]
+        streams = [stream.video for stream in inputs]
+        if has_audio:
+            streams.append(inputs[0].audio)
+        output = ffmpeg.output(
+            *streams, os.path.join(abr_dir, 'manifest.mpd'),
+            f='dash',
+            c='copy',
+            seg_duration=VideoProcessor.SEGMENT_DURATION,
+            use_template=1,
+            use_timeline=1,
+            hls_playlist=1,
+            single_file=int(single_file),
+            adaptation_sets='id=0,streams=v id=1,streams=a' if has_audio else 'id=0,streams=v',
+        )
+        ffmpeg.run(output, overwrite_output=True, capture_stdout=True, capture_stderr=True)
+        return os.path.join(abr_dir, 'master.m3u8')
+    
+    @staticmethod
+    def encode_segmented(input_path, output_dir, info, qualities=ABR_LADDER,
+                         mp4_qualities=('high', 'medium', 'low'), abr_dir=None,
+                         thumbnail_offset=2.0, on_progress=None, single_file=False, threads=None,
+                         sprites_dir=None):
+        """
+        encode_renditions() for long sources: split, encode in parallel, concat
+        
+        The video is cut at keyframes into SPLIT_SEGMENT_DURATION pieces and
+        every piece is encoded to all qualities by its own ffmpeg process
+        (several at once, sharing the thread budget), while another process
+        encodes the audio track once. Each quality is then stitched with the
+        concat demuxer and muxed with the audio, all by stream copy, and the
+        ABR ladder is packaged from the stitched files. Wall time follows the
+        piece length rather than the source length.
+        
+        Arguments and return value are those of encode_renditions().
+        """
+        work_dir = tempfile.mkdtemp(prefix='.segments_', dir=output_dir)
+        try:
+            has_audio = bool(info.get('audio_codec'))
+            parts = VideoProcessor.split_at_keyframes(input_path, os.path.join(work_dir, 'source'))
+            if not parts:
+                raise RuntimeError(f"No pieces cut from {input_path}")
+            
+            threads = threads or os.cpu_count() or 1
+            workers = max(1, min(len(parts), threads // VideoProcessor.THREADS_PER_PIECE))
+            piece_threads = max(1, threads // workers)
+            # Pieces are video only; the audio is encoded once for the whole file
+            piece_info = dict(info, audio_codec=None)
+            
+            def encode_piece(index):
+                result = VideoProcessor.encode_renditions(
+                    parts[index], os.path.join(work_dir, f'encoded_{index:05d}'), piece_info,
+                    qualities=qualities,
+                    mp4_qualities=qualities,
+                    thumbnail_offset=None,
+                    threads=piece_threads,
+                )
+                if not result:
+                    raise RuntimeError(f"Encoding piece {index} of {input_path} failed")
+                return result['renditions']
+            
+            def encode_audio():
+                audio_path = os.path.join(work_dir, 'audio.m4a')
+                output = ffmpeg.input(input_path).output(
+                    audio_path, vn=None, acodec='aac', audio_bitrate=VideoProcessor.AUDIO_BITRATE
+                )
+                ffmpeg.run(output, overwrite_output=True, capture_stdout=True, capture_stderr=True)
+                return audio_path
+            
+            # ffmpeg does the work; threads only wait on it (and Celery's
+            # prefork children may not start processes of their own)
+            started = time.monotonic()
+            pieces = [None] * len(parts)
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                audio_future = pool.submit(encode_audio) if has_audio else None
+                futures = {pool.submit(encode_piece, index): index for index in range(len(parts))}
+                for done, future in enumerate(as_completed(futures), 1):
+                    pieces[futures[future]] = future.result()
+                    if on_progress:
+                        elapsed = time.monotonic() - started
+                        on_progress(100.0 * done / len(parts), elapsed / done * (len(parts) - done), None)
+                audio_path = audio_future.result() if audio_future else None
+            
+            renditions = {}
+            for quality in qualities:
+                list_path = os.path.join(work_dir, f'{quality}.txt')
+                with open(list_path, 'w') as f:
+                    for piece in pieces:
+                        escaped = piece[quality].replace("'", "'\\''")
+                        f.write(f"file '{escaped}'\n")
+                video = ffmpeg.input(list_path, f='concat', safe=0).video
+                streams = [video, ffmpeg.input(audio_path).audio] if audio_path else [video]
+                rendition_path = os.path.join(output_dir, f'{quality}.mp4')
+                output = ffmpeg.output(*streams, rendition_path, c='copy', movflags='+faststart')
+                ffmpeg.run(output, overwrite_output=True, capture_stdout=True, capture_stderr=True)
+                renditions[quality] = rendition_path
+            
+            result = {'renditions': {}, 'hls_playlist': None, 'dash_manifest': None, 'thumbnail': None,
+                      'sprites': None}
+            if abr_dir:
+                result['hls_playlist'] = VideoProcessor.package_abr(
+                    [renditions[quality] for quality in qualities], abr_dir, has_audio, single_file
+                )
+                result['dash_manifest'] = os.path.join(abr_dir, 'manifest.mpd')
+            if sprites_dir:
+                # From the lowest rendition: far cheaper to decode than the source
+                result['sprites'] = VideoProcessor.generate_sprites(renditions[qualities[-1]], sprites_dir, info)
+            for quality, rendition_path in renditions.items():
+                if quality in mp4_qualities:
+                    result['renditions'][quality] = rendition_path
+                else:
+                    os.remove(rendition_path)
+            
+            if thumbnail_offset is not None:
+                thumbnail_path = os.path.join(output_dir, 'thumbnail.jpg')
+                if VideoProcessor.generate_thumbnail(input_path, thumbnail_path, thumbnail_offset):
+                    result['thumbnail'] = thumbnail_path
+            
+            logger.info(f"Encoded {len(parts)} pieces of {input_path} with {workers} workers")
+            return result
+            
+        except ffmpeg.Error as e:
+            logger.error(f"FFmpeg error: {e.stderr.decode()}")
+            return None
+        except Exception as e:
+            logger.error(f"Segmented encoding error: {str(e)}")
+            return None
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    
     @staticmethod
     def generate_thumbnail(input_path, output_path, time_offset=2.0):
         """
@@ -140,47 +661,40 @@ class VideoProcessor:
             return False
     
     @staticmethod
-    def create_hls_stream(input_path, output_dir):
+    def create_hls_stream(input_path, output_dir, single_file=False):
         """
-        Create HLS (HTTP Live Streaming) segments for adaptive streaming
+        Create the adaptive streaming ladder (ABR_LADDER) for input_path
+        
+        output_dir receives master.m3u8 (HLS) and manifest.mpd (DASH), which
+        share the same fMP4 segments.
         
         Args:
             input_path: Path to input video
-            output_dir: Directory for HLS segments
+            output_dir: Directory for playlists, manifest and segments
+            single_file: One byte-range addressed file per stream
         
         Returns:
             bool: Success status
         """
-        try:
-            os.makedirs(output_dir, exist_ok=True)
-            
-            # HLS playlist path
-            playlist_path = os.path.join(output_dir, 'playlist.m3u8')
-            segment_pattern = os.path.join(output_dir, 'segment_%03d.ts')
-            
-            # Create HLS stream
-            stream = ffmpeg.input(input_path)
-            stream = ffmpeg.output(
-                stream,
-                playlist_path,
-                format='hls',
-                hls_time=10,  # 10 second segments
-                hls_list_size=0,  # Keep all segments in playlist
-                hls_segment_filename=segment_pattern,
-                vcodec='libx264',
-                acodec='aac',
-                preset='fast',
-                crf=23
-            )
-            
-            ffmpeg.run(stream, overwrite_output=True, capture_stdout=True, capture_stderr=True)
-            
-            logger.info(f"Created HLS stream: {playlist_path}")
-            return True
-            
-        except Exception as e:
-            logger.error(f"HLS creation error: {str(e)}")
+        info = VideoProcessor.get_video_info(input_path)
+        if not info:
             return False
+        
+        # Never upscale: drop the rungs above the source resolution
+        qualities = VideoProcessor.source_ladder(info)
+        result = VideoProcessor.encode_renditions(
+            input_path, output_dir, info,
+            qualities=qualities,
+            mp4_qualities=(),
+            abr_dir=output_dir,
+            thumbnail_offset=None,
+            single_file=single_file,
+        )
+        if not result:
+            return False
+        
+        logger.info(f"Created HLS stream: {result['hls_playlist']}")
+        return True
     
     @staticmethod
     def optimize_for_web(input_path, output_path):
@@ -201,12 +715,7 @@ class VideoProcessor:
                 return False
             
             # Determine optimal encoding settings based on original
-            if info['width'] > 1920 or info['height'] > 1080:
-                quality = 'high'
-            elif info['width'] > 1280 or info['height'] > 720:
-                quality = 'medium'
-            else:
-                quality = 'low'
+            quality = VideoProcessor.web_quality(info)
             
             # Encode with web optimization
             return VideoProcessor.encode_video(input_path, output_path, quality)
@@ -3,11 +3,15 @@ import logging
 import os
 from django.conf import settings
 from django.shortcuts import get_object_or_404
+from django.urls import reverse
 from django.http import JsonResponse, HttpResponse
 from django.views import View
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
 from django.db import transaction
+from django.db.models import Sum
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.utils import timezone
 from django.core.files.storage import default_storage
 from django.core.paginator import Paginator
 from rest_framework import status
@@ -19,6 +23,7 @@ from rest_framework.decorators import api_view, permission_classes, parser_class
 
 from . import models
 from . import serializers
+from . import media, progress, uploads
 from projects import models as project_model
 from users.utils import user_validator
 
@@ -420,6 +425,16 @@ class FeedbackCommentView(APIView):
 
 
 #    
+def get_upload_session(request, project_id, upload_id):
+    """The caller's upload session for this project, or None"""
+    try:
+        return models.UploadSession.objects.get(
+            id=upload_id, project_id=project_id, user=request.user
+        )
+    except (models.UploadSession.DoesNotExist, DjangoValidationError, ValueError, TypeError):
+        return None
+
+
 class VideoUploadInitView(APIView):
     permission_classes = [IsAuthenticated]
     
@@ -438,23 +453,30 @@ class VideoUploadInitView(APIView):
                     status=status.HTTP_403_FORBIDDEN
                 )
             
+            try:
+                total_chunks = int(request.data.get('total_chunks'))
+            except (TypeError, ValueError):
+                total_chunks = 0
+            filename = request.data.get('filename')
+            if total_chunks <= 0 or not filename:
+                return Response(
+                    {"message": "filename, total_chunks  ."},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            
             #   
-            import uuid
-            upload_id = str(uuid.uuid4())
-            
-            # Redis    ( )
-            from django.core.cache import cache
-            cache.set(f'upload_{upload_id}', {
-                'project_id': project_id,
-                'user_id': request.user.id,
-                'filename': request.data.get('filename'),
-                'total_size': request.data.get('total_size'),
-                'total_chunks': request.data.get('total_chunks'),
-                'uploaded_chunks': []
-            }, timeout=3600)  # 1 
+            session = models.UploadSession.objects.create(
+                project=project,
+                user=request.user,
+                filename=os.path.basename(filename),
+                total_size=request.data.get('total_size') or None,
+                total_chunks=total_chunks,
+                expires_at=timezone.now() + uploads.SESSION_TTL,
+            )
             
             return Response({
-                'upload_id': upload_id
+                'upload_id': str(session.id),
+                'expires_at': session.expires_at.isoformat()
             })
             
         except Exception as e:
@@ -466,45 +488,53 @@ class VideoUploadInitView(APIView):
 
 
 class VideoUploadChunkView(APIView):
+    """Accepts chunks in any order, in parallel and more than once"""
     permission_classes = [IsAuthenticated]
     parser_classes = [MultiPartParser, FormParser]
     
     def post(self, request, project_id):
         try:
-            from django.core.cache import cache
+            session = get_upload_session(request, project_id, request.data.get('upload_id'))
+            if not session:
+                return Response(
+                    {"message": "   ."},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            if session.feedback_id:
+                return Response(
+                    {"message": "  ."},
+                    status=status.HTTP_409_CONFLICT
+                )
             
-            upload_id = request.data.get('upload_id')
-            chunk_index = int(request.data.get('chunk_index'))
+            try:
+                chunk_index = int(request.data.get('chunk_index'))
+            except (TypeError, ValueError):
+                chunk_index = -1
             chunk_data = request.FILES.get('chunk_data')
-            
-            #   
-            upload_info = cache.get(f'upload_{upload_id}')
-            if not upload_info:
+            if not 0 <= chunk_index < session.total_chunks or chunk_data is None:
                 return Response(
-                    {"message": "   ."},
+                    {"message": "chunk_index, chunk_data  ."},
                     status=status.HTTP_400_BAD_REQUEST
                 )
             
             #  
-            chunk_path = os.path.join(
-                settings.MEDIA_ROOT, 
-                'temp_uploads', 
-                upload_id, 
-                f'chunk_{chunk_index}'
-            )
-            os.makedirs(os.path.dirname(chunk_path), exist_ok=True)
-            
-            with open(chunk_path, 'wb') as f:
-                for chunk in chunk_data.chunks():
-                    f.write(chunk)
+            try:
+                size, checksum = uploads.write_chunk(
+                    str(session.id), chunk_index, chunk_data, request.data.get('checksum')
+                )
+            except uploads.ChunkChecksumMismatch:
+                return Response(
+                    {"message": "CHECKSUM_MISMATCH", "chunk_index": chunk_index},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
             
-            #   
-            upload_info['uploaded_chunks'].append(chunk_index)
-            cache.set(f'upload_{upload_id}', upload_info, timeout=3600)
+            uploads.record_chunk(session, chunk_index, size, checksum)
             
             return Response({
-                'uploaded': len(upload_info['uploaded_chunks']),
-                'total': upload_info['total_chunks']
+                'chunk_index': chunk_index,
+                'checksum': checksum,
+                'uploaded': session.chunks.count(),
+                'total': session.total_chunks
             })
             
         except Exception as e:
@@ -515,65 +545,88 @@ class VideoUploadChunkView(APIView):
             )
 
 
+class VideoUploadStatusView(APIView):
+    """GET/HEAD: which chunks the server has, so a client can resume"""
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request, project_id, upload_id):
+        session = get_upload_session(request, project_id, upload_id)
+        if not session:
+            return Response(
+                {"message": "   ."},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        missing = uploads.missing_chunks(session)
+        uploaded = session.total_chunks - len(missing)
+        response = Response({
+            'upload_id': str(session.id),
+            'uploaded': uploaded,
+            'total': session.total_chunks,
+            'missing': missing,
+            'feedback_id': session.feedback_id,
+            'expires_at': session.expires_at.isoformat()
+        })
+        response['Upload-Chunks-Received'] = str(uploaded)
+        response['Upload-Chunks-Total'] = str(session.total_chunks)
+        response['Cache-Control'] = 'no-store'
+        return response
+
+
 class VideoUploadCompleteView(APIView):
     permission_classes = [IsAuthenticated]
     
     def post(self, request, project_id):
         try:
-            from django.core.cache import cache
-            from django.core.files import File
-            
-            upload_id = request.data.get('upload_id')
-            
-            #   
-            upload_info = cache.get(f'upload_{upload_id}')
-            if not upload_info:
-                return Response(
-                    {"message": "   ."},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            
-            #    
-            if len(upload_info['uploaded_chunks']) != upload_info['total_chunks']:
-                return Response(
-                    {"message": "   ."},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            
-            #  
-            temp_dir = os.path.join(settings.MEDIA_ROOT, 'temp_uploads', upload_id)
-            final_path = os.path.join(temp_dir, upload_info['filename'])
-            
-            with open(final_path, 'wb') as final_file:
-                for i in range(upload_info['total_chunks']):
-                    chunk_path = os.path.join(temp_dir, f'chunk_{i}')
-                    with open(chunk_path, 'rb') as chunk_file:
-                        final_file.write(chunk_file.read())
-                    os.remove(chunk_path)  #   
-            
-            #  
-            project = get_object_or_404(project_model.Project, id=project_id)
-            
-            with open(final_path, 'rb') as f:
+            with transaction.atomic():
+                session = get_upload_session(request, project_id, request.data.get('upload_id'))
+                if not session:
+                    return Response(
+                        {"message": "   ."},
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+                # Serialise concurrent completes of the same session
+                session = models.UploadSession.objects.select_for_update().get(pk=session.pk)
+                if session.feedback_id:
+                    return Response({
+                        'feedback_id': session.feedback_id
+                    }, status=status.HTTP_202_ACCEPTED)
+                
+                #    
+                missing = uploads.missing_chunks(session)
+                if missing:
+                    return Response(
+                        {"message": "   .", "missing": missing},
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+                received_size = session.chunks.aggregate(total=Sum('size'))['total']
+                if session.total_size and received_size != session.total_size:
+                    return Response(
+                        {"message": "SIZE_MISMATCH", "received": received_size},
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+                
+                #  
                 feedback = models.FeedBack.objects.create(
-                    project=project,
+                    project=session.project,
                     user=request.user,
-                    title=f": {upload_info['filename']}",
-                    files=File(f, name=upload_info['filename']),
-                    file_size=upload_info['total_size'],
+                    title=f": {session.filename}",
+                    file_size=received_size,
                     encoding_status='pending'
                 )
-            
-            #   
-            os.remove(final_path)
-            os.rmdir(temp_dir)
-            
-            #  
-            cache.delete(f'upload_{upload_id}')
+                session.feedback = feedback
+                session.expires_at = timezone.now() + uploads.SESSION_TTL
+                session.save(update_fields=['feedback', 'expires_at', 'updated'])
+                
+                # Chunks are concatenated off the request path; files is set when done
+                from .tasks import assemble_chunked_upload
+                transaction.on_commit(lambda: assemble_chunked_upload.delay(
+                    feedback.id, str(session.id), session.total_chunks, session.filename
+                ))
             
             return Response({
                 'feedback_id': feedback.id
-            }, status=status.HTTP_201_CREATED)
+            }, status=status.HTTP_202_ACCEPTED)
             
         except Exception as e:
             logger.error(f"Error in VideoUploadCompleteView: {str(e)}")
@@ -603,6 +656,11 @@ class FeedbackEncodingStatusView(APIView):
                     status=status.HTTP_403_FORBIDDEN
                 )
             
+            # Live value published by the encoding task
+            latest = progress.get_progress(feedback.id)
+            if latest:
+                return Response(latest)
+            
             return Response({
                 'status': feedback.encoding_status,
                 'progress': self._calculate_encoding_progress(feedback)
@@ -630,6 +688,13 @@ class FeedbackEncodingStatusView(APIView):
             return 0
 
 
+def has_project_access(project, user):
+    """Project owner or member"""
+    return bool(project) and (
+        project.user_id == user.id or project.members.filter(user=user).exists()
+    )
+
+
 class FeedbackStreamView(APIView):
     permission_classes = [IsAuthenticated]
     
@@ -642,9 +707,7 @@ class FeedbackStreamView(APIView):
             )
             
             #   
-            project = feedback.project
-            if not (project.user == request.user or 
-                   project.members.filter(user=request.user).exists()):
+            if not has_project_access(feedback.project, request.user):
                 return Response(
                     {"message": "   ."},
                     status=status.HTTP_403_FORBIDDEN
@@ -656,9 +719,20 @@ class FeedbackStreamView(APIView):
                     status=status.HTTP_404_NOT_FOUND
                 )
             
-            return Response({
-                'hls_url': request.build_absolute_uri(feedback.hls_playlist_url)
-            })
+            data = {'hls_url': request.build_absolute_uri(feedback.hls_playlist_url)}
+            # The ABR ladder also carries a DASH manifest over the same segments
+            if feedback.hls_playlist_url.endswith('/master.m3u8'):
+                data['dash_url'] = request.build_absolute_uri(
+                    feedback.hls_playlist_url[:-len('master.m3u8')] + 'manifest.mpd'
+                )
+            # Scrub previews for the review timeline (WebVTT over sprite sheets)
+            track_name = media.sprite_track_name(feedback)
+            if track_name:
+                data['thumbnails_url'] = request.build_absolute_uri(reverse(
+                    f'{request.resolver_match.namespace}:feedback-media-sprites',
+                    kwargs={'feedback_id': feedback.id, 'name': track_name},
+                ))
+            return Response(data)
             
         except Exception as e:
             logger.error(f"Error in FeedbackStreamView: {str(e)}")
@@ -668,6 +742,34 @@ class FeedbackStreamView(APIView):
             )
 
 
+class FeedbackMediaView(View):
+    """GET/HEAD a feedback video, rendition, thumbnail or streaming file
+    
+    Supports Range/If-Range and conditional requests; with MEDIA_OFFLOAD set
+    the bytes are sent by the front server (feedbacks.media).
+    """
+    
+    @user_validator
+    def get(self, request, feedback_id, variant, name=None):
+        feedback = models.FeedBack.objects.select_related('project').filter(id=feedback_id).first()
+        if feedback is None:
+            return JsonResponse({"message": "   ."}, status=404)
+        
+        if not has_project_access(feedback.project, request.user):
+            return JsonResponse({"message": "   ."}, status=403)
+        
+        path = media.feedback_media_path(feedback, variant, name)
+        if path is None:
+            return JsonResponse({"message": "   ."}, status=404)
+        
+        cache_control = media.IMMUTABLE_CACHE_CONTROL if variant == 'sprites' else media.CACHE_CONTROL
+        try:
+            return media.serve_file(request, path, cache_control=cache_control)
+        except (FileNotFoundError, IsADirectoryError, NotADirectoryError):
+            logger.warning(f"Media file missing for feedback {feedback_id}: {path}")
+            return JsonResponse({"message": "   ."}, status=404)
+
+
 #     
 @method_decorator(csrf_exempt, name='dispatch')
 class FeedbackDetail(View):
@@ -721,6 +823,15 @@ class VideoEncodingStatus(View):
     @user_validator
     def get(self, request, id):
         try:
+            # Live value published by the encoding task; no DB hit while encoding
+            latest = progress.get_progress(id)
+            if latest:
+                return JsonResponse({
+                    "encoding_status": latest["status"],
+                    "progress": latest["progress"],
+                    "eta": latest["eta"]
+                })
+            
             feedback = models.FeedBack.objects.get(id=id)
             
             return JsonResponse({
@@ -2,13 +2,14 @@
   API 
  ,  ,  
 """
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse
 from django.views.decorators.cache import cache_page
 from django.views.decorators.http import require_http_methods
 from django.contrib.admin.views.decorators import staff_member_required
 from django.db import connection
 from django.core.cache import cache
 from django.utils import timezone
+from django.utils.crypto import constant_time_compare
 from datetime import datetime, timedelta
 import psutil
 import redis
@@ -17,6 +18,8 @@ import logging
 from channels.layers import get_channel_layer
 from asgiref.sync import async_to_sync
 
+from core.metrics import registry
+
 logger = logging.getLogger(__name__)
 
 class MetricsCollector:
@@ -272,6 +275,24 @@ def metrics(request):
     
     return JsonResponse(metrics_data)
 
+@require_http_methods(["GET"])
+def prometheus_metrics(request):
+    """Prometheus scrape endpoint for core.metrics (all workers)
+
+    Staff sessions, or ``Authorization: Bearer <METRICS_TOKEN>`` for the scraper.
+    """
+    from django.conf import settings
+    
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    header = request.headers.get('Authorization', '')
+    authorized = request.user.is_authenticated and request.user.is_staff
+    if not authorized and token:
+        authorized = constant_time_compare(header, f'Bearer {token}')
+    if not authorized:
+        return HttpResponse(status=403)
+    
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
 @staff_member_required
 @require_http_methods(["GET"])
 @cache_page(60)  # 1 
@@ -0,0 +1,416 @@
+"""
+Project dashboard snapshot
+
+ProjectList.get payload is precomputed per user and kept in the cache as
+JSON text together with a version stamp.  projects.signals bumps the stamp
+whenever a row that contributes to the payload changes, so a dashboard load
+is a single cache read until something relevant is written.
+"""
+import base64
+import binascii
+import json
+import logging
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Case, IntegerField, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Coalesce
+from django.utils.dateparse import parse_datetime
+
+from feedbacks import models as feedback_models
+
+from . import models
+
+logger = logging.getLogger(__name__)
+
+# Snapshots are also bounded by a TTL so that data we do not track through
+# signals (e.g. another member's nickname) eventually refreshes.
+SNAPSHOT_TIMEOUT = 3600
+VERSION_TIMEOUT = None  # version stamps never expire on their own
+
+SNAPSHOT_KEY = "project_dashboard:snapshot:{user_id}"
+USER_VERSION_KEY = "project_dashboard:version:{user_id}"
+GLOBAL_VERSION_KEY = "project_dashboard:version:global"
+
+PHASE_FIELDS = (
+    "basic_plan",
+    "story_board",
+    "filming",
+    "video_edit",
+    "post_work",
+    "video_preview",
+    "confirmation",
+    "video_delivery",
+)
+
+
+def _new_version():
+    return uuid.uuid4().hex
+
+
+def get_snapshot(user):
+    """Return the dashboard payload for ``user`` as JSON text."""
+    snapshot_key = SNAPSHOT_KEY.format(user_id=user.id)
+    version_key = USER_VERSION_KEY.format(user_id=user.id)
+
+    try:
+        cached = cache.get_many([snapshot_key, version_key, GLOBAL_VERSION_KEY])
+    except Exception as e:
+        logger.warning(f"Dashboard snapshot cache read failed for user {user.id}: {e}")
+        return build_snapshot(user)
+
+    user_version = cached.get(version_key)
+    global_version = cached.get(GLOBAL_VERSION_KEY)
+    snapshot = cached.get(snapshot_key)
+
+    if (
+        snapshot
+        and user_version is not None
+        and global_version is not None
+        and snapshot.get("version") == [user_version, global_version]
+    ):
+        return snapshot["content"]
+
+    # Missing stamps are created before building so that a concurrent
+    # invalidation always wins over the snapshot we are about to write.
+    if user_version is None:
+        user_version = _new_version()
+        cache.add(version_key, user_version, VERSION_TIMEOUT)
+        user_version = cache.get(version_key, user_version)
+    if global_version is None:
+        global_version = _new_version()
+        cache.add(GLOBAL_VERSION_KEY, global_version, VERSION_TIMEOUT)
+        global_version = cache.get(GLOBAL_VERSION_KEY, global_version)
+
+    content = build_snapshot(user)
+    try:
+        cache.set(
+            snapshot_key,
+            {"version": [user_version, global_version], "content": content},
+            SNAPSHOT_TIMEOUT,
+        )
+    except Exception as e:
+        logger.warning(f"Dashboard snapshot cache write failed for user {user.id}: {e}")
+    return content
+
+
+def invalidate_users(user_ids):
+    """Bump the version stamp of every user in ``user_ids`` after commit."""
+    user_ids = {user_id for user_id in user_ids if user_id}
+    if not user_ids:
+        return
+
+    def bump():
+        try:
+            cache.set_many(
+                {USER_VERSION_KEY.format(user_id=user_id): _new_version() for user_id in user_ids},
+                VERSION_TIMEOUT,
+            )
+        except Exception as e:
+            logger.warning(f"Dashboard snapshot invalidation failed for users {user_ids}: {e}")
+
+    transaction.on_commit(bump)
+
+
+def invalidate_all():
+    """Bump the global stamp, used for data shared by every dashboard."""
+    def bump():
+        try:
+            cache.set(GLOBAL_VERSION_KEY, _new_version(), VERSION_TIMEOUT)
+        except Exception as e:
+            logger.warning(f"Dashboard global invalidation failed: {e}")
+
+    transaction.on_commit(bump)
+
+
+def project_user_ids(project_ids):
+    """Owner and member ids of the given projects."""
+    project_ids = [project_id for project_id in project_ids if project_id]
+    if not project_ids:
+        return set()
+    owners = models.Project.objects.filter(id__in=project_ids).values_list("user_id", flat=True)
+    members = models.Members.objects.filter(project_id__in=project_ids).values_list("user_id", flat=True)
+    return set(owners) | set(members)
+
+
+_encode = DjangoJSONEncoder().encode
+
+# Column order of a dashboard project row; see _project_rows
+PROJECT_COLUMNS = (
+    ("id", "id"),
+    ("name", "name"),
+    ("manager", "manager"),
+    ("consumer", "consumer"),
+    ("description", "description"),
+    ("color", "color"),
+    *(
+        (f"{field}__{bound}", f"{field}__{bound}")
+        for field in PHASE_FIELDS
+        for bound in ("start_date", "end_date")
+    ),
+    ("first_date", "first_date"),
+    ("end_date", "end_date"),
+    ("created", "created"),
+    ("updated", "updated"),
+    ("owner_nickname", "user__nickname"),
+    ("owner_email", "user__username"),
+    ("feedback_id", "latest_feedback_id"),
+)
+
+
+def _project_queryset(user):
+    """Owned and member projects of ``user``.
+
+    first_date/end_date are resolved in SQL: the first phase with a start
+    date and the last phase with an end date.
+    """
+    latest_feedback = (
+        feedback_models.FeedBack.objects.filter(project=OuterRef("pk"))
+        .order_by("-created")
+        .values("id")[:1]
+    )
+    member_projects = models.Members.objects.filter(user=user).values("project_id")
+
+    return (
+        models.Project.objects.filter(Q(user=user) | Q(id__in=Subquery(member_projects)))
+        .annotate(
+            first_date=Coalesce(*(f"{field}__start_date" for field in PHASE_FIELDS)),
+            end_date=Coalesce(*(f"{field}__end_date" for field in reversed(PHASE_FIELDS))),
+            latest_feedback_id=Subquery(latest_feedback),
+            is_owner=Case(When(user=user, then=Value(1)), default=Value(0), output_field=IntegerField()),
+        )
+    )
+
+
+def _project_rows(user):
+    """Dashboard rows of ``user`` in PROJECT_COLUMNS order, in a single query."""
+    return (
+        _project_queryset(user)
+        # Owned projects first, then memberships, as the view always returned.
+        .order_by("-is_owner", "id")
+        .values_list(*(column for _, column in PROJECT_COLUMNS))
+    )
+
+
+def _object(pairs):
+    """JSON object text from ``(key, value)`` pairs."""
+    return "{" + ", ".join(f"{_encode(key)}: {_encode(value)}" for key, value in pairs) + "}"
+
+
+def _write_projects(chunks, rows, members, comments):
+    phase_start = 6
+    tail = phase_start + 2 * len(PHASE_FIELDS)
+    tail_keys = [key for key, _ in PROJECT_COLUMNS[tail:]]
+
+    chunks.append("[")
+    for index, row in enumerate(rows):
+        if index:
+            chunks.append(", ")
+        chunks.append("{")
+        chunks.append(", ".join(
+            f"{_encode(key)}: {_encode(value)}"
+            for (key, _), value in zip(PROJECT_COLUMNS[:phase_start], row)
+        ))
+        for offset, field in enumerate(PHASE_FIELDS):
+            start_date, end_date = row[phase_start + 2 * offset:phase_start + 2 * offset + 2]
+            chunks.append(f', "{field}": ')
+            chunks.append(_object((("start_date", start_date), ("end_date", end_date))))
+        for key, value in zip(tail_keys, row[tail:]):
+            chunks.append(f", {_encode(key)}: {_encode(value)}")
+        feedback_id = row[-1]
+        chunks.append(', "feedback": [')
+        chunks.append(", ".join(comments.get(feedback_id, ())) if feedback_id else "")
+        chunks.append('], "member_list": [')
+        chunks.append(", ".join(members.get(row[0], ())))
+        chunks.append("]}")
+    chunks.append("]")
+
+
+def _member_objects(project_ids):
+    members = {}
+    rows = (
+        models.Members.objects.filter(project_id__in=project_ids)
+        .order_by("id")
+        .values_list("project_id", "id", "rating", "user__username", "user__nickname")
+    )
+    for project_id, member_id, rating, email, nickname in rows.iterator():
+        members.setdefault(project_id, []).append(_object((
+            ("id", member_id), ("rating", rating), ("email", email), ("nickname", nickname),
+        )))
+    return members
+
+
+def _comment_objects(feedback_ids):
+    comments = {}
+    rows = (
+        feedback_models.FeedBackComment.objects.filter(feedback_id__in=feedback_ids)
+        .order_by("-created")
+        .values_list(
+            "feedback_id", "id", "text", "security", "user__nickname",
+            "section", "title", "created", "updated",
+        )
+    )
+    for feedback_id, comment_id, text, security, nickname, section, title, created, updated in rows.iterator():
+        comments.setdefault(feedback_id, []).append(_object((
+            ("id", comment_id),
+            ("text", text),
+            ("nickname", nickname if not security else ""),
+            ("section", section),
+            ("title", title),
+            ("created", created),
+            ("updated", updated),
+        )))
+    return comments
+
+
+def build_snapshot(user):
+    """Build the ProjectList payload for ``user`` as JSON text.
+
+    Projects, members and feedback comments are each loaded with one query,
+    regardless of how many projects the user can see, and written straight
+    into the output without building per-project dicts.
+    """
+    rows = list(_project_rows(user))
+    project_ids = [row[0] for row in rows]
+    feedback_ids = [row[-1] for row in rows if row[-1]]
+
+    members = _member_objects(project_ids) if project_ids else {}
+    comments = _comment_objects(feedback_ids) if feedback_ids else {}
+
+    sample_files = [
+        {
+            "file_name": i.files.name,
+            "files": "http://127.0.0.1:8000" + i.files.url if settings.DEBUG else i.files.url,
+        }
+        for i in models.SampleFiles.objects.all()
+        if i.files
+    ]
+
+    try:
+        user_memos = list(user.memos.all().values("id", "date", "memo"))
+    except AttributeError:
+        user_memos = []
+
+    profile_image = None
+    try:
+        if hasattr(user, "profile") and user.profile.profile_image:
+            profile_image = user.profile.profile_image.url
+    except Exception:
+        pass
+
+    chunks = ['{"result": ']
+    _write_projects(chunks, rows, members, comments)
+    chunks.append(f', "user": {_encode(user.username)}')
+    chunks.append(f', "nickname": {_encode(user.nickname or user.username)}')
+    chunks.append(f', "profile_image": {_encode(profile_image)}')
+    chunks.append(f', "sample_files": {_encode(sample_files)}')
+    chunks.append(f', "user_memos": {_encode(user_memos)}')
+    chunks.append("}")
+    return "".join(chunks)
+
+
+# ---------------------------------------------------------------------------
+# Paginated project list
+# ---------------------------------------------------------------------------
+
+PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+# Field name accepted by ``fields=`` -> columns it needs
+PAGE_FIELDS = {
+    **{key: (column,) for key, column in PROJECT_COLUMNS if "__" not in key},
+    **{field: (f"{field}__start_date", f"{field}__end_date") for field in PHASE_FIELDS},
+    "feedback": ("latest_feedback_id",),
+    "member_list": (),
+}
+
+
+class InvalidPageRequest(ValueError):
+    pass
+
+
+def _encode_cursor(updated, project_id):
+    raw = json.dumps([updated.isoformat(), project_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        updated, project_id = json.loads(raw)
+        updated = parse_datetime(updated)
+        if updated is None:
+            raise ValueError
+        return updated, int(project_id)
+    except (ValueError, TypeError, binascii.Error):
+        raise InvalidPageRequest("invalid cursor")
+
+
+def parse_fields(value):
+    """Validate a ``fields=`` value; all fields when empty."""
+    if not value:
+        return list(PAGE_FIELDS)
+    fields = [field.strip() for field in value.split(",") if field.strip()]
+    unknown = [field for field in fields if field not in PAGE_FIELDS]
+    if unknown:
+        raise InvalidPageRequest(f"unknown fields: {', '.join(unknown)}")
+    return fields
+
+
+def build_page(user, fields, cursor=None, limit=PAGE_SIZE):
+    """One page of the user's projects as JSON text, newest ``updated`` first.
+
+    Keyset pagination on ``(updated, id)``: ``cursor`` is the opaque
+    ``next_cursor`` of the previous page.  Only the columns needed by
+    ``fields`` are selected, and members/comments are loaded only when
+    requested.
+    """
+    limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+
+    queryset = _project_queryset(user)
+    if cursor:
+        updated, project_id = _decode_cursor(cursor)
+        queryset = queryset.filter(Q(updated__lt=updated) | Q(updated=updated, id__lt=project_id))
+
+    columns = ["id", "updated"]
+    for field in fields:
+        columns += [column for column in PAGE_FIELDS[field] if column not in columns]
+    rows = list(queryset.order_by("-updated", "-id").values_list(*columns)[:limit + 1])
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    index = {column: position for position, column in enumerate(columns)}
+
+    project_ids = [row[0] for row in rows]
+    members = _member_objects(project_ids) if "member_list" in fields and project_ids else {}
+    feedback_ids = [row[index["latest_feedback_id"]] for row in rows] if "feedback" in fields else []
+    feedback_ids = [feedback_id for feedback_id in feedback_ids if feedback_id]
+    comments = _comment_objects(feedback_ids) if feedback_ids else {}
+
+    chunks = ['{"result": [']
+    for position, row in enumerate(rows):
+        if position:
+            chunks.append(", ")
+        parts = []
+        for field in fields:
+            if field == "member_list":
+                value = "[" + ", ".join(members.get(row[0], ())) + "]"
+            elif field == "feedback":
+                value = "[" + ", ".join(comments.get(row[index["latest_feedback_id"]], ())) + "]"
+            elif field in PHASE_FIELDS:
+                start_column, end_column = PAGE_FIELDS[field]
+                value = _object((
+                    ("start_date", row[index[start_column]]),
+                    ("end_date", row[index[end_column]]),
+                ))
+            else:
+                value = _encode(row[index[PAGE_FIELDS[field][0]]])
+            parts.append(f"{_encode(field)}: {value}")
+        chunks.append("{" + ", ".join(parts) + "}")
+    chunks.append("]")
+
+    next_cursor = _encode_cursor(rows[-1][1], rows[-1][0]) if has_more else None
+    chunks.append(f', "next_cursor": {_encode(next_cursor)}, "has_more": {_encode(has_more)}}}')
+    return "".join(chunks)
@@ -1,6 +1,11 @@
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from django.contrib.auth import get_user_model
+from core.cache_optimization import smart_cache, user_tag
+from feedbacks import models as feedback_models
+from users import models as user_models
+from . import dashboard, models
 from .models import DevelopmentFramework
 
 User = get_user_model()
@@ -19,4 +24,98 @@ def create_default_framework(sender, instance, created, **kwargs):
                 twist='     .  ,   ,        .',
                 hook_next='       . " ..."  "  ..."    .',
                 is_default=True
-            )
\ No newline at end of file
+            )
+
+
+@receiver([post_save, post_delete], sender=DevelopmentFramework)
+def invalidate_framework_cache(sender, instance, **kwargs):
+    # DevelopmentFrameworkList caches the list under the owner's tag
+    if instance.user_id:
+        transaction.on_commit(lambda: smart_cache.invalidate_tags(user_tag(instance.user_id)))
+
+
+# Dashboard snapshot invalidation (projects.dashboard).
+# Every row that ends up in the ProjectList payload bumps the version stamp
+# of the users who can see it.
+
+PHASE_MODELS = (
+    models.BasicPlan,
+    models.Storyboard,
+    models.Filming,
+    models.VideoEdit,
+    models.PostWork,
+    models.VideoPreview,
+    models.Confirmation,
+    models.VideoDelivery,
+)
+
+
+@receiver([post_save, post_delete], sender=models.Project)
+def invalidate_dashboard_for_project(sender, instance, **kwargs):
+    user_ids = dashboard.project_user_ids([instance.id])
+    user_ids.add(instance.user_id)
+    dashboard.invalidate_users(user_ids)
+
+
+@receiver([post_save, post_delete], sender=models.Members)
+def invalidate_dashboard_for_member(sender, instance, **kwargs):
+    # The member itself is included so that a removed member loses the project
+    user_ids = dashboard.project_user_ids([instance.project_id])
+    user_ids.add(instance.user_id)
+    dashboard.invalidate_users(user_ids)
+
+
+@receiver([post_save, post_delete], sender=models.Memo)
+def invalidate_dashboard_for_memo(sender, instance, **kwargs):
+    dashboard.invalidate_users(dashboard.project_user_ids([instance.project_id]))
+
+
+@receiver([post_save, post_delete], sender=models.SampleFiles)
+def invalidate_dashboard_for_sample_files(sender, instance, **kwargs):
+    # Sample files are shared by every dashboard
+    dashboard.invalidate_all()
+
+
+def invalidate_dashboard_for_phase(sender, instance, **kwargs):
+    # Deleting a phase item cascades to its projects, so only saves matter here
+    field = sender._meta.get_field("projects").field.name
+    project_ids = models.Project.objects.filter(**{field: instance.pk}).values_list("id", flat=True)
+    dashboard.invalidate_users(dashboard.project_user_ids(list(project_ids)))
+
+
+for phase_model in PHASE_MODELS:
+    post_save.connect(invalidate_dashboard_for_phase, sender=phase_model)
+
+
+@receiver([post_save, post_delete], sender=feedback_models.FeedBack)
+def invalidate_dashboard_for_feedback(sender, instance, **kwargs):
+    dashboard.invalidate_users(dashboard.project_user_ids([instance.project_id]))
+
+
+@receiver([post_save, post_delete], sender=feedback_models.FeedBackComment)
+def invalidate_dashboard_for_comment(sender, instance, **kwargs):
+    project_id = (
+        feedback_models.FeedBack.objects.filter(id=instance.feedback_id)
+        .values_list("project_id", flat=True)
+        .first()
+    )
+    dashboard.invalidate_users(dashboard.project_user_ids([project_id]))
+
+
+@receiver([post_save, post_delete], sender=user_models.UserMemo)
+def invalidate_dashboard_for_user_memo(sender, instance, **kwargs):
+    dashboard.invalidate_users([instance.user_id])
+
+
+@receiver([post_save, post_delete], sender=user_models.UserProfile)
+def invalidate_dashboard_for_user_profile(sender, instance, **kwargs):
+    # The snapshot carries the profile image
+    dashboard.invalidate_users([instance.user_id])
+
+
+@receiver(post_save, sender=User)
+def invalidate_dashboard_for_user(sender, instance, created, update_fields=None, **kwargs):
+    # Login only touches last_login, which the dashboard does not show
+    if created or (update_fields and set(update_fields) == {"last_login"}):
+        return
+    dashboard.invalidate_users([instance.id])
@@ -1,3 +1,64 @@
+import json
+
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from feedbacks import models as feedback_models
+from users.models import User
+from . import dashboard, models
+
+
+class DashboardQueryCountTest(TestCase):
+    """Benchmark fixture: dashboard query count must not grow with projects"""
+
+    MEMBERS_PER_PROJECT = 20
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.member_users = User.objects.bulk_create([
+            User(username=f"member{i}@example.com", email=f"member{i}@example.com", nickname=f"m{i}")
+            for i in range(cls.MEMBERS_PER_PROJECT)
+        ])
+
+    def _populate(self, owner, count):
+        plans = models.BasicPlan.objects.bulk_create([models.BasicPlan() for _ in range(count)])
+        projects = models.Project.objects.bulk_create([
+            models.Project(user=owner, name=f"project {i}", manager="m", consumer="c", basic_plan=plan)
+            for i, plan in enumerate(plans)
+        ])
+        models.Members.objects.bulk_create([
+            models.Members(project=project, user=member)
+            for project in projects
+            for member in self.member_users
+        ])
+        feedbacks = feedback_models.FeedBack.objects.bulk_create([
+            feedback_models.FeedBack(project=project, user=owner) for project in projects
+        ])
+        feedback_models.FeedBackComment.objects.bulk_create([
+            feedback_models.FeedBackComment(feedback=feedback, user=self.member_users[0], text="comment")
+            for feedback in feedbacks
+        ])
+
+    def _count_queries(self, user):
+        with CaptureQueriesContext(connection) as context:
+            dashboard.build_snapshot(user)
+        return len(context.captured_queries)
+
+    def test_query_count_is_constant(self):
+        small = User.objects.create(username="small@example.com", email="small@example.com")
+        large = User.objects.create(username="large@example.com", email="large@example.com")
+        self._populate(small, 10)
+        self._populate(large, 1000)
+
+        self.assertEqual(self._count_queries(small), self._count_queries(large))
+
+    def test_member_sees_projects_with_members_and_comments(self):
+        owner = User.objects.create(username="owner@example.com", email="owner@example.com")
+        self._populate(owner, 3)
+
+        payload = json.loads(dashboard.build_snapshot(self.member_users[1]))
 
-# Create your tests here.
+        self.assertEqual(len(payload["result"]), 3)
+        self.assertEqual(len(payload["result"][0]["member_list"]), self.MEMBERS_PER_PROJECT)
+        self.assertEqual(payload["result"][0]["feedback"][0]["text"], "comment")
@@ -17,6 +17,7 @@ app_name = "projects"
 urlpatterns = [
     path("", views.ProjectList.as_view()),  # GET /api/projects/
     path("project_list/", views.ProjectList.as_view()),  #   
+    path("project_list/page/", views.ProjectListPage.as_view()),  # cursor pagination + fields=
     path(
         "invite_project/<int:project_id>", views.InviteMember.as_view()
     ),  #  ,  
@@ -7,7 +7,7 @@ from datetime import datetime, timedelta
 from django.shortcuts import render
 from django.utils import timezone
 from django.utils import timezone as django_timezone
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse
 from django.views import View
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
@@ -18,12 +18,13 @@ from users.utils import (
     project_token_generator,
     check_project_token,
 )
-from . import models
+from . import dashboard, models
 from feedbacks import models as feedback_model
 from .utils_date import parse_date_flexible
 from common.exceptions import APIException
 from core.response_handler import StandardResponse
 from core.error_messages import ErrorMessages
+from core.cache_optimization import CACHE_TTL, smart_cache, user_tag
 # from .views_feedback import ProjectFeedback, ProjectFeedbackComments, ProjectFeedbackUpload
 
 from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
@@ -50,308 +51,10 @@ class ProjectList(View):
     def get(self, request):
         try:
             logger.info(f"ProjectList GET request from user: {request.user.email}")
-            user = request.user
-            
-            #   (  - django_cache_table )
-            # cache_key = f"project_list_{user.id}"
-            # cached_result = cache.get(cache_key)
-            # 
-            # if cached_result is not None:
-            #     logger.info(f"Returning cached project list for user: {user.email}")
-            #     return JsonResponse(cached_result, safe=False)
-            
-            # nickname 
-            if user.nickname:
-                nickname = user.nickname
-            else:
-                nickname = user.username
-
-            # development_framework    
-            # : feedbacks__comments__user  N+1  
-            project_list = user.projects.all().select_related(
-                "basic_plan",
-                "story_board",
-                "filming",
-                "video_edit",
-                "post_work",
-                "video_preview",
-                "confirmation",
-                "video_delivery"
-            ).prefetch_related(
-                'feedbacks',  #    
-                'feedbacks__comments__user',  #      
-                'members__user',  #     
-                'invitations'  #    
-            )
-            result = []
-            for i in project_list:
-                if i.video_delivery and i.video_delivery.end_date:
-                    end_date = i.video_delivery.end_date
-                elif i.confirmation and i.confirmation.end_date:
-                    end_date = i.confirmation.end_date
-                elif i.video_preview and i.video_preview.end_date:
-                    end_date = i.video_preview.end_date
-                elif i.post_work and i.post_work.end_date:
-                    end_date = i.post_work.end_date
-                elif i.video_edit and i.video_edit.end_date:
-                    end_date = i.video_edit.end_date
-                elif i.filming and i.filming.end_date:
-                    end_date = i.filming.end_date
-                elif i.story_board and i.story_board.end_date:
-                    end_date = i.story_board.end_date
-                elif i.basic_plan and i.basic_plan.end_date:
-                    end_date = i.basic_plan.end_date
-                else:
-                    end_date = None
-
-                if i.basic_plan and i.basic_plan.start_date:
-                    first_date = i.basic_plan.start_date
-                elif i.story_board and i.story_board.start_date:
-                    first_date = i.story_board.start_date
-                elif i.filming and i.filming.start_date:
-                    first_date = i.filming.start_date
-                elif i.video_edit and i.video_edit.start_date:
-                    first_date = i.video_edit.start_date
-                elif i.post_work and i.post_work.start_date:
-                    first_date = i.post_work.start_date
-                elif i.video_preview and i.video_preview.start_date:
-                    first_date = i.video_preview.start_date
-                elif i.confirmation and i.confirmation.start_date:
-                    first_date = i.confirmation.start_date
-                elif i.video_delivery and i.video_delivery.start_date:
-                    first_date = i.video_delivery.start_date
-                else:
-                    first_date = None
-
-                result.append(
-                    {
-                        "id": i.id,
-                        "name": i.name,
-                        "manager": i.manager,
-                        "consumer": i.consumer,
-                        "description": i.description,
-                        "color": i.color,
-                        "basic_plan": {
-                            "start_date": i.basic_plan.start_date if i.basic_plan else None,
-                            "end_date": i.basic_plan.end_date if i.basic_plan else None,
-                        },
-                        "story_board": {
-                            "start_date": i.story_board.start_date if i.story_board else None,
-                            "end_date": i.story_board.end_date if i.story_board else None,
-                        },
-                        "filming": {
-                            "start_date": i.filming.start_date if i.filming else None,
-                            "end_date": i.filming.end_date if i.filming else None,
-                        },
-                        "video_edit": {
-                            "start_date": i.video_edit.start_date if i.video_edit else None,
-                            "end_date": i.video_edit.end_date if i.video_edit else None,
-                        },
-                        "post_work": {
-                            "start_date": i.post_work.start_date if i.post_work else None,
-                            "end_date": i.post_work.end_date if i.post_work else None,
-                        },
-                        "video_preview": {
-                            "start_date": i.video_preview.start_date if i.video_preview else None,
-                            "end_date": i.video_preview.end_date if i.video_preview else None,
-                        },
-                        "confirmation": {
-                            "start_date": i.confirmation.start_date if i.confirmation else None,
-                            "end_date": i.confirmation.end_date if i.confirmation else None,
-                        },
-                        "video_delivery": {
-                            "start_date": i.video_delivery.start_date if i.video_delivery else None,
-                            "end_date": i.video_delivery.end_date if i.video_delivery else None,
-                        },
-                        "first_date": first_date,
-                        "end_date": end_date,
-                        "created": i.created,
-                        "updated": i.updated,
-                        "owner_nickname": i.user.nickname,
-                        "owner_email": i.user.username,
-                        "feedback_id": i.feedback.id if i.feedback else None,
-                        "feedback": [
-                            {
-                                "id": fb.id,
-                                "text": fb.text,
-                                "nickname": fb.user.nickname if not fb.security else "",
-                                "section": fb.section,
-                                "title": fb.title,
-                                "created": fb.created,
-                                "updated": fb.updated,
-                            }
-                            for fb in (i.feedback.comments.all() if i.feedback else [])
-                        ],
-                        # "pending_list": list(i.invites.all().values("id", "email")),
-                        "member_list": list(
-                            i.members.all()
-                            .annotate(email=F("user__username"), nickname=F("user__nickname"))
-                            .values("id", "rating", "email", "nickname")
-                        ),
-                        # "files": list(i.files.all().values("id", "files")),
-                    }
-                )
-
-            members = user.members.all().select_related(
-                "project", 
-                "project__basic_plan",
-                "project__story_board",
-                "project__filming",
-                "project__video_edit",
-                "project__post_work",
-                "project__video_preview",
-                "project__confirmation",
-                "project__video_delivery",
-                "project__user"
-            ).prefetch_related(
-                'project__feedbacks',
-                'project__feedbacks__comments'
-            )
-            for i in members:
-                if i.project.video_delivery and i.project.video_delivery.end_date:
-                    end_date = i.project.video_delivery.end_date
-                elif i.project.confirmation and i.project.confirmation.end_date:
-                    end_date = i.project.confirmation.end_date
-                elif i.project.video_preview and i.project.video_preview.end_date:
-                    end_date = i.project.video_preview.end_date
-                elif i.project.post_work and i.project.post_work.end_date:
-                    end_date = i.project.post_work.end_date
-                elif i.project.video_edit and i.project.video_edit.end_date:
-                    end_date = i.project.video_edit.end_date
-                elif i.project.filming and i.project.filming.end_date:
-                    end_date = i.project.filming.end_date
-                elif i.project.story_board and i.project.story_board.end_date:
-                    end_date = i.project.story_board.end_date
-                elif i.project.basic_plan and i.project.basic_plan.end_date:
-                    end_date = i.project.basic_plan.end_date
-                else:
-                    end_date = None
-
-                if i.project.basic_plan and i.project.basic_plan.start_date:
-                    first_date = i.project.basic_plan.start_date
-                elif i.project.story_board and i.project.story_board.start_date:
-                    first_date = i.project.story_board.start_date
-                elif i.project.filming and i.project.filming.start_date:
-                    first_date = i.project.filming.start_date
-                elif i.project.video_edit and i.project.video_edit.start_date:
-                    first_date = i.project.video_edit.start_date
-                elif i.project.post_work and i.project.post_work.start_date:
-                    first_date = i.project.post_work.start_date
-                elif i.project.video_preview and i.project.video_preview.start_date:
-                    first_date = i.project.video_preview.start_date
-                elif i.project.confirmation and i.project.confirmation.start_date:
-                    first_date = i.project.confirmation.start_date
-                elif i.project.video_delivery and i.project.video_delivery.start_date:
-                    first_date = i.project.video_delivery.start_date
-                else:
-                    first_date = None
-                result.append(
-                    {
-                        "id": i.project.id,
-                        "name": i.project.name,
-                        "manager": i.project.manager,
-                        "consumer": i.project.consumer,
-                        "description": i.project.description,
-                        "color": i.project.color,
-                        "basic_plan": {
-                            "start_date": i.project.basic_plan.start_date if i.project.basic_plan else None,
-                            "end_date": i.project.basic_plan.end_date if i.project.basic_plan else None,
-                        },
-                        "story_board": {
-                            "start_date": i.project.story_board.start_date if i.project.story_board else None,
-                            "end_date": i.project.story_board.end_date if i.project.story_board else None,
-                        },
-                        "filming": {
-                            "start_date": i.project.filming.start_date if i.project.filming else None,
-                            "end_date": i.project.filming.end_date if i.project.filming else None,
-                        },
-                        "video_edit": {
-                            "start_date": i.project.video_edit.start_date if i.project.video_edit else None,
-                            "end_date": i.project.video_edit.end_date if i.project.video_edit else None,
-                        },
-                        "post_work": {
-                            "start_date": i.project.post_work.start_date if i.project.post_work else None,
-                            "end_date": i.project.post_work.end_date if i.project.post_work else None,
-                        },
-                        "video_preview": {
-                            "start_date": i.project.video_preview.start_date if i.project.video_preview else None,
-                            "end_date": i.project.video_preview.end_date if i.project.video_preview else None,
-                        },
-                        "confirmation": {
-                            "start_date": i.project.confirmation.start_date if i.project.confirmation else None,
-                            "end_date": i.project.confirmation.end_date if i.project.confirmation else None,
-                        },
-                        "video_delivery": {
-                            "start_date": i.project.video_delivery.start_date if i.project.video_delivery else None,
-                            "end_date": i.project.video_delivery.end_date if i.project.video_delivery else None,
-                        },
-                        "first_date": first_date,
-                        "end_date": end_date,
-                        "created": i.project.created,
-                        "updated": i.project.updated,
-                        "owner_nickname": i.project.user.nickname,
-                        "owner_email": i.project.user.username,
-                        "feedback_id": i.project.feedback.id if i.project.feedback else None,
-                        "feedback": [
-                            {
-                                "id": fb.id,
-                                "text": fb.text,
-                                "nickname": fb.user.nickname if not fb.security else "",
-                                "section": fb.section,
-                                "title": fb.title,
-                                "created": fb.created,
-                                "updated": fb.updated,
-                            }
-                            for fb in (i.project.feedback.comments.all() if i.project.feedback else [])
-                        ],
-                        # "pending_list": list(i.project.invites.all().values("id", "email")),
-                        "member_list": list(
-                            i.project.members.all()
-                            .annotate(email=F("user__username"), nickname=F("user__nickname"))
-                            .values("id", "rating", "email", "nickname")
-                        ),
-                        # "files": list(i.project.files.all().values("id", "files")),
-                    }
-                )
-
-            sample_files = [
-                {
-                    "file_name": i.files.name,
-                    "files": "http://127.0.0.1:8000" + i.files.url if settings.DEBUG else i.files.url,
-                }
-                for i in models.SampleFiles.objects.all()
-                if i.files
-            ]
 
-            # user_memos  
-            try:
-                user_memos = list(user.memos.all().values("id", "date", "memo"))
-            except AttributeError:
-                user_memos = []
-            
-            #   URL 
-            profile_image = None
-            try:
-                if hasattr(user, 'profile') and user.profile.profile_image:
-                    profile_image = user.profile.profile_image.url
-            except:
-                pass
-
-            #   
-            response_data = {
-                "result": result,
-                "user": user.username,
-                "nickname": nickname,
-                "profile_image": profile_image,
-                "sample_files": sample_files,
-                "user_memos": user_memos,
-            }
-            
-            #   (5 ) -  
-            # cache.set(cache_key, response_data, 300)
-            # logger.info(f"Cached project list for user: {user.email}")
-            
-            return JsonResponse(response_data, status=200)
+            # Precomputed per-user snapshot, invalidated by projects.signals
+            content = dashboard.get_snapshot(request.user)
+            return HttpResponse(content, content_type="application/json", status=200)
         except Exception as e:
             logger.error(f"Error in ProjectList: {str(e)}", exc_info=True)
             logging.error(f"ProjectList error for user {request.user.id}: {str(e)}")
@@ -377,6 +80,29 @@ class ProjectList(View):
             }, status=500)
 
 
+@method_decorator(csrf_exempt, name='dispatch')
+class ProjectListPage(View):
+    """Paginated ProjectList: ?cursor=&limit=&fields=id,name,first_date,end_date"""
+
+    @user_validator
+    def get(self, request):
+        try:
+            fields = dashboard.parse_fields(request.GET.get("fields"))
+            try:
+                limit = int(request.GET.get("limit", dashboard.PAGE_SIZE))
+            except ValueError:
+                raise dashboard.InvalidPageRequest("invalid limit")
+            content = dashboard.build_page(
+                request.user, fields, cursor=request.GET.get("cursor"), limit=limit
+            )
+            return HttpResponse(content, content_type="application/json", status=200)
+        except dashboard.InvalidPageRequest as e:
+            return JsonResponse({"message": str(e)}, status=400)
+        except Exception as e:
+            logger.error(f"Error in ProjectListPage: {str(e)}", exc_info=True)
+            return JsonResponse({"message": "     ."}, status=500)
+
+
 #   ,   ,   
 @method_decorator(csrf_exempt, name='dispatch')
 class InviteMember(View):
@@ -2284,21 +2010,31 @@ class DevelopmentFrameworkList(View):
     def get(self, request):
         try:
             user = request.user
-            frameworks = models.DevelopmentFramework.objects.filter(user=user).order_by('-is_default', '-created')
-            
-            result = []
-            for framework in frameworks:
-                result.append({
-                    "id": framework.id,
-                    "name": framework.name,
-                    "intro_hook": framework.intro_hook,
-                    "immersion": framework.immersion,
-                    "twist": framework.twist,
-                    "hook_next": framework.hook_next,
-                    "is_default": framework.is_default,
-                    "created": framework.created,
-                    "updated": framework.updated,
-                })
+
+            def load_frameworks():
+                frameworks = models.DevelopmentFramework.objects.filter(user=user).order_by('-is_default', '-created')
+                return [
+                    {
+                        "id": framework.id,
+                        "name": framework.name,
+                        "intro_hook": framework.intro_hook,
+                        "immersion": framework.immersion,
+                        "twist": framework.twist,
+                        "hook_next": framework.hook_next,
+                        "is_default": framework.is_default,
+                        "created": framework.created,
+                        "updated": framework.updated,
+                    }
+                    for framework in frameworks
+                ]
+
+            # Invalidated by projects.signals on any framework change
+            result = smart_cache.get_or_set(
+                f"frameworks:user:{user.id}",
+                load_frameworks,
+                timeout=CACHE_TTL['long'],
+                tags=[user_tag(user.id)],
+            )
             
             return JsonResponse({
                 "frameworks": result,
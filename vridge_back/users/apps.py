@@ -8,6 +8,8 @@ class UsersConfig(AppConfig):
     
     def ready(self):
         """     """
+        import users.signals
+        
         try:
             from .email_queue import start_email_queue
             start_email_queue()
@@ -0,0 +1,139 @@
+"""
+Cached principal resolution for user_validator
+
+A verified access token is remembered (by SHA-256 of the raw token, in the
+process-local LRU) until its ``exp``, so signature and claim checks run once
+per token and worker. The user row is read through SmartCache under the
+user's model tag, which users.signals drops whenever the user is saved or
+deleted.
+"""
+
+import hashlib
+import time
+from urllib.parse import parse_qs
+
+from django.contrib.auth import get_user_model
+from django.db import router
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from core.cache_optimization import LocalLRUCache, model_tag, smart_cache
+
+try:
+    from .jwt_compatibility import CompatibleJWTAuthentication as JWTAuthentication
+except ImportError:
+    from rest_framework_simplejwt.authentication import JWTAuthentication
+
+USER_TIMEOUT = 300        # shared cache
+USER_LOCAL_TIMEOUT = 5    # process LRU; bounds staleness on other workers
+
+_jwt_auth = JWTAuthentication()
+_verified_tokens = LocalLRUCache(maxsize=4096)
+
+
+def user_cache_key(user_id) -> str:
+    return f"auth:user:{user_id}"
+
+
+def _token_user_id(raw_token):
+    """user_id claim of a valid access token; raises InvalidToken"""
+    if isinstance(raw_token, str):
+        raw_token = raw_token.encode()
+    key = hashlib.sha256(raw_token).hexdigest()
+    user_id = _verified_tokens.get(key)
+    if user_id is not None:
+        return user_id
+
+    validated_token = _jwt_auth.get_validated_token(raw_token)
+    try:
+        user_id = validated_token[api_settings.USER_ID_CLAIM]
+    except KeyError:
+        raise InvalidToken("Token contained no recognizable user identification")
+
+    remaining = validated_token.get("exp", 0) - time.time()
+    if remaining > 0:
+        _verified_tokens.set(key, user_id, remaining)
+    return user_id
+
+
+# Never leave the database (password hash, e-mail verification code); they stay deferred fields
+SECRET_FIELDS = ("password", "email_secret")
+
+
+def _cached_fields(User):
+    return [field for field in User._meta.concrete_fields if field.attname not in SECRET_FIELDS]
+
+
+def get_user(user_id):
+    """User instance for ``user_id`` from the cache, or None"""
+    User = get_user_model()
+    fields = _cached_fields(User)
+
+    def load():
+        user = User.objects.filter(**{api_settings.USER_ID_FIELD: user_id}).first()
+        if user is None:
+            return None
+        return {field.attname: field.value_from_object(user) for field in fields}
+
+    values = smart_cache.get_or_set(
+        user_cache_key(user_id),
+        load,
+        timeout=USER_TIMEOUT,
+        tags=[model_tag(User.__name__, user_id)],
+        local_timeout=USER_LOCAL_TIMEOUT,
+    )
+    if values is None:
+        return None
+    # Values may have gone through the JSON cache serializer. With the real
+    # alias, save() writes only the loaded fields, as for any .only() instance,
+    # never the deferred ones
+    return User.from_db(
+        router.db_for_read(User),
+        [field.attname for field in fields],
+        [field.to_python(values.get(field.attname)) for field in fields],
+    )
+
+
+def resolve_request_user(request):
+    """Authenticated user from the Authorization header or vridge_session cookie
+
+    Returns None when the request carries no token; raises InvalidToken or
+    AuthenticationFailed when it carries a bad one.
+    """
+    raw_token = None
+    header = _jwt_auth.get_header(request)
+    if header is not None:
+        raw_token = _jwt_auth.get_raw_token(header)
+    if raw_token is None:
+        raw_token = request.COOKIES.get("vridge_session")
+    if not raw_token:
+        return None
+    return _token_user(raw_token)
+
+
+def resolve_scope_user(scope):
+    """resolve_request_user() for the ASGI scope of a websocket handshake
+
+    Needs CookieMiddleware (part of AuthMiddlewareStack) for the cookie.
+    """
+    raw_token = None
+    header = dict(scope.get("headers") or ()).get(b"authorization")
+    if header is not None:
+        raw_token = _jwt_auth.get_raw_token(header)
+    if raw_token is None:
+        raw_token = (scope.get("cookies") or {}).get("vridge_session")
+    if raw_token is None:
+        # Browsers cannot set headers on a websocket; some clients pass ?token=
+        raw_token = parse_qs(scope.get("query_string", b"").decode()).get("token", [None])[0]
+    if not raw_token:
+        return None
+    return _token_user(raw_token)
+
+
+def _token_user(raw_token):
+    user = get_user(_token_user_id(raw_token))
+    if user is None:
+        raise AuthenticationFailed("User not found", code="user_not_found")
+    if not user.is_active:
+        raise AuthenticationFailed("User is inactive", code="user_inactive")
+    return user
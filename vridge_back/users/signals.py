@@ -0,0 +1,12 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from core.cache_optimization import smart_cache, model_tag
+from .models import User
+
+
+@receiver([post_save, post_delete], sender=User)
+def invalidate_principal_cache(sender, instance, **kwargs):
+    # users.principal caches the user row for user_validator
+    tag = model_tag(User.__name__, instance.pk)
+    transaction.on_commit(lambda: smart_cache.invalidate_tags(tag))
@@ -1,13 +1,11 @@
 import os
+import logging
 import threading
 from django.conf import settings
 from django.http import JsonResponse
 from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
-try:
-    from .jwt_compatibility import CompatibleJWTAuthentication as JWTAuthentication
-except ImportError:
-    from rest_framework_simplejwt.authentication import JWTAuthentication
 from . import models
+from .principal import resolve_request_user
 from projects import models as project_model
 
 from django.core.mail import EmailMessage, send_mail, EmailMultiAlternatives
@@ -21,75 +19,40 @@ try:
 except ImportError:
     USE_EMAIL_QUEUE = False
 
+logger = logging.getLogger(__name__)
+
 
 def user_validator(function):
     def wrapper(self, request, *args, **kwargs):
         try:
-            # Debug logging
-            print(f"[Auth Debug] Request method: {request.method}")
-            print(f"[Auth Debug] Auth header: {request.META.get('HTTP_AUTHORIZATION', 'No auth header')}")
-            print(f"[Auth Debug] Content-Type: {request.content_type}")
-            print(f"[Auth Debug] User before auth: {request.user}")
-            
             # TEMPORARY DEBUG MODE - REMOVE AFTER FIXING
             if os.environ.get('JWT_DEBUG_MODE') == 'true':
-                print("[Auth Debug] JWT_DEBUG_MODE enabled - bypassing authentication")
                 #   
-                try:
-                    test_user = models.User.objects.first()
-                    if test_user:
-                        request.user = test_user
-                        print(f"[Auth Debug] Using test user: {test_user.username}")
-                        return function(self, request, *args, **kwargs)
-                except Exception as e:
-                    print(f"[Auth Debug] Failed to get test user: {e}")
-            
-            # Use Django REST Framework's JWT authentication
-            jwt_auth = JWTAuthentication()
+                test_user = models.User.objects.first()
+                if test_user:
+                    logger.warning("JWT_DEBUG_MODE enabled - bypassing authentication")
+                    request.user = test_user
+                    return function(self, request, *args, **kwargs)
             
             try:
-                # This will validate the token and return (user, token)
-                auth_result = jwt_auth.authenticate(request)
-                print(f"[Auth Debug] JWT auth result: {auth_result}")
-                if auth_result is not None:
-                    user, token = auth_result
-                    if user:
-                        request.user = user
-                        print(f"[Auth Debug] Authenticated user: {request.user}")
-                        return function(self, request, *args, **kwargs)
-                
-                # Fallback to cookie if header auth fails
-                vridge_session = request.COOKIES.get("vridge_session", None)
-                if vridge_session:
-                    # Create a fake request with the token in header
-                    class FakeRequest:
-                        def __init__(self, token):
-                            self.META = {'HTTP_AUTHORIZATION': f'Bearer {token}'}
-                    
-                    fake_request = FakeRequest(vridge_session)
-                    auth_result = jwt_auth.authenticate(fake_request)
-                    if auth_result is not None:
-                        user, token = auth_result
-                        if user:
-                            request.user = user
-                            print("request.user", request.user)
-                            return function(self, request, *args, **kwargs)
-                
-                response = JsonResponse({"message": "NEED_ACCESS_TOKEN"}, status=401)
-                response['WWW-Authenticate'] = 'Bearer'
-                return response
-                    
+                # Header token first, then the vridge_session cookie
+                user = resolve_request_user(request)
             except (InvalidToken, TokenError) as e:
-                print(f"Token validation error: {e}")
+                logger.info(f"Token validation error: {e}")
                 response = JsonResponse({"message": "INVALID_TOKEN"}, status=401)
                 response['WWW-Authenticate'] = 'Bearer'
                 return response
+            
+            if user is None:
+                response = JsonResponse({"message": "NEED_ACCESS_TOKEN"}, status=401)
+                response['WWW-Authenticate'] = 'Bearer'
+                return response
+            
+            request.user = user
+            return function(self, request, *args, **kwargs)
                 
         except Exception as e:
-            import traceback
-            print(f"Authentication error: {e}")
-            print(f"Error type: {type(e).__name__}")
-            print(f"Error traceback: {traceback.format_exc()}")
+            logger.warning(f"Authentication error: {type(e).__name__}: {e}")
             response = JsonResponse({"message": "AUTHENTICATION_ERROR", "detail": str(e)}, status=401)
             response['WWW-Authenticate'] = 'Bearer'
             return response
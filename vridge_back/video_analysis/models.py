@@ -1,9 +1,10 @@
 """
 AI    
 """
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings
 from feedbacks.models import FeedBack
+from core.cache_optimization import CACHE_TTL, model_tag, smart_cache
 import json
 
 
@@ -158,12 +159,35 @@ class AIAnalysisSettings(models.Model):
         if not self.pk and AIAnalysisSettings.objects.exists():
             raise ValueError('AI      .')
         super().save(*args, **kwargs)
+        # After commit, so a concurrent get_settings() cannot re-cache the old row
+        tag = model_tag(self.__class__.__name__)
+        transaction.on_commit(lambda: smart_cache.invalidate_tags(tag))
     
     @classmethod
     def get_settings(cls):
-        """ AI   """
-        settings, created = cls.objects.get_or_create(pk=1)
-        return settings
+        """ AI   
+
+        Read on every analysis; kept in the process-local cache tier for a
+        short while in front of the shared cache.
+        """
+        def load():
+            settings, created = cls.objects.get_or_create(pk=1)
+            return {field.attname: field.value_from_object(settings) for field in cls._meta.concrete_fields}
+
+        values = smart_cache.get_or_set(
+            'ai_analysis_settings',
+            load,
+            timeout=CACHE_TTL['long'],
+            tags=[model_tag(cls.__name__)],
+            local_timeout=30,
+        )
+        # Values may have gone through the JSON cache serializer
+        fields = cls._meta.concrete_fields
+        return cls.from_db(
+            None,
+            [field.attname for field in fields],
+            [field.to_python(values.get(field.attname)) for field in fields],
+        )
     
     def __str__(self):
         status = "" if self.is_enabled else ""
@@ -3,4 +3,7 @@ from django.apps import AppConfig
 
 class VideoPlanningConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'video_planning'
\ No newline at end of file
+    name = 'video_planning'
+    def ready(self):
+        # Resets collaborative editing state when a planning is saved elsewhere
+        import video_planning.collaboration
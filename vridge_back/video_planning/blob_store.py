@@ -0,0 +1,214 @@
+"""
+Content-addressed storage of storyboard images
+
+Generated images are stored once through core.storage.MediaStorage under
+the SHA-256 of their bytes, next to WebP derivatives (full size and a
+thumbnail), and referenced by short URLs of the storyboard_blob view:
+
+    /api/video-planning/blobs/<sha256>.png         original
+    /api/video-planning/blobs/<sha256>.webp        WebP
+    /api/video-planning/blobs/<sha256>_thumb.webp  WebP, THUMBNAIL_WIDTH wide
+
+so planning JSON, caches, API responses and WebSocket messages carry a
+URL instead of a base64 data URI. Storing the same image again only
+returns its URLs.
+"""
+
+import base64
+import binascii
+import hashlib
+import logging
+import re
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.urls import reverse
+
+from core.storage import MediaStorage
+
+logger = logging.getLogger(__name__)
+
+BLOB_DIR = 'storyboards'
+WEBP_QUALITY = 80
+THUMBNAIL_WIDTH = 480
+THUMBNAIL_SUFFIX = '_thumb'
+
+EXTENSIONS = {
+    'image/png': 'png',
+    'image/jpeg': 'jpg',
+    'image/gif': 'gif',
+    'image/webp': 'webp',
+}
+
+DATA_URI_RE = re.compile(r'^data:(image/[\w.+-]+);base64,', re.I)
+BLOB_NAME_RE = re.compile(r'^(?P<sha>[0-9a-f]{64})(?P<suffix>_thumb)?\.(?P<ext>png|jpg|gif|webp)$')
+
+
+class BlobStorage(MediaStorage):
+    """MediaStorage that keeps the (content-addressed) names as they are"""
+
+    def get_valid_name(self, name):
+        return name
+
+    def get_available_name(self, name, max_length=None):
+        return name
+
+    def _save(self, name, content):
+        return super(MediaStorage, self)._save(name, content)
+
+
+_storage = None
+
+
+def get_storage():
+    global _storage
+    if _storage is None:
+        _storage = BlobStorage()
+    return _storage
+
+
+def storage_name(blob_name):
+    return f'{BLOB_DIR}/{blob_name[:2]}/{blob_name}'
+
+
+def blob_url(blob_name):
+    return reverse('video_planning:storyboard_blob', args=[blob_name])
+
+
+def parse_blob_url(url):
+    """Blob name of a storyboard_blob URL (absolute or not), or None"""
+    if not isinstance(url, str):
+        return None
+    _, found, blob_name = url.partition(blob_url('-')[:-1])
+    if not found or not BLOB_NAME_RE.match(blob_name):
+        return None
+    return blob_name
+
+
+def is_data_uri(value):
+    return isinstance(value, str) and bool(DATA_URI_RE.match(value))
+
+
+def decode_data_uri(value):
+    """(bytes, content type) of a base64 image data URI; raises ValueError"""
+    match = DATA_URI_RE.match(value)
+    if not match:
+        raise ValueError("Not an image data URI")
+    try:
+        return base64.b64decode(value[match.end():], validate=False), match.group(1).lower()
+    except binascii.Error as e:
+        raise ValueError(f"Invalid base64 payload: {e}")
+
+
+def _put(blob_name, data):
+    storage = get_storage()
+    name = storage_name(blob_name)
+    if not storage.exists(name):
+        storage.save(name, ContentFile(data))
+
+
+def _webp(image, width=None):
+    from PIL import Image
+
+    if width and image.width > width:
+        image = image.resize((width, round(image.height * width / image.width)), Image.LANCZOS)
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+    buffer = BytesIO()
+    image.save(buffer, format='WEBP', quality=WEBP_QUALITY, method=4)
+    return buffer.getvalue()
+
+
+def put_image(data, content_type='image/png'):
+    """Store image bytes with their WebP derivatives; returns their URLs
+
+    {'sha256', 'url', 'webp_url', 'thumbnail_url'}; the WebP URLs fall back to
+    the original when the image cannot be converted.
+    """
+    sha = hashlib.sha256(data).hexdigest()
+    ext = EXTENSIONS.get(content_type, 'png')
+    original = f'{sha}.{ext}'
+    _put(original, data)
+    urls = {'sha256': sha, 'url': blob_url(original), 'webp_url': blob_url(original), 'thumbnail_url': blob_url(original)}
+
+    webp, thumbnail = f'{sha}.webp', f'{sha}{THUMBNAIL_SUFFIX}.webp'
+    storage = get_storage()
+    try:
+        if not storage.exists(storage_name(thumbnail)):
+            from PIL import Image
+            with Image.open(BytesIO(data)) as image:
+                image.load()
+                if ext != 'webp':
+                    _put(webp, _webp(image))
+                _put(thumbnail, _webp(image, THUMBNAIL_WIDTH))
+        urls['webp_url'] = blob_url(webp)
+        urls['thumbnail_url'] = blob_url(thumbnail)
+    except Exception as e:
+        logger.warning(f"WebP derivatives of storyboard image {sha} failed: {e}")
+    return urls
+
+
+def _fields(urls):
+    return {
+        'image_url': urls['webp_url'],
+        'original_image_url': urls['url'],
+        'thumbnail_url': urls['thumbnail_url'],
+    }
+
+
+def image_fields(data, content_type='image/png'):
+    """``image_url`` and friends of a generated image for the storyboard JSON
+
+    ``image_url`` is the WebP URL; when the image cannot be stored it stays a
+    data URI, so a generation never fails on storage.
+    """
+    try:
+        return _fields(put_image(data, content_type))
+    except Exception as e:
+        logger.error(f"Failed to store storyboard image: {e}")
+        return {'image_url': f"data:{content_type};base64,{base64.b64encode(data).decode('utf-8')}"}
+
+
+def open_blob(blob_name):
+    """Readable file of a stored blob; raises FileNotFoundError"""
+    storage = get_storage()
+    name = storage_name(blob_name)
+    if not storage.exists(name):
+        raise FileNotFoundError(blob_name)
+    return storage.open(name, 'rb')
+
+
+def blob_path(blob_name):
+    """Local path of a blob, or None when the storage is remote"""
+    try:
+        return get_storage().path(storage_name(blob_name))
+    except NotImplementedError:
+        return None
+
+
+def replace_data_uris(value):
+    """Copy of a JSON value with image data URIs moved into the store
+
+    Returns (value, number of images moved). A dict's ``image_url`` also gets
+    the ``original_image_url``/``thumbnail_url`` keys of image_fields().
+    Storage errors propagate.
+    """
+    if isinstance(value, dict):
+        result, moved = {}, 0
+        for key, item in value.items():
+            result[key], count = replace_data_uris(item) if key != 'image_url' else (item, 0)
+            moved += count
+        if is_data_uri(value.get('image_url')):
+            result.update(_fields(put_image(*decode_data_uri(value['image_url']))))
+            moved += 1
+        return result, moved
+    if isinstance(value, list):
+        result, moved = [], 0
+        for item in value:
+            item, count = replace_data_uris(item)
+            result.append(item)
+            moved += count
+        return result, moved
+    if is_data_uri(value):
+        return put_image(*decode_data_uri(value))['url'], 1
+    return value, 0
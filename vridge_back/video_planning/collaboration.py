@@ -0,0 +1,475 @@
+"""
+Patch-based collaborative editing of VideoPlanning JSON fields
+
+Clients edit a field with a JSON Patch (RFC 6902) against the version they
+last saw. Every field has its own version counter and an op log in Redis;
+each process keeps the current value of the fields it serves in memory and
+catches up from the log, so a patch never loads or rewrites the row and
+only the patch is broadcast.
+
+Concurrent patches are merged when they touch disjoint paths and rejected
+with a conflict (the ops the client has not seen) when they overlap.
+Ops that insert or remove may shift their siblings, so they claim the
+parent container.
+
+Values are saved debounced: SaveDebouncer writes the dirty fields of a
+planning SAVE_DELAY after its first patch with save(update_fields=...).
+Other saves of a planning (the REST views) bump the versions with a reset
+entry, which makes clients holding an older version resync.
+Without a Redis cache backend the versions and logs live in the process.
+"""
+
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import Counter
+
+from channels.db import database_sync_to_async
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from core.cache_optimization import get_redis_client
+
+from .models import VideoPlanning
+
+logger = logging.getLogger(__name__)
+
+PATCH_FIELDS = (
+    'stories', 'selected_story',
+    'scenes', 'selected_scene',
+    'shots', 'selected_shot',
+    'storyboards',
+)
+
+SAVE_DELAY = 1.0  # seconds from the first unsaved patch of a planning to its save
+LOG_KEEP = 200  # saved log entries kept for clients a few versions behind
+LOG_TTL = 86400
+LOCK_TIMEOUT = 10
+
+STATE_KEY = 'planning_doc:{planning_id}'  # hash '<field>' -> version, 'saved:<field>' -> saved version
+LOG_KEY = 'planning_doc:{planning_id}:{field}:log'
+LOCK_KEY = 'planning_doc:{planning_id}:lock'
+
+
+class PatchError(ValueError):
+    pass
+
+
+class PatchConflict(Exception):
+    """The patch overlaps ops the client has not seen
+
+    ``entries`` are those ops ({'v', 'ops'} or a {'v', 'reset'} that needs a
+    full resync), oldest first.
+    """
+
+    def __init__(self, version, entries):
+        super().__init__(f"Conflicts with version {version}")
+        self.version = version
+        self.entries = entries
+
+    @property
+    def needs_resync(self):
+        return any(entry.get('reset') for entry in self.entries)
+
+
+# JSON Patch
+
+def parse_pointer(pointer):
+    if pointer == '':
+        return []
+    if not isinstance(pointer, str) or not pointer.startswith('/'):
+        raise PatchError(f"Invalid JSON pointer {pointer!r}")
+    return [token.replace('~1', '/').replace('~0', '~') for token in pointer[1:].split('/')]
+
+
+def _index(container, token, allow_end=False):
+    if isinstance(container, dict):
+        return token
+    if not isinstance(container, list):
+        raise PatchError(f"Cannot address {token!r} in a scalar")
+    if allow_end and token == '-':
+        return len(container)
+    if not token.isdigit() or (token != '0' and token.startswith('0')):
+        raise PatchError(f"Invalid array index {token!r}")
+    index = int(token)
+    if index > len(container) or (index == len(container) and not allow_end):
+        raise PatchError(f"Array index {index} out of range")
+    return index
+
+
+def _get(doc, tokens):
+    for token in tokens:
+        key = _index(doc, token)
+        if isinstance(doc, dict) and key not in doc:
+            raise PatchError(f"Path member {token!r} does not exist")
+        doc = doc[key]
+    return doc
+
+
+def _update(doc, tokens, change):
+    """Copy of ``doc`` with ``change(container, token)`` applied at ``tokens``
+
+    Only the containers along the path are copied; everything else is shared
+    with ``doc``, which is never modified.
+    """
+    if not isinstance(doc, (dict, list)):
+        raise PatchError(f"Cannot address {tokens[0]!r} in a scalar")
+    doc = doc.copy()
+    if len(tokens) == 1:
+        change(doc, tokens[0])
+    else:
+        key = _index(doc, tokens[0])
+        if isinstance(doc, dict) and key not in doc:
+            raise PatchError(f"Path member {tokens[0]!r} does not exist")
+        doc[key] = _update(doc[key], tokens[1:], change)
+    return doc
+
+
+def _add(doc, tokens, value):
+    if not tokens:
+        return value
+
+    def change(container, token):
+        key = _index(container, token, allow_end=True)
+        if isinstance(container, list):
+            container.insert(key, value)
+        else:
+            container[key] = value
+    return _update(doc, tokens, change)
+
+
+def _remove(doc, tokens):
+    if not tokens:
+        raise PatchError("Cannot remove the whole document")
+
+    def change(container, token):
+        key = _index(container, token)
+        if isinstance(container, dict) and key not in container:
+            raise PatchError(f"Path member {token!r} does not exist")
+        del container[key]
+    return _update(doc, tokens, change)
+
+
+def _replace(doc, tokens, value):
+    if not tokens:
+        return value
+
+    def change(container, token):
+        key = _index(container, token)
+        if isinstance(container, dict) and key not in container:
+            raise PatchError(f"Path member {token!r} does not exist")
+        container[key] = value
+    return _update(doc, tokens, change)
+
+
+def _operation(op):
+    if not isinstance(op, dict) or op.get('op') not in ('add', 'remove', 'replace', 'move', 'copy', 'test'):
+        raise PatchError(f"Invalid operation {op!r}")
+    if 'path' not in op:
+        raise PatchError("Operation without 'path'")
+    if op['op'] in ('add', 'replace', 'test') and 'value' not in op:
+        raise PatchError(f"'{op['op']}' without 'value'")
+    if op['op'] in ('move', 'copy') and 'from' not in op:
+        raise PatchError(f"'{op['op']}' without 'from'")
+    return op['op'], parse_pointer(op['path'])
+
+
+def apply_patch(doc, ops):
+    """Result of applying ``ops`` to ``doc`` (left unmodified); raises PatchError"""
+    if not isinstance(ops, list) or not ops:
+        raise PatchError("A patch is a non-empty list of operations")
+    for op in ops:
+        name, tokens = _operation(op)
+        if name == 'add':
+            doc = _add(doc, tokens, op['value'])
+        elif name == 'remove':
+            doc = _remove(doc, tokens)
+        elif name == 'replace':
+            doc = _replace(doc, tokens, op['value'])
+        elif name == 'test':
+            if _get(doc, tokens) != op['value']:
+                raise PatchError(f"Test failed at {op['path']!r}")
+        else:
+            source = parse_pointer(op['from'])
+            value = _get(doc, source)
+            if name == 'move':
+                if tokens[:len(source)] == source and tokens != source:
+                    raise PatchError("Cannot move a value into itself")
+                doc = _remove(doc, source)
+            doc = _add(doc, tokens, value)
+    return doc
+
+
+def scopes(ops):
+    """Paths whose subtrees ``ops`` may change or depend on"""
+    result = []
+    for op in ops:
+        name, tokens = _operation(op)
+        if name in ('replace', 'test'):
+            result.append(tokens)
+        else:
+            result.append(tokens[:-1])
+            if name in ('move', 'copy'):
+                result.append(parse_pointer(op['from'])[:-1])
+    return result
+
+
+def _overlap(a, b):
+    return any(x[:len(y)] == y or y[:len(x)] == x for x in a for y in b)
+
+
+# Versions and op logs
+
+class RedisStore:
+    def __init__(self, client):
+        self.client = client
+
+    def lock(self, planning_id):
+        return self.client.lock(LOCK_KEY.format(planning_id=planning_id), timeout=LOCK_TIMEOUT, blocking_timeout=LOCK_TIMEOUT)
+
+    def versions(self, planning_id, field):
+        current, saved = self.client.hmget(STATE_KEY.format(planning_id=planning_id), field, f'saved:{field}')
+        return int(current or 0), int(saved or 0)
+
+    def entries(self, planning_id, field, after):
+        log = self.client.lrange(LOG_KEY.format(planning_id=planning_id, field=field), 0, -1)
+        entries = [json.loads(entry) for entry in log]
+        return [entry for entry in entries if entry['v'] > after]
+
+    def first_version(self, planning_id, field):
+        first = self.client.lindex(LOG_KEY.format(planning_id=planning_id, field=field), 0)
+        return json.loads(first)['v'] if first else None
+
+    def append(self, planning_id, field, entry, saved=False):
+        state_key = STATE_KEY.format(planning_id=planning_id)
+        log_key = LOG_KEY.format(planning_id=planning_id, field=field)
+        pipe = self.client.pipeline()
+        pipe.rpush(log_key, json.dumps(entry))
+        pipe.hset(state_key, field, entry['v'])
+        if saved:
+            pipe.hset(state_key, f'saved:{field}', entry['v'])
+        pipe.expire(log_key, LOG_TTL)
+        pipe.expire(state_key, LOG_TTL)
+        pipe.execute()
+
+    def mark_saved(self, planning_id, field, version):
+        current, _ = self.versions(planning_id, field)
+        pipe = self.client.pipeline()
+        pipe.hset(STATE_KEY.format(planning_id=planning_id), f'saved:{field}', version)
+        pipe.ltrim(LOG_KEY.format(planning_id=planning_id, field=field), -max(LOG_KEEP, current - version), -1)
+        pipe.execute()
+
+
+class LocalStore:
+    """RedisStore for a single process"""
+
+    def __init__(self):
+        self._locks = {}
+        self._state = {}
+        self._logs = {}
+        self._guard = threading.Lock()
+
+    def lock(self, planning_id):
+        with self._guard:
+            return self._locks.setdefault(planning_id, threading.Lock())
+
+    def versions(self, planning_id, field):
+        state = self._state.get(planning_id, {})
+        return state.get(field, 0), state.get(f'saved:{field}', 0)
+
+    def entries(self, planning_id, field, after):
+        return [entry for entry in self._logs.get((planning_id, field), []) if entry['v'] > after]
+
+    def first_version(self, planning_id, field):
+        log = self._logs.get((planning_id, field))
+        return log[0]['v'] if log else None
+
+    def append(self, planning_id, field, entry, saved=False):
+        self._logs.setdefault((planning_id, field), []).append(entry)
+        state = self._state.setdefault(planning_id, {})
+        state[field] = entry['v']
+        if saved:
+            state[f'saved:{field}'] = entry['v']
+
+    def mark_saved(self, planning_id, field, version):
+        current, _ = self.versions(planning_id, field)
+        self._state.setdefault(planning_id, {})[f'saved:{field}'] = version
+        log = self._logs.get((planning_id, field), [])
+        del log[:-max(LOG_KEEP, current - version)]
+
+
+_local_store = LocalStore()
+
+
+def _store():
+    client = get_redis_client()
+    return RedisStore(client) if client is not None else _local_store
+
+
+# Field values of this process: (planning id, field) -> [version, value]
+_documents = {}
+# Open connections of this process per planning
+_members = Counter()
+
+
+def _current(store, planning_id, field, version):
+    """Value of the field at ``version`` (the latest); call under the lock"""
+    key = (planning_id, field)
+    document = _documents.get(key)
+    if document is not None and document[0] == version:
+        return document[1]
+
+    entries = store.entries(planning_id, field, document[0]) if document else []
+    first = store.first_version(planning_id, field)
+    if document is None or first is None or first > document[0] + 1 or any(entry.get('reset') for entry in entries):
+        # Start over from the last save and replay what came after it
+        _, saved = store.versions(planning_id, field)
+        value = VideoPlanning.objects.filter(id=planning_id).values_list(field, flat=True).first()
+        entries = store.entries(planning_id, field, saved)
+        if version > saved and (not entries or entries[0]['v'] != saved + 1):
+            raise PatchError(f"Op log of {field} of planning {planning_id} is incomplete")
+    else:
+        value = document[1]
+    for entry in entries:
+        value = apply_patch(value, entry['ops'])
+    _documents[key] = [version, value]
+    return value
+
+
+def get_field(planning_id, field):
+    """(version, value) of a field, for clients that (re)join"""
+    store = _store()
+    with store.lock(planning_id):
+        version, _ = store.versions(planning_id, field)
+        return version, _current(store, planning_id, field, version)
+
+
+def apply(planning_id, field, ops, base_version=None, user_id=None):
+    """Apply a patch made against ``base_version`` and return the new version
+
+    ``base_version`` None applies it to whatever is current (last writer
+    wins). Raises PatchError for an invalid patch, PatchConflict when it
+    overlaps ops made since ``base_version``.
+    """
+    if field not in PATCH_FIELDS:
+        raise PatchError(f"Field {field!r} cannot be patched")
+    store = _store()
+    with store.lock(planning_id):
+        version, _ = store.versions(planning_id, field)
+        if base_version is not None and base_version != version:
+            if base_version > version:
+                raise PatchError(f"Unknown version {base_version}")
+            first = store.first_version(planning_id, field)
+            entries = store.entries(planning_id, field, base_version)
+            if first is None or first > base_version + 1:
+                raise PatchConflict(version, [{'v': version, 'reset': True}])
+            if any(entry.get('reset') or _overlap(scopes(ops), scopes(entry['ops'])) for entry in entries):
+                raise PatchConflict(version, entries)
+
+        value = apply_patch(_current(store, planning_id, field, version), ops)
+        entry = {'v': version + 1, 'ops': ops, 'user': user_id, 'at': time.time()}
+        store.append(planning_id, field, entry)
+        _documents[(planning_id, field)] = [entry['v'], value]
+        return entry['v']
+
+
+def save(planning_id):
+    """Write the fields of ``planning_id`` this process has newer values of"""
+    store = _store()
+    with store.lock(planning_id):
+        changed = {}
+        for (document_planning, field), (version, value) in list(_documents.items()):
+            if document_planning != planning_id:
+                continue
+            current, saved = store.versions(planning_id, field)
+            if saved < version == current:
+                changed[field] = (version, value)
+        if not changed:
+            return []
+
+        planning = VideoPlanning(id=planning_id, **{field: value for field, (_, value) in changed.items()})
+        planning._collaboration_save = True
+        planning.save(update_fields=[*changed, 'updated_at'])
+        for field, (version, _) in changed.items():
+            store.mark_saved(planning_id, field, version)
+        return list(changed)
+
+
+def join(planning_id):
+    _members[planning_id] += 1
+
+
+def leave(planning_id):
+    """True when the last connection of this process to the planning left"""
+    _members[planning_id] -= 1
+    if _members[planning_id] > 0:
+        return False
+    del _members[planning_id]
+    return True
+
+
+def forget(planning_id):
+    """Drop the in-memory values of a planning nobody here edits any more"""
+    for key in [key for key in _documents if key[0] == planning_id]:
+        del _documents[key]
+
+
+@receiver(post_save, sender=VideoPlanning)
+def reset_on_external_save(sender, instance, created, update_fields=None, **kwargs):
+    """A save not made by save() replaces the fields: clients resync"""
+    if created or getattr(instance, '_collaboration_save', False):
+        return
+    fields = [field for field in PATCH_FIELDS if update_fields is None or field in update_fields]
+    if not fields:
+        return
+    store = _store()
+    try:
+        with store.lock(instance.id):
+            for field in fields:
+                version, _ = store.versions(instance.id, field)
+                # Also at version 0: other processes may hold the pre-save value
+                store.append(instance.id, field, {'v': version + 1, 'reset': True}, saved=True)
+                _documents.pop((instance.id, field), None)
+    except Exception as e:
+        logger.warning(f"Failed to reset collaboration state of planning {instance.id}: {e}")
+
+
+class SaveDebouncer:
+    """Coalesces the patches of a planning into one save per SAVE_DELAY (one event loop)"""
+
+    def __init__(self, delay=SAVE_DELAY):
+        self.delay = delay
+        self._pending = {}
+
+    def schedule(self, planning_id):
+        if planning_id not in self._pending:
+            self._pending[planning_id] = asyncio.ensure_future(self._save_later(planning_id))
+
+    async def _save_later(self, planning_id):
+        await asyncio.sleep(self.delay)
+        self._pending.pop(planning_id, None)
+        try:
+            await database_sync_to_async(save)(planning_id)
+        except Exception as e:
+            logger.error(f"Failed to save planning {planning_id}: {e}")
+
+    async def flush(self, planning_id):
+        task = self._pending.pop(planning_id, None)
+        if task is not None:
+            task.cancel()
+            await database_sync_to_async(save)(planning_id)
+
+
+_debouncers = {}
+
+
+def get_debouncer():
+    loop = asyncio.get_running_loop()
+    debouncer = _debouncers.get(loop)
+    if debouncer is None:
+        for other in [other for other in _debouncers if other.is_closed()]:
+            del _debouncers[other]
+        debouncer = _debouncers[loop] = SaveDebouncer()
+    return debouncer
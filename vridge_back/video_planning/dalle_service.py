@@ -1,11 +1,12 @@
 import os
 import logging
 import requests
-import base64
 from django.conf import settings
 from openai import OpenAI
 import re
 
+from . import blob_store
+
 logger = logging.getLogger(__name__)
 
 
@@ -14,71 +15,27 @@ class DalleService:
     OpenAI DALL-E 3    
     """
     
-    def __init__(self):
-        #    
-        settings_key = getattr(settings, 'OPENAI_API_KEY', None)
-        env_key = os.environ.get('OPENAI_API_KEY')
-        
-        logger.info(f" OPENAI_API_KEY :")
-        logger.info(f"  - settings.OPENAI_API_KEY: {settings_key[:10] + '...' if settings_key else 'None'}")
-        logger.info(f"  - os.environ.get('OPENAI_API_KEY'): {env_key[:10] + '...' if env_key else 'None'}")
-        
-        self.api_key = settings_key or env_key
+    def __init__(self, api_key=None, http_client=None, session=None):
+        # http_client (httpx) / session (requests): connection pools shared by
+        # providers.get_clients(); without them each instance has its own
+        self.api_key = api_key or getattr(settings, 'OPENAI_API_KEY', None) or os.environ.get('OPENAI_API_KEY')
+        self.session = session or requests
         self.client = None
+        self.available = False
         
         if not self.api_key:
-            logger.warning(" OPENAI_API_KEY not found. DALL-E image generation will not be available.")
-            logger.warning("  - Railway   ")
-            logger.warning("  -    ")
-            self.available = False
-        else:
-            logger.info(f" API Key found: {self.api_key[:10]}...")
-            try:
-                # OpenAI   -   
-                try:
-                    #  1:  API  
-                    self.client = OpenAI(api_key=self.api_key)
-                    logger.info(" Method 1: OpenAI client initialized with direct API key")
-                except Exception as e1:
-                    logger.warning(f" Method 1 failed (proxy issue?): {e1}")
-                    
-                    try:
-                        #  2:     (  )
-                        os.environ['OPENAI_API_KEY'] = self.api_key
-                        #    
-                        for proxy_var in ['HTTP_PROXY', 'HTTPS_PROXY', 'http_proxy', 'https_proxy']:
-                            if proxy_var in os.environ:
-                                logger.info(f"Removing proxy env var: {proxy_var}")
-                                del os.environ[proxy_var]
-                        
-                        self.client = OpenAI()
-                        logger.info(" Method 2: OpenAI client initialized via environment variable")
-                    except Exception as e2:
-                        logger.error(f" Method 2 failed: {e2}")
-                        
-                        try:
-                            #  3:   
-                            import httpx
-                            self.client = OpenAI(
-                                api_key=self.api_key,
-                                http_client=httpx.Client()
-                            )
-                            logger.info(" Method 3: OpenAI client initialized with custom HTTP client")
-                        except Exception as e3:
-                            logger.error(f" Method 3 failed: {e3}")
-                            raise e3
-                
-                #      
-                if self.client:
-                    self.available = True
-                    logger.info(" DALL-E service ready for image generation")
-                else:
-                    self.available = False
-                
-            except Exception as e:
-                logger.error(f" Failed to initialize OpenAI client: {e}")
-                self.available = False
-                self.client = None
+            logger.warning("OPENAI_API_KEY not found. DALL-E image generation will not be available.")
+            return
+        
+        try:
+            # An explicit http_client also keeps OpenAI from building one off proxy env vars
+            if http_client is not None:
+                self.client = OpenAI(api_key=self.api_key, http_client=http_client)
+            else:
+                self.client = OpenAI(api_key=self.api_key)
+            self.available = True
+        except Exception as e:
+            logger.error(f"Failed to initialize OpenAI client: {e}")
     
     def generate_storyboard_image(self, frame_data, style='minimal', draft_mode=True):
         """
@@ -153,16 +110,15 @@ class DalleService:
             )
             image_url = response.data[0].url
             
-            # URL   base64  ( )
-            image_response = requests.get(image_url, timeout=60)
+            # OpenAI URL    blob_store  
+            image_response = self.session.get(image_url, timeout=60)
             if image_response.status_code == 200:
-                image_base64 = base64.b64encode(image_response.content).decode('utf-8')
-                final_image_url = f"data:image/png;base64,{image_base64}"
+                content_type = image_response.headers.get('Content-Type', 'image/png').split(';')[0]
                 
                 logger.info("Successfully generated image with DALL-E 3")
                 return {
                     "success": True,
-                    "image_url": final_image_url,
+                    **blob_store.image_fields(image_response.content, content_type),
                     "prompt_used": prompt,
                     "model_used": "dall-e-3",
                     "original_url": image_url  #  URL 
@@ -1,11 +1,12 @@
 import os
 import json
-import google.generativeai as genai
 from django.conf import settings
 import logging
 from datetime import datetime
 import requests
 
+from . import json_stream, providers, response_cache
+
 logger = logging.getLogger(__name__)
 
 #  LLM    - Gemini 
@@ -30,14 +31,14 @@ except ImportError:
 
 
 class GeminiService:
-    def __init__(self):
-        api_key = getattr(settings, 'GOOGLE_API_KEY', None) or os.environ.get('GOOGLE_API_KEY')
-        if not api_key:
+    def __init__(self, clients=None):
+        # Provider clients are created once per process (providers.get_clients())
+        clients = clients or providers.get_clients()
+        if clients.model is None:
             raise ValueError("GOOGLE_API_KEY not found in settings or environment variables")
         
-        genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel('gemini-1.5-flash')
-        self.pro_model = genai.GenerativeModel('gemini-1.5-pro')  # PDF  Pro 
+        self.model = clients.model
+        self.pro_model = clients.pro_model  # PDF  Pro 
         
         #   
         self.token_usage = {
@@ -49,48 +50,26 @@ class GeminiService:
                 'scene': {'prompt': 0, 'response': 0, 'total': 0},
                 'shot': {'prompt': 0, 'response': 0, 'total': 0},
                 'storyboard': {'prompt': 0, 'response': 0, 'total': 0}
-            }
+            },
+            'cache': {'hits': 0, 'misses': 0, 'saved_tokens': 0}
         }
         
         #  LLM   - Gemini 
         self.exaone_service = None
         self.hf_exaone_service = None
         self.friendli_service = None
-        logger.info("[GeminiService] Using Gemini for all text generation")
         
         #     ()
-        self.image_service_available = False
-        self.image_service = None
-        self.placeholder_service = None
+        self.image_service = clients.image_service
+        self.image_service_available = clients.image_service_available
+        self.placeholder_service = clients.placeholder_service
         self.style = 'minimal'  #  
         self.draft_mode = True  #  draft  
         self.no_image = False  #    
         
-        logger.info(f"IMAGE_SERVICE_AVAILABLE: {IMAGE_SERVICE_AVAILABLE}")
-        logger.info(f"PLACEHOLDER_SERVICE_AVAILABLE: {PLACEHOLDER_SERVICE_AVAILABLE}")
-        
-        #  DALL-E 
-        if IMAGE_SERVICE_AVAILABLE and DalleService:
-            try:
-                self.image_service = DalleService()
-                self.image_service_available = self.image_service.available
-                logger.info(f"Image service available: {self.image_service_available}")
-                if self.image_service_available:
-                    logger.info("DALL-E service initialized successfully")
-                else:
-                    logger.warning("DALL-E service initialized but API key not found")
-            except Exception as e:
-                logger.error(f"Image service initialization failed: {e}", exc_info=True)
-                self.image_service_available = False
-        
-        #   
-        if PLACEHOLDER_SERVICE_AVAILABLE and PlaceholderImageService:
-            try:
-                self.placeholder_service = PlaceholderImageService()
-                logger.info("Placeholder image service initialized as fallback")
-            except Exception as e:
-                logger.error(f"Placeholder service initialization failed: {e}")
-                self.placeholder_service = None
+        # response_cache: per user; regenerate skips the lookup
+        self.user_id = None
+        self.regenerate = False
     
     def generate_structure(self, planning_input):
         prompt = f"""
@@ -205,11 +184,7 @@ class GeminiService:
                 }
             }
     
-    def generate_stories_from_planning(self, planning_text, context=None):
-        #   
-        if context is None:
-            context = {}
-        
+    def _story_prompt(self, planning_text, context):
         logger.info(f"[GeminiService] generate_stories_from_planning ")
         logger.info(f"[GeminiService] planning_text : {len(planning_text)}")
         logger.info(f"[GeminiService] context: {context}")
@@ -324,6 +299,19 @@ class GeminiService:
           4  .
            JSON  ,     JSON .
         """
+        return prompt
+    
+    def generate_stories_from_planning(self, planning_text, context=None):
+        #   
+        if context is None:
+            context = {}
+        
+        story_framework = context.get('story_framework', 'classic')
+        prompt = self._story_prompt(planning_text, context)
+        
+        cached = self._cached_result('story', prompt)
+        if cached is not None:
+            return cached
         
         try:
             logger.info(f"[GeminiService] Gemini API  ")
@@ -374,6 +362,7 @@ class GeminiService:
                 #  
                 if 'stories' in result and isinstance(result['stories'], list) and len(result['stories']) > 0:
                     logger.info(f"[GeminiService]   : {len(result['stories'])}")
+                    self._cache_result('story', prompt, result, response)
                     return result
                 else:
                     raise ValueError("Invalid story structure")
@@ -412,7 +401,7 @@ class GeminiService:
                 "stories": fallback_stories
             }
     
-    def generate_scenes_from_story(self, story_data):
+    def _scenes_prompt(self, story_data):
         # Gemini 
         logger.info("[GeminiService] Using Gemini for scene generation")
         
@@ -498,6 +487,14 @@ class GeminiService:
         
           3  .
         """
+        return prompt
+    
+    def generate_scenes_from_story(self, story_data):
+        prompt = self._scenes_prompt(story_data)
+        
+        cached = self._cached_result('scene', prompt)
+        if cached is not None:
+            return cached
         
         try:
             response = self.model.generate_content(prompt)
@@ -516,7 +513,9 @@ class GeminiService:
             if response_text.endswith('```'):
                 response_text = response_text[:-3]
             
-            return json.loads(response_text)
+            result = json.loads(response_text)
+            self._cache_result('scene', prompt, result, response)
+            return result
         except Exception as e:
             return {
                 "error": str(e),
@@ -550,10 +549,7 @@ class GeminiService:
                 }
             }
     
-    def generate_shots_from_scene(self, scene_data):
-        """
-          3  .
-        """
+    def _shots_prompt(self, scene_data):
         # Gemini 
         logger.info("[GeminiService] Using Gemini for shot generation")
         
@@ -628,6 +624,17 @@ class GeminiService:
         
           3  .
         """
+        return prompt
+    
+    def generate_shots_from_scene(self, scene_data):
+        """
+          3  .
+        """
+        prompt = self._shots_prompt(scene_data)
+        
+        cached = self._cached_result('shot', prompt)
+        if cached is not None:
+            return cached
         
         try:
             response = self.model.generate_content(prompt)
@@ -646,7 +653,9 @@ class GeminiService:
             if response_text.endswith('```'):
                 response_text = response_text[:-3]
             
-            return json.loads(response_text)
+            result = json.loads(response_text)
+            self._cache_result('shot', prompt, result, response)
+            return result
         except Exception as e:
             return {
                 "error": str(e),
@@ -677,6 +686,53 @@ class GeminiService:
                 }
             }
     
+    def _stream_items(self, feature, prompt, key, validate=None):
+        """Stream the model's answer: ('item', obj) per element of result[key]
+        as soon as it is complete, then ('result', result)
+        
+        Same cache and token accounting as the non-streaming methods; errors
+        (API, invalid JSON, failed ``validate``) propagate.
+        """
+        cached = self._cached_result(feature, prompt)
+        if cached is not None:
+            for item in cached.get(key) or []:
+                yield 'item', item
+            yield 'result', cached
+            return
+        
+        parser = json_stream.ArrayItemParser(key)
+        last_chunk = None
+        for chunk in self.model.generate_content(prompt, stream=True):
+            last_chunk = chunk
+            for item in parser.feed(chunk.text):
+                yield 'item', item
+        
+        result = parser.result()
+        if validate and not validate(result):
+            raise ValueError(f"Invalid {feature} structure")
+        
+        usage = getattr(last_chunk, 'usage_metadata', None)
+        if usage:
+            self._update_token_usage(feature, usage.prompt_token_count, usage.candidates_token_count)
+        self._cache_result(feature, prompt, result, last_chunk)
+        yield 'result', result
+    
+    def stream_stories_from_planning(self, planning_text, context=None):
+        """generate_stories_from_planning(), streamed (see _stream_items)"""
+        prompt = self._story_prompt(planning_text, context or {})
+        return self._stream_items(
+            'story', prompt, 'stories',
+            validate=lambda result: isinstance(result.get('stories'), list) and len(result['stories']) > 0,
+        )
+    
+    def stream_scenes_from_story(self, story_data):
+        """generate_scenes_from_story(), streamed (see _stream_items)"""
+        return self._stream_items('scene', self._scenes_prompt(story_data), 'scenes')
+    
+    def stream_shots_from_scene(self, scene_data):
+        """generate_shots_from_scene(), streamed (see _stream_items)"""
+        return self._stream_items('shot', self._shots_prompt(scene_data), 'shots')
+    
     def generate_shots(self, story_data):
         prompt = f"""
            .      .
@@ -1657,10 +1713,40 @@ PDF         .
         #      ,  classic 
         return fallback_stories.get(framework, fallback_stories['classic'])
     
-    def _update_token_usage(self, feature, prompt_tokens, response_tokens):
-        """  """
+    def _cached_result(self, feature, prompt):
+        """Cached result of the same request, or None (see response_cache)"""
+        if self.regenerate or not response_cache.enabled(self.user_id):
+            return None
+        entry = response_cache.lookup(self.user_id, feature, self.model, prompt)
+        if entry is None:
+            self.token_usage['cache']['misses'] += 1
+            return None
+        logger.info(f"[GeminiService] {feature} served from the response cache")
+        self._update_token_usage(feature, entry['prompt_tokens'], entry['response_tokens'], cached=True)
+        return entry['result']
+    
+    def _cache_result(self, feature, prompt, result, response):
+        if not response_cache.enabled(self.user_id):
+            return
+        usage = getattr(response, 'usage_metadata', None)
+        response_cache.store(
+            self.user_id, feature, self.model, prompt, result,
+            prompt_tokens=getattr(usage, 'prompt_token_count', 0) or 0,
+            response_tokens=getattr(usage, 'candidates_token_count', 0) or 0,
+        )
+    
+    def _update_token_usage(self, feature, prompt_tokens, response_tokens, cached=False):
+        """  
+        
+        cached: tokens of a cached response, counted as saved rather than spent
+        """
         total_tokens = prompt_tokens + response_tokens
         
+        if cached:
+            self.token_usage['cache']['hits'] += 1
+            self.token_usage['cache']['saved_tokens'] += total_tokens
+            return
+        
         #   
         self.token_usage['total'] += total_tokens
         self.token_usage['prompt'] += prompt_tokens
@@ -1687,5 +1773,6 @@ PDF         .
                 'scene': {'prompt': 0, 'response': 0, 'total': 0},
                 'shot': {'prompt': 0, 'response': 0, 'total': 0},
                 'storyboard': {'prompt': 0, 'response': 0, 'total': 0}
-            }
+            },
+            'cache': {'hits': 0, 'misses': 0, 'saved_tokens': 0}
         }
\ No newline at end of file
@@ -0,0 +1,152 @@
+"""
+Storyboard image generation jobs
+
+create_job() stores a StoryboardImageJob with one StoryboardImageFrame per
+frame and, once the transaction has committed, sends one
+tasks.generate_frame_image per frame to the storyboard_images Celery queue.
+The frames of a job are drawn in parallel by the workers of that queue and
+none of the work runs in a web process, so a deploy or a worker recycle
+does not lose it (the tasks are acknowledged late and redelivered, also
+when their worker dies). A frame redelivered more than MAX_ATTEMPTS times
+is failed rather than drawn again, and a job whose tasks the broker
+refuses is marked failed rather than left pending.
+
+A task retries a failed DALL-E call with exponential backoff and falls
+back to a placeholder image after the last retry. Its result, with the
+blob store URLs of the image, is written into the frame row, and the job
+counts its finished frames; a job whose frames all failed ends failed. Each change is pushed to the Channels group
+of the job (StoryboardImageJobConsumer); job_payload() is the message of
+both the consumer and the status endpoint.
+"""
+
+import logging
+import random
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import StoryboardImageFrame, StoryboardImageJob
+
+logger = logging.getLogger(__name__)
+
+MAX_RETRIES = 3
+RETRY_BACKOFF = 10  # seconds before the first retry, doubled for each next one
+RETRY_BACKOFF_MAX = 300
+# Starts of one frame: its retries plus one redelivery after a lost worker
+MAX_ATTEMPTS = MAX_RETRIES + 2
+
+FINISHED = ('completed', 'placeholder', 'failed')
+SUCCEEDED = ('completed', 'placeholder')
+# Image keys a task copies from the image service result into the frame
+IMAGE_FIELDS = ('image_url', 'original_image_url', 'thumbnail_url', 'model_used')
+
+
+def group_name(job_id):
+    return f"storyboard_images_{job_id}"
+
+
+def retry_delay(retries):
+    """Countdown of retry number ``retries`` + 1, with jitter"""
+    delay = min(RETRY_BACKOFF * 2 ** retries, RETRY_BACKOFF_MAX)
+    return delay + random.uniform(0, delay / 4)
+
+
+def create_job(user, frames, style='minimal', draft_mode=True):
+    """Persist a job for ``frames`` and queue its frames on commit"""
+    with transaction.atomic():
+        job = StoryboardImageJob.objects.create(
+            user=user if user and user.is_authenticated else None,
+            style=style or 'minimal',
+            draft_mode=draft_mode,
+            total=len(frames),
+        )
+        StoryboardImageFrame.objects.bulk_create([
+            StoryboardImageFrame(job=job, index=index, frame=frame)
+            for index, frame in enumerate(frames)
+        ])
+        transaction.on_commit(lambda: enqueue(job.id, len(frames)))
+    return job
+
+
+def enqueue(job_id, total):
+    """Send the frame tasks; a job the broker refuses is failed, then the error raised"""
+    from .tasks import generate_frame_image
+    index = 0
+    try:
+        for index in range(total):
+            generate_frame_image.delay(str(job_id), index)
+    except Exception as e:
+        logger.error(f"Failed to queue storyboard image job {job_id} at frame {index}: {e}")
+        StoryboardImageFrame.objects.filter(job_id=job_id, index__gte=index, status='pending').update(
+            status='failed', error=f"Not queued: {e}", updated_at=timezone.now(),
+        )
+        StoryboardImageJob.objects.filter(id=job_id).update(status='failed', updated_at=timezone.now())
+        publish(job_id, job_payload(StoryboardImageJob.objects.get(id=job_id)))
+        raise
+
+
+def job_payload(job):
+    return {
+        'job_id': str(job.id),
+        'status': job.status,
+        'progress': job.done,
+        'total': job.total,
+    }
+
+
+def job_result(job):
+    """The storyboards of a job, in frame order, as far as they are drawn"""
+    return {'storyboards': [row.frame for row in job.frames.all()]}
+
+
+def publish(job_id, payload):
+    try:
+        channel_layer = get_channel_layer()
+        if channel_layer is not None:
+            async_to_sync(channel_layer.group_send)(
+                group_name(job_id),
+                {'type': 'storyboard_images', 'job': payload},
+            )
+    except Exception as e:
+        # Clients still see the job through the status endpoint
+        logger.warning(f"Failed to publish storyboard image job {job_id}: {e}")
+
+
+def start_frame(job_id, index):
+    """The pending frame row (its attempt counted), or None when it is done"""
+    row = StoryboardImageFrame.objects.select_related('job').filter(job_id=job_id, index=index).first()
+    if row is None or row.status in FINISHED:
+        return None
+    if row.attempts >= MAX_ATTEMPTS:
+        # Keeps killing its worker (out of memory, time limit): stop redelivering it
+        error = f"Gave up after {row.attempts} attempts"
+        logger.error(f"Storyboard image job {job_id} frame {index}: {error}")
+        finish_frame(job_id, index, {**row.frame, 'image_error': error}, 'failed', error)
+        return None
+    StoryboardImageFrame.objects.filter(pk=row.pk).update(attempts=F('attempts') + 1)
+    if StoryboardImageJob.objects.filter(id=job_id, status='pending').update(status='processing', updated_at=timezone.now()):
+        row.job.status = 'processing'
+        publish(job_id, job_payload(row.job))
+    return row
+
+
+def finish_frame(job_id, index, frame, status, error=''):
+    """Store the result of a frame, count it and publish the job"""
+    with transaction.atomic():
+        # A redelivered task must not count a frame twice
+        stored = StoryboardImageFrame.objects.filter(job_id=job_id, index=index).exclude(status__in=FINISHED).update(
+            frame=frame, status=status, error=error, updated_at=timezone.now(),
+        )
+        if stored:
+            StoryboardImageJob.objects.filter(id=job_id).update(done=F('done') + 1, updated_at=timezone.now())
+            if StoryboardImageJob.objects.filter(id=job_id, done__gte=F('total')).exists():
+                succeeded = StoryboardImageFrame.objects.filter(job_id=job_id, status__in=SUCCEEDED).exists()
+                StoryboardImageJob.objects.filter(id=job_id).update(status='completed' if succeeded else 'failed')
+    job = StoryboardImageJob.objects.get(id=job_id)
+    payload = job_payload(job)
+    payload['frame'] = {'index': index, 'status': status, 'storyboard': frame}
+    publish(job_id, payload)
+    return payload
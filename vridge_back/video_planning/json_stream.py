@@ -0,0 +1,79 @@
+"""
+Incremental parsing of streamed JSON model output
+
+The planning prompts ask for one object holding an array of items:
+
+    {"stories": [{...}, {...}], ...}
+
+ArrayItemParser is fed the text chunks as the model writes them and
+returns every object of the ``key`` array as soon as its closing brace has
+arrived, so the items can be sent to the client one by one. It only tracks
+strings, escapes and nesting; anything before the first ``{`` (a ```json
+fence) is skipped. result() parses the whole text once the stream ended.
+"""
+
+import json
+
+
+class ArrayItemParser:
+    def __init__(self, key):
+        self.key = key
+        self.text = ''
+        self._pos = 0
+        self._stack = []         # open '{' / '['
+        self._in_string = False
+        self._escaped = False
+        self._string_start = None
+        self._last_string = None  # last string of the top-level object (a key)
+        self._in_array = False    # inside the top-level ``key`` array
+        self._item_start = None
+
+    def feed(self, chunk):
+        """Items of the ``key`` array completed by ``chunk``"""
+        self.text += chunk
+        items = []
+        text = self.text
+        for index in range(self._pos, len(text)):
+            char = text[index]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == '\\':
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                    if len(self._stack) == 1:
+                        self._last_string = text[self._string_start + 1:index]
+                continue
+
+            if char == '"':
+                if self._stack:
+                    self._in_string = True
+                    self._string_start = index
+            elif char in '{[':
+                if char == '[' and self._stack == ['{'] and self._last_string == self.key:
+                    self._in_array = True
+                elif char == '{' and self._in_array and len(self._stack) == 2:
+                    self._item_start = index
+                self._stack.append(char)
+            elif char in '}]' and self._stack:
+                self._stack.pop()
+                if char == '}' and self._in_array and len(self._stack) == 2 and self._item_start is not None:
+                    try:
+                        items.append(json.loads(text[self._item_start:index + 1]))
+                    except ValueError:
+                        pass  # result() reports the broken JSON
+                    self._item_start = None
+                elif char == ']' and self._in_array and len(self._stack) == 1:
+                    self._in_array = False
+        self._pos = len(text)
+        return items
+
+    def result(self):
+        """The complete JSON object; raises ValueError"""
+        text = self.text.strip()
+        if text.startswith('```json'):
+            text = text[7:]
+        if text.endswith('```'):
+            text = text[:-3]
+        return json.loads(text.strip())
@@ -0,0 +1,78 @@
+"""
+Move base64 data URIs stored in plannings into the storyboard blob store
+: python manage.py backfill_storyboard_blobs [--dry-run]
+"""
+import logging
+
+from django.core.management.base import BaseCommand
+
+from video_planning import blob_store
+from video_planning.models import VideoPlanning, VideoPlanningImage
+
+logger = logging.getLogger(__name__)
+
+JSON_FIELDS = (
+    'stories', 'selected_story',
+    'scenes', 'selected_scene',
+    'shots', 'selected_shot',
+    'storyboards', 'planning_options',
+)
+
+
+def count_data_uris(value):
+    if isinstance(value, dict):
+        return sum(count_data_uris(item) for item in value.values())
+    if isinstance(value, list):
+        return sum(count_data_uris(item) for item in value)
+    return int(blob_store.is_data_uri(value))
+
+
+class Command(BaseCommand):
+    help = 'Move base64 storyboard images into the content-addressed blob store'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only count the images')
+        parser.add_argument('--chunk-size', type=int, default=100, help='Planning ids fetched per query')
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        images = plannings = failed = 0
+
+        # One row at a time: the payloads are what makes the rows large
+        ids = VideoPlanning.objects.order_by('pk').values_list('pk', flat=True)
+        for pk in ids.iterator(chunk_size=options['chunk_size']):
+            planning = VideoPlanning.objects.only('pk', 'title', 'planning_text', *JSON_FIELDS).get(pk=pk)
+            try:
+                changed = []
+                for field in JSON_FIELDS:
+                    value = getattr(planning, field)
+                    if dry_run:
+                        moved = count_data_uris(value)
+                    else:
+                        value, moved = blob_store.replace_data_uris(value)
+                        setattr(planning, field, value)
+                    if moved:
+                        images += moved
+                        changed.append(field)
+                if changed:
+                    plannings += 1
+                    if not dry_run:
+                        # save() so that open collaboration sessions resync
+                        planning.save(update_fields=changed)
+            except Exception as e:
+                failed += 1
+                logger.error(f"Failed to backfill planning {pk}: {e}")
+
+        for image in VideoPlanningImage.objects.filter(image_url__startswith='data:image'):
+            images += 1
+            if dry_run:
+                continue
+            try:
+                image.image_url = blob_store.put_image(*blob_store.decode_data_uri(image.image_url))['webp_url']
+                image.save(update_fields=['image_url'])
+            except Exception as e:
+                failed += 1
+                logger.error(f"Failed to backfill planning image {image.pk}: {e}")
+
+        verb = 'Would move' if dry_run else 'Moved'
+        self.stdout.write(self.style.SUCCESS(f"{verb} {images} images of {plannings} plannings ({failed} failed)"))
@@ -3,6 +3,7 @@ from django.conf import settings
 from django.utils import timezone
 from django.core.validators import MaxValueValidator, MinValueValidator
 import json
+import uuid
 
 
 class VideoPlanning(models.Model):
@@ -316,4 +317,65 @@ class VideoPlanningAnalytics(models.Model):
         elif self.ai_success_rate >= 60:
             return 'average'
         else:
-            return 'needs_improvement'
\ No newline at end of file
+            return 'needs_improvement'
+
+
+class StoryboardImageJob(models.Model):
+    """Storyboard image generation on the storyboard_images queue (video_planning.image_jobs)"""
+    
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('processing', 'Processing'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='storyboard_image_jobs', null=True, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    style = models.CharField(max_length=50, default='minimal')
+    draft_mode = models.BooleanField(default=True)
+    total = models.PositiveIntegerField(default=0, help_text="Frames of the job")
+    done = models.PositiveIntegerField(default=0, help_text="Frames finished, with or without an image")
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'video_planning_storyboard_image_job'
+        verbose_name = 'Storyboard image job'
+        verbose_name_plural = 'Storyboard image jobs'
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"{self.id} - {self.status} ({self.done}/{self.total})"
+
+
+class StoryboardImageFrame(models.Model):
+    """One frame of a StoryboardImageJob; its task stores the result here"""
+    
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('completed', 'Completed'),
+        ('placeholder', 'Placeholder'),
+        ('failed', 'Failed'),
+    ]
+    
+    job = models.ForeignKey(StoryboardImageJob, on_delete=models.CASCADE, related_name='frames')
+    index = models.PositiveIntegerField()
+    frame = models.JSONField(default=dict, help_text="Storyboard frame, updated with its image fields")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'video_planning_storyboard_image_frame'
+        verbose_name = 'Storyboard image frame'
+        verbose_name_plural = 'Storyboard image frames'
+        ordering = ['job', 'index']
+        unique_together = ['job', 'index']
+    
+    def __str__(self):
+        return f"{self.job_id} - Frame {self.index}"
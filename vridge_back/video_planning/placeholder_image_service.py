@@ -1,8 +1,9 @@
 import logging
-import base64
 from PIL import Image, ImageDraw, ImageFont
 from io import BytesIO
 
+from . import blob_store
+
 logger = logging.getLogger(__name__)
 
 
@@ -84,16 +85,14 @@ class PlaceholderImageService:
                 #      
                 draw.rectangle([20, 20, width-20, height-20], outline=text_color, width=2)
             
-            #  base64 
+            # PNG  blob_store 
             buffer = BytesIO()
             img.save(buffer, format='PNG')
             image_bytes = buffer.getvalue()
-            image_base64 = base64.b64encode(image_bytes).decode('utf-8')
-            image_url = f"data:image/png;base64,{image_base64}"
             
             return {
                 "success": True,
-                "image_url": image_url,
+                **blob_store.image_fields(image_bytes, 'image/png'),
                 "prompt_used": f"Placeholder for: {visual_desc}",
                 "is_placeholder": True
             }
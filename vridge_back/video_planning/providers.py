@@ -0,0 +1,238 @@
+"""
+Process-wide AI provider clients
+
+get_clients() returns the Clients of the process: the Gemini models, the
+DALL-E service and the placeholder service, created on first use and then
+shared by every GeminiService and view. The HTTP connection pools live
+with them (the Gemini gRPC channel, an httpx pool for the OpenAI API and a
+requests session for image downloads), so calls reuse warm connections
+instead of paying a TLS handshake each.
+
+The registry is rebuilt when
+- the process forks (gRPC channels and pooled sockets must not be shared
+  with a parent), checked by pid and reset by os.register_at_fork;
+- GOOGLE_API_KEY or OPENAI_API_KEY change, compared on every call, so a
+  rotated key (settings override, environment) takes effect on the next
+  request; reload_clients() forces it.
+
+Calls go through a ProviderLimiter per provider: at most N requests in
+flight and at most M started per minute, across all threads of the
+process (the limits are per process, so they multiply with the number of
+workers). The limiters survive a reload.
+"""
+
+import hashlib
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import requests
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+POOL_CONNECTIONS = 20  # keep-alive connections per provider
+KEEPALIVE_EXPIRY = 60.0  # seconds an idle connection is kept
+OPENAI_TIMEOUT = 120.0
+OPENAI_CONNECT_TIMEOUT = 10.0
+
+
+class ProviderLimiter:
+    """Concurrency cap plus an even requests-per-minute pace (thread-safe)"""
+
+    def __init__(self, name, max_concurrency, per_minute=None):
+        self.name = name
+        self.interval = 60.0 / per_minute if per_minute else 0.0
+        self._slots = threading.BoundedSemaphore(max(1, max_concurrency))
+        self._next_start = 0.0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def slot(self):
+        with self._slots:
+            with self._lock:
+                now = time.monotonic()
+                start = max(now, self._next_start)
+                self._next_start = start + self.interval
+            if start > now:
+                time.sleep(start - now)
+            yield
+
+
+class LimitedModel:
+    """GenerativeModel whose generate_content() goes through a limiter"""
+
+    def __init__(self, model, limiter):
+        self._model = model
+        self._limiter = limiter
+
+    def generate_content(self, *args, **kwargs):
+        if kwargs.get('stream'):
+            return self._stream(*args, **kwargs)
+        with self._limiter.slot():
+            return self._model.generate_content(*args, **kwargs)
+
+    def _stream(self, *args, **kwargs):
+        # The slot is held until the stream is consumed or closed
+        with self._limiter.slot():
+            yield from self._model.generate_content(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._model, name)
+
+
+class LimitedImageService:
+    """Image service whose generate_storyboard_image() goes through a limiter"""
+
+    def __init__(self, service, limiter):
+        self._service = service
+        self._limiter = limiter
+
+    def generate_storyboard_image(self, *args, **kwargs):
+        with self._limiter.slot():
+            return self._service.generate_storyboard_image(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._service, name)
+
+
+def _keys():
+    google = getattr(settings, 'GOOGLE_API_KEY', None) or os.environ.get('GOOGLE_API_KEY') or ''
+    openai = getattr(settings, 'OPENAI_API_KEY', None) or os.environ.get('OPENAI_API_KEY') or ''
+    return google, openai
+
+
+def _fingerprint(keys):
+    return hashlib.sha256('\0'.join(keys).encode()).hexdigest()
+
+
+_limiters = {}
+
+
+def get_limiter(name):
+    """The ProviderLimiter of 'gemini' or 'dalle' (from settings, once)"""
+    limiter = _limiters.get(name)
+    if limiter is None:
+        if name == 'gemini':
+            limiter = ProviderLimiter(name, settings.GEMINI_MAX_CONCURRENCY, settings.GEMINI_REQUESTS_PER_MINUTE)
+        else:
+            limiter = ProviderLimiter(name, settings.DALLE_MAX_CONCURRENCY, settings.DALLE_IMAGES_PER_MINUTE)
+        limiter = _limiters.setdefault(name, limiter)
+    return limiter
+
+
+def _session():
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=POOL_CONNECTIONS)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+class Clients:
+    """What GeminiService needs from the providers, built once per process and keys
+
+    ``model``/``pro_model`` are None without GOOGLE_API_KEY and
+    ``image_service_available`` is False without OPENAI_API_KEY, so image-only
+    callers work without a Gemini key.
+    """
+
+    def __init__(self, google_key, openai_key):
+        from .gemini_service import (
+            DalleService, IMAGE_SERVICE_AVAILABLE, PlaceholderImageService, PLACEHOLDER_SERVICE_AVAILABLE,
+        )
+
+        self.pid = os.getpid()
+        self.fingerprint = _fingerprint((google_key, openai_key))
+
+        self.model = self.pro_model = None
+        if google_key:
+            import google.generativeai as genai
+            # configure() replaces the SDK's default client, i.e. its gRPC channel
+            genai.configure(api_key=google_key)
+            self.model = LimitedModel(genai.GenerativeModel('gemini-1.5-flash'), get_limiter('gemini'))
+            self.pro_model = LimitedModel(genai.GenerativeModel('gemini-1.5-pro'), get_limiter('gemini'))
+
+        self.image_service = None
+        self.http_client = None
+        self.session = _session()
+        if IMAGE_SERVICE_AVAILABLE and DalleService and openai_key:
+            try:
+                import httpx
+                self.http_client = httpx.Client(
+                    timeout=httpx.Timeout(OPENAI_TIMEOUT, connect=OPENAI_CONNECT_TIMEOUT),
+                    limits=httpx.Limits(
+                        max_connections=POOL_CONNECTIONS,
+                        max_keepalive_connections=POOL_CONNECTIONS,
+                        keepalive_expiry=KEEPALIVE_EXPIRY,
+                    ),
+                )
+                service = DalleService(api_key=openai_key, http_client=self.http_client, session=self.session)
+                self.image_service = LimitedImageService(service, get_limiter('dalle'))
+            except Exception as e:
+                logger.error(f"Image service initialization failed: {e}")
+        self.image_service_available = bool(self.image_service and self.image_service.available)
+
+        self.placeholder_service = None
+        if PLACEHOLDER_SERVICE_AVAILABLE and PlaceholderImageService:
+            try:
+                self.placeholder_service = PlaceholderImageService()
+            except Exception as e:
+                logger.error(f"Placeholder service initialization failed: {e}")
+
+        logger.info(
+            f"AI clients ready in process {self.pid} "
+            f"(gemini: {self.model is not None}, dall-e: {self.image_service_available})"
+        )
+
+
+_clients = None
+_clients_lock = threading.Lock()
+
+
+def get_clients():
+    """The Clients of this process and of the current API keys"""
+    global _clients
+    clients = _clients
+    keys = _keys()
+    if clients is not None and clients.pid == os.getpid() and clients.fingerprint == _fingerprint(keys):
+        return clients
+    with _clients_lock:
+        clients = _clients
+        if clients is None or clients.pid != os.getpid() or clients.fingerprint != _fingerprint(keys):
+            if clients is not None and clients.pid == os.getpid():
+                logger.info("AI provider keys changed, reloading clients")
+            # The old pools are left to in-flight calls and the garbage collector
+            clients = _clients = Clients(*keys)
+    return clients
+
+
+def reload_clients():
+    """Drop the clients; the next get_clients() builds new ones"""
+    global _clients
+    with _clients_lock:
+        _clients = None
+
+
+def _after_fork():
+    global _clients, _clients_lock
+    # The parent's lock may have been held by another thread at fork time
+    _clients_lock = threading.Lock()
+    _clients = None
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork)
+
+
+@receiver(setting_changed)
+def reload_on_setting_change(setting, **kwargs):
+    if setting in ('GOOGLE_API_KEY', 'OPENAI_API_KEY'):
+        reload_clients()
+    elif setting.startswith(('GEMINI_', 'DALLE_')):
+        _limiters.clear()
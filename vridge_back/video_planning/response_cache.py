@@ -0,0 +1,79 @@
+"""
+Cache of parsed Gemini responses of the planning wizard steps
+
+Stories, scenes and shots are cached per user for GEMINI_RESPONSE_CACHE_TTL
+under a hash of the model, its generation parameters, the step and the
+prompt with its whitespace collapsed (the prompts are indented f-strings,
+the content is what matters). Going back a step or retrying the same input
+then answers from the cache instead of waiting for the model again; a
+``regenerate`` request skips the lookup and replaces the entry.
+
+Only results that parsed and validated are stored, together with the
+token counts of the call that produced them, so a hit can report the
+tokens it saved (GeminiService._update_token_usage).
+"""
+
+import hashlib
+import json
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+
+from core.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+CACHE_PREFIX = 'gemini_response'
+
+cache_lookups = registry.counter(
+    'gemini_response_cache_total',
+    'Gemini response cache lookups by planning step and result (hit, miss)',
+    ['feature', 'result'],
+)
+saved_tokens = registry.counter(
+    'gemini_response_cache_saved_tokens_total',
+    'Gemini tokens not spent thanks to the response cache',
+    ['feature'],
+)
+
+
+def canonical_prompt(prompt):
+    return ' '.join(prompt.split())
+
+
+def cache_key(user_id, feature, model, prompt):
+    params = {
+        'model': getattr(model, 'model_name', str(model)),
+        'generation_config': getattr(model, '_generation_config', None) or {},
+        'feature': feature,
+    }
+    digest = hashlib.sha256(json.dumps(params, sort_keys=True, default=str).encode())
+    digest.update(b'\0')
+    digest.update(canonical_prompt(prompt).encode())
+    return f'{CACHE_PREFIX}:{user_id}:{digest.hexdigest()}'
+
+
+def enabled(user_id):
+    return bool(user_id) and settings.GEMINI_RESPONSE_CACHE_TTL > 0
+
+
+def lookup(user_id, feature, model, prompt):
+    """{'result', 'prompt_tokens', 'response_tokens'} or None"""
+    try:
+        entry = cache.get(cache_key(user_id, feature, model, prompt))
+    except Exception as e:
+        logger.warning(f"Gemini response cache unavailable: {e}")
+        entry = None
+    cache_lookups.inc(feature=feature, result='hit' if entry else 'miss')
+    if entry:
+        saved_tokens.inc(entry['prompt_tokens'] + entry['response_tokens'], feature=feature)
+    return entry
+
+
+def store(user_id, feature, model, prompt, result, prompt_tokens=0, response_tokens=0):
+    entry = {'result': result, 'prompt_tokens': prompt_tokens, 'response_tokens': response_tokens}
+    try:
+        cache.set(cache_key(user_id, feature, model, prompt), entry, settings.GEMINI_RESPONSE_CACHE_TTL)
+    except Exception as e:
+        logger.warning(f"Failed to cache Gemini response: {e}")
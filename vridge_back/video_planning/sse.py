@@ -0,0 +1,196 @@
+"""
+Server-sent event variants of the story / scene / shot generation steps
+
+    POST generate/story/stream/   same body as generate/story/
+    POST generate/scenes/stream/  same body as generate/scenes/
+    POST generate/shots/stream/   same body as generate/shots/
+
+answer ``text/event-stream`` with one event per item as soon as the model
+has written it, then a ``done`` event carrying what the non-streaming view
+returns:
+
+    event: story          data: {"index": 0, "item": {...}}
+    event: done           data: {"status": "success", "data": {...}, "token_usage": {...}}
+    event: error          data: {"status": "error", "message": "..."}
+
+The first item reaches the client after a second or two under either
+entry point. The events come from a sync generator over the blocking SDK
+stream (GeminiService.stream_*):
+- under config.wsgi (gunicorn) it is the response body, and the request
+  holds a sync worker for the 10-30 s of a generation;
+- under config.asgi (daphne) it is advanced one event at a time through
+  sync_to_async, i.e. in the request's own sync thread, where the response
+  cache may use the database, and no worker is held while the model writes.
+Authentication is the JWT of the other views (users.principal).
+"""
+
+import json
+import logging
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
+
+from users.principal import resolve_request_user
+
+from .gemini_service import GeminiService
+from .views import log_story_planning, story_context
+
+logger = logging.getLogger(__name__)
+
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def _error(message, status):
+    return JsonResponse({'status': 'error', 'message': message}, status=status)
+
+
+@sync_to_async
+def _authenticate(request):
+    try:
+        return resolve_request_user(request)
+    except Exception as e:
+        logger.info(f"SSE authentication failed: {e}")
+        return None
+
+
+async def _prepare(request):
+    """(user, body, None) of a POST with a valid token and JSON body, else (None, None, error response)"""
+    if request.method != 'POST':
+        return None, None, _error('Method not allowed', 405)
+    user = await _authenticate(request)
+    if user is None:
+        response = _error('NEED_ACCESS_TOKEN', 401)
+        response['WWW-Authenticate'] = 'Bearer'
+        return None, None, response
+    try:
+        body = json.loads(request.body or b'{}')
+    except ValueError:
+        body = None
+    if not isinstance(body, dict):
+        return None, None, _error('Invalid JSON body', 400)
+    return user, body, None
+
+
+def _service(user, body):
+    gemini_service = GeminiService()
+    gemini_service.user_id = user.id
+    gemini_service.regenerate = bool(body.get('regenerate', False))
+    return gemini_service
+
+
+def _event_frames(item_event, make_stream, gemini_service, on_result=None):
+    """SSE frames of a GeminiService.stream_* generator"""
+    stream = None
+    index = 0
+    try:
+        stream = make_stream()
+        for kind, value in stream:
+            if kind == 'item':
+                yield sse_event(item_event, {'index': index, 'item': value})
+                index += 1
+                continue
+            if on_result:
+                on_result(value)
+            yield sse_event('done', {
+                'status': 'success',
+                'data': value,
+                'token_usage': gemini_service.get_token_usage(),
+            })
+    except Exception as e:
+        logger.error(f"Streaming {item_event} generation failed: {e}")
+        yield sse_event('error', {'status': 'error', 'message': str(e)})
+    finally:
+        if stream is not None:
+            try:
+                stream.close()
+            except Exception:
+                pass
+
+
+async def _aiter_frames(frames):
+    """``frames`` advanced one at a time in the request's sync thread"""
+    _next = sync_to_async(next)
+    try:
+        while True:
+            frame = await _next(frames, None)
+            if frame is None:
+                return
+            yield frame
+    finally:
+        await sync_to_async(frames.close)()
+
+
+def _stream_response(request, frames):
+    # Django collects an async iterator into a list under WSGI and a sync one
+    # under ASGI, so each server gets the kind it streams
+    content = _aiter_frames(frames) if isinstance(request, ASGIRequest) else frames
+    response = StreamingHttpResponse(content, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+async def generate_story_stream(request):
+    user, body, error = await _prepare(request)
+    if error:
+        return error
+    planning_text = body.get('planning_text', '')
+    if not planning_text:
+        return _error('planning_text is required', 400)
+
+    context = story_context(body)
+    try:
+        gemini_service = await sync_to_async(_service)(user, body)
+    except ValueError as e:
+        return _error(str(e), 503)
+    return _stream_response(request, _event_frames(
+        'story',
+        lambda: gemini_service.stream_stories_from_planning(planning_text, context),
+        gemini_service,
+        on_result=lambda result: log_story_planning(user, planning_text, context, result),
+    ))
+
+
+async def generate_scenes_stream(request):
+    user, body, error = await _prepare(request)
+    if error:
+        return error
+    story_data = body.get('story_data') or {}
+    if not story_data:
+        return _error('story_data is required', 400)
+    planning_options = body.get('planning_options')
+    if planning_options:
+        story_data['planning_options'] = planning_options
+
+    try:
+        gemini_service = await sync_to_async(_service)(user, body)
+    except ValueError as e:
+        return _error(str(e), 503)
+    return _stream_response(request, _event_frames(
+        'scene', lambda: gemini_service.stream_scenes_from_story(story_data), gemini_service,
+    ))
+
+
+async def generate_shots_stream(request):
+    user, body, error = await _prepare(request)
+    if error:
+        return error
+    scene_data = body.get('scene_data') or {}
+    if not scene_data:
+        return _error('scene_data is required', 400)
+
+    try:
+        gemini_service = await sync_to_async(_service)(user, body)
+    except ValueError as e:
+        return _error(str(e), 503)
+    return _stream_response(request, _event_frames(
+        'shot', lambda: gemini_service.stream_shots_from_scene(scene_data), gemini_service,
+    ))
+
+
+# JWT in the Authorization header, like the DRF views
+for _view in (generate_story_stream, generate_scenes_stream, generate_shots_stream):
+    _view.csrf_exempt = True
@@ -1,11 +1,12 @@
 import os
 import logging
 import requests
-import base64
 from io import BytesIO
 from PIL import Image
 from django.conf import settings
 
+from . import blob_store
+
 logger = logging.getLogger(__name__)
 
 
@@ -76,15 +77,13 @@ class StableDiffusionService:
                 )
             
                 if response.status_code == 200:
-                    #   base64 
+                    #   blob_store 
                     image_bytes = response.content
-                    image_base64 = base64.b64encode(image_bytes).decode('utf-8')
-                    image_url = f"data:image/png;base64,{image_base64}"
                     
                     logger.info(f"Successfully generated image with model: {current_model}")
                     return {
                         "success": True,
-                        "image_url": image_url,
+                        **blob_store.image_fields(image_bytes, 'image/png'),
                         "prompt_used": prompt,
                         "model_used": current_model
                     }
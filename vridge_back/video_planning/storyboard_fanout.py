@@ -0,0 +1,110 @@
+"""
+Concurrent storyboard generation for a list of scenes
+
+generate_storyboards() runs one generate_storyboards_from_shot() per scene,
+at most STORYBOARD_CONCURRENCY at a time, on GeminiService instances that
+share the process' provider clients (providers.get_clients()), so the
+provider limits apply across all requests. Results are yielded as scenes
+finish, not in scene order; every result carries its ``scene_index``.
+
+iter_storyboards() is the same for synchronous callers (Django views): the
+event loop runs in a helper thread and the results come through a queue.
+"""
+
+import asyncio
+import logging
+import queue
+import threading
+
+from django.conf import settings
+
+from . import providers
+from .gemini_service import GeminiService
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+
+
+def scene_shot(scene):
+    """shot_data of the single shot a scene's storyboard is drawn from"""
+    return {
+        'shot_number': 1,
+        'shot_type': "",
+        'description': scene.get('action') or scene.get('description', ''),
+        'camera_angle': "",
+        'camera_movement': "",
+        'duration': "5",
+        'scene_info': scene,
+    }
+
+
+def generate_scene(index, scene, style='minimal', clients=None):
+    """{'scene_index', 'error', 'storyboard'} of one scene; never raises"""
+    try:
+        gemini_service = GeminiService(clients=clients or providers.get_clients())
+        gemini_service.style = style
+        storyboard_data = gemini_service.generate_storyboards_from_shot(scene_shot(scene))
+    except Exception as e:
+        logger.error(f"Storyboard of scene {index + 1} failed: {e}")
+        return {'scene_index': index, 'error': str(e), 'storyboard': None}
+
+    if 'error' in storyboard_data:
+        logger.error(f"Storyboard of scene {index + 1} failed: {storyboard_data['error']}")
+        return {'scene_index': index, 'error': storyboard_data['error'], 'storyboard': None}
+    storyboards = storyboard_data.get('storyboards') or [{}]
+    return {'scene_index': index, 'error': None, 'storyboard': storyboards[0]}
+
+
+async def generate_storyboards(scenes, style='minimal', concurrency=None, clients=None):
+    """Async iterator of generate_scene() results in completion order"""
+    clients = clients or providers.get_clients()
+    semaphore = asyncio.Semaphore(max(1, concurrency or settings.STORYBOARD_CONCURRENCY))
+
+    async def run(index, scene):
+        async with semaphore:
+            return await asyncio.to_thread(generate_scene, index, scene, style, clients)
+
+    tasks = [asyncio.ensure_future(run(index, scene)) for index, scene in enumerate(scenes)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        # Scenes not started yet are dropped; running ones finish in their thread
+        for task in tasks:
+            task.cancel()
+
+
+def iter_storyboards(scenes, style='minimal', concurrency=None, clients=None):
+    """generate_storyboards() for synchronous code; stops when closed"""
+    clients = clients or providers.get_clients()
+    results = queue.Queue()
+    stop = threading.Event()
+
+    async def pump():
+        storyboards = generate_storyboards(scenes, style, concurrency, clients)
+        try:
+            async for result in storyboards:
+                results.put(result)
+                if stop.is_set():
+                    break
+        finally:
+            await storyboards.aclose()
+
+    def run():
+        try:
+            asyncio.run(pump())
+        except Exception as e:
+            logger.error(f"Storyboard generation stopped: {e}", exc_info=True)
+        finally:
+            results.put(_DONE)
+
+    threading.Thread(target=run, name='storyboard-fanout', daemon=True).start()
+    try:
+        while True:
+            result = results.get()
+            if result is _DONE:
+                return
+            yield result
+    finally:
+        stop.set()
@@ -0,0 +1,77 @@
+"""
+Celery tasks of the storyboard_images queue (see image_jobs)
+"""
+import logging
+
+from celery import shared_task
+from celery.exceptions import Retry
+
+from . import image_jobs, providers
+
+logger = logging.getLogger(__name__)
+
+
+class ImageGenerationError(Exception):
+    pass
+
+
+def _placeholder(clients, frame, error):
+    """Frame with a placeholder image, or None when there is none either"""
+    if not clients.placeholder_service:
+        return None
+    try:
+        result = clients.placeholder_service.generate_storyboard_image(frame)
+    except Exception as e:
+        logger.error(f"Placeholder generation failed: {e}")
+        return None
+    if not result.get('success'):
+        return None
+    return {**frame, 'image_url': result['image_url'], 'is_placeholder': True, 'image_error': error}
+
+
+@shared_task(bind=True, max_retries=image_jobs.MAX_RETRIES, acks_late=True, reject_on_worker_lost=True, soft_time_limit=600, time_limit=660)
+def generate_frame_image(self, job_id, index):
+    """
+    Draw frame ``index`` of a StoryboardImageJob:
+    1. DALL-E through the process' rate-limited image service
+    2. Retry with exponential backoff when it fails
+    3. A placeholder image after the last retry
+    """
+    row = image_jobs.start_frame(job_id, index)
+    if row is None:
+        logger.info(f"Storyboard image job {job_id} frame {index} is done or gone")
+        return
+
+    job = row.job
+    frame = dict(row.frame)
+    clients = providers.get_clients()
+    try:
+        if not clients.image_service_available:
+            raise ImageGenerationError("DALL-E image service is not available")
+        result = clients.image_service.generate_storyboard_image(frame, style=job.style, draft_mode=job.draft_mode)
+        if not result.get('success'):
+            raise ImageGenerationError(result.get('error') or "Image generation failed")
+    except Retry:
+        raise
+    except Exception as e:
+        if clients.image_service_available and self.request.retries < self.max_retries:
+            countdown = image_jobs.retry_delay(self.request.retries)
+            logger.warning(
+                f"Storyboard image job {job_id} frame {index} failed ({e}), "
+                f"retry {self.request.retries + 1}/{self.max_retries} in {countdown:.0f}s"
+            )
+            raise self.retry(exc=e, countdown=countdown)
+
+        logger.error(f"Storyboard image job {job_id} frame {index} failed: {e}")
+        fallback = _placeholder(clients, frame, str(e))
+        if fallback is not None:
+            image_jobs.finish_frame(job_id, index, fallback, 'placeholder', str(e))
+        else:
+            image_jobs.finish_frame(job_id, index, {**frame, 'image_error': str(e)}, 'failed', str(e))
+        return
+
+    for key in image_jobs.IMAGE_FIELDS:
+        if result.get(key):
+            frame[key] = result[key]
+    frame['draft_mode'] = job.draft_mode
+    image_jobs.finish_frame(job_id, index, frame, 'completed')
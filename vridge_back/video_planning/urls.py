@@ -1,5 +1,5 @@
 from django.urls import path
-from . import views
+from . import sse, views
 # Conditional import to prevent import errors in Railway
 try:
     from . import workflow_views
@@ -31,12 +31,16 @@ urlpatterns = [
     path('generate/story/', views.generate_story, name='generate_story'),
     path('generate/scenes/', views.generate_scenes, name='generate_scenes'),
     path('generate/shots/', views.generate_shots, name='generate_shots'),
+    path('generate/story/stream/', sse.generate_story_stream, name='generate_story_stream'),
+    path('generate/scenes/stream/', sse.generate_scenes_stream, name='generate_scenes_stream'),
+    path('generate/shots/stream/', sse.generate_shots_stream, name='generate_shots_stream'),
     path('generate/storyboards/', views.generate_storyboards, name='generate_storyboards'),
     path('generate/all-storyboards/', views.generate_all_storyboards, name='generate_all_storyboards'),
     
     #   API
     path('regenerate/storyboard-image/', views.regenerate_storyboard_image, name='regenerate_storyboard_image'),
     path('download/storyboard-image/', views.download_storyboard_image, name='download_storyboard_image'),
+    path('blobs/<str:name>', views.storyboard_blob, name='storyboard_blob'),
     path('generate/storyboard-images-async/', views.generate_storyboard_images_async, name='generate_storyboard_images_async'),
     path('check-image-generation-status/<str:task_id>/', views.check_image_generation_status, name='check_image_generation_status'),
     # path('proxy/image/', views_proxy.proxy_image, name='proxy_image'),
@@ -4,11 +4,11 @@ from rest_framework.permissions import IsAuthenticated, AllowAny
 from .permissions import AllowAnyTemporary
 # from .debug_permissions import DebugAllowAny  #  
 from rest_framework.response import Response
-from django.http import HttpResponse
+from django.http import HttpResponse, StreamingHttpResponse
 from django.db.models import Q
 from django.views.decorators.csrf import csrf_exempt
 from django.utils import timezone
-from .models import VideoPlanning, VideoPlanningImage, VideoPlanningAIPrompt
+from .models import StoryboardImageJob, VideoPlanning, VideoPlanningImage, VideoPlanningAIPrompt
 from .serializers import VideoPlanningSerializer, VideoPlanningListSerializer
 from .gemini_service import GeminiService
 from .ai_prompt_engine import PromptOptimizationService, PromptGenerationContext, PromptGenerationResult
@@ -26,16 +26,17 @@ import requests
 from urllib.parse import urlparse
 import os
 import json
-from django.http import FileResponse, HttpResponse
+from django.http import FileResponse, HttpResponse, Http404, HttpResponseRedirect
+from django.views.decorators.http import require_GET
+from feedbacks import media
+from . import blob_store, image_jobs, providers, storyboard_fanout
 from .pdf_export_service import PDFExportService
 from .compressed_pdf_export_service import CompressedPDFExportService
 from .pdf_export_service_enhanced import EnhancedPDFExportService
 from .google_slides_service import GoogleSlidesService
 from .services.advanced_pdf_export_service import AdvancedPDFExportService
-from .async_image_generator import AsyncImageGenerator
-import uuid
 from django.core.cache import cache
-import threading
+from django.core.exceptions import ValidationError
 from datetime import datetime
 import base64
 from urllib.parse import urlparse
@@ -142,6 +143,49 @@ def generate_structure(request):
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+def story_context(data):
+    """Story generation options of a generate_story request"""
+    return {
+        'tone': data.get('tone', ''),
+        'genre': data.get('genre', ''),
+        'concept': data.get('concept', ''),
+        'target': data.get('target', ''),
+        'purpose': data.get('purpose', ''),
+        'duration': data.get('duration', ''),
+        'story_framework': data.get('story_framework', 'classic'),
+        'development_level': data.get('development_level', 'balanced'),
+        'character_name': data.get('character_name', ''),
+        'character_description': data.get('character_description', ''),
+        'character_image': data.get('character_image', '')
+    }
+
+
+def log_story_planning(user, planning_text, context, stories_data):
+    """VideoPlanning row of a story generation (generate_story and its stream)"""
+    try:
+        #   (     )
+        title = stories_data.get('stories', [{}])[0].get('title', '')
+        if not title:
+            title = planning_text[:50] + "..." if len(planning_text) > 50 else planning_text[:50]
+        
+        # VideoPanning 
+        video_planning = VideoPlanning.objects.create(
+            user=user,
+            title=title,
+            planning_text=planning_text,
+            stories=stories_data.get('stories', []),
+            current_step=1
+        )
+        
+        # JSON     (  )
+        video_planning.selected_story = {'planning_options': dict(context)}
+        video_planning.save()
+        
+        logger.info(f"VideoPanning log created for user {user.email}")
+    except Exception as e:
+        logger.error(f"Failed to create VideoPanning log: {e}")
+
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def generate_story(request):
@@ -151,17 +195,7 @@ def generate_story(request):
     
     try:
         planning_text = request.data.get('planning_text', '')
-        tone = request.data.get('tone', '')
-        genre = request.data.get('genre', '')
-        concept = request.data.get('concept', '')
-        target = request.data.get('target', '')
-        purpose = request.data.get('purpose', '')
-        duration = request.data.get('duration', '')
-        story_framework = request.data.get('story_framework', 'classic')
-        development_level = request.data.get('development_level', 'balanced')
-        character_name = request.data.get('character_name', '')
-        character_description = request.data.get('character_description', '')
-        character_image = request.data.get('character_image', '')
+        context = story_context(request.data)
         
         if not planning_text:
             return Response({
@@ -169,22 +203,9 @@ def generate_story(request):
                 'message': '  .'
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        #     
-        context = {
-            'tone': tone,
-            'genre': genre,
-            'concept': concept,
-            'target': target,
-            'purpose': purpose,
-            'duration': duration,
-            'story_framework': story_framework,
-            'development_level': development_level,
-            'character_name': character_name,
-            'character_description': character_description,
-            'character_image': character_image
-        }
-        
         gemini_service = GeminiService()
+        gemini_service.user_id = request.user.id
+        gemini_service.regenerate = bool(request.data.get('regenerate', False))  # bypasses the response cache
         stories_data = gemini_service.generate_stories_from_planning(planning_text, context)
         
         logger.info(f"[generate_story] Stories data response: {stories_data}")
@@ -200,42 +221,7 @@ def generate_story(request):
         
         #    VideoPanning  
         if request.user.is_authenticated:
-            try:
-                #   (     )
-                title = stories_data.get('stories', [{}])[0].get('title', '')
-                if not title:
-                    title = planning_text[:50] + "..." if len(planning_text) > 50 else planning_text[:50]
-                
-                # VideoPanning 
-                video_planning = VideoPlanning.objects.create(
-                    user=request.user,
-                    title=title,
-                    planning_text=planning_text,
-                    stories=stories_data.get('stories', []),
-                    current_step=1
-                )
-                
-                # planning_data   
-                planning_data = {
-                    'tone': tone,
-                    'genre': genre,
-                    'concept': concept,
-                    'target': target,
-                    'purpose': purpose,
-                    'duration': duration,
-                    'story_framework': story_framework,
-                    'development_level': development_level,
-                    'character_name': character_name,
-                    'character_description': character_description,
-                    'character_image': character_image
-                }
-                # JSON     (  )
-                video_planning.selected_story = {'planning_options': planning_data}
-                video_planning.save()
-                
-                logger.info(f"VideoPanning log created for user {request.user.email}")
-            except Exception as e:
-                logger.error(f"Failed to create VideoPanning log: {e}")
+            log_story_planning(request.user, planning_text, context, stories_data)
         
         # stories   
         if not stories_data.get('stories'):
@@ -275,6 +261,8 @@ def generate_scenes(request):
             }, status=status.HTTP_400_BAD_REQUEST)
         
         gemini_service = GeminiService()
+        gemini_service.user_id = request.user.id
+        gemini_service.regenerate = bool(request.data.get('regenerate', False))  # bypasses the response cache
         #   planning_options 
         if planning_options:
             story_data['planning_options'] = planning_options
@@ -314,6 +302,8 @@ def generate_shots(request):
             }, status=status.HTTP_400_BAD_REQUEST)
         
         gemini_service = GeminiService()
+        gemini_service.user_id = request.user.id
+        gemini_service.regenerate = bool(request.data.get('regenerate', False))  # bypasses the response cache
         shots_data = gemini_service.generate_shots_from_scene(scene_data)
         
         if 'error' in shots_data:
@@ -378,9 +368,7 @@ def generate_storyboards(request):
         logger.info("=" * 50)
         logger.info("   ")
         logger.info(f"  - : {style}")
-        logger.info(f"  -  : {shot_data}")
-        logger.info(f"  - IMAGE_SERVICE_AVAILABLE: {IMAGE_SERVICE_AVAILABLE}")
-        logger.info(f"  - DalleService : {'' if DalleService else ''}")
+        logger.debug(f"  -  : {shot_data}")
         
         #    GeminiService  
         gemini_service = GeminiService()
@@ -396,8 +384,9 @@ def generate_storyboards(request):
             #     
             if IMAGE_SERVICE_AVAILABLE and DalleService:
                 try:
-                    dalle_service = DalleService()
-                    if dalle_service.available:
+                    clients = providers.get_clients()
+                    dalle_service = clients.image_service
+                    if clients.image_service_available:
                         storyboards = storyboard_data.get('storyboards', [])
                         for i, frame in enumerate(storyboards):
                             logger.info(f"Generating image for fallback frame {i+1} (draft_mode={draft_mode})")
@@ -409,9 +398,7 @@ def generate_storyboards(request):
                             else:
                                 #  
                                 try:
-                                    from .placeholder_image_service import PlaceholderImageService
-                                    ph_service = PlaceholderImageService()
-                                    ph_result = ph_service.generate_storyboard_image(frame)
+                                    ph_result = clients.placeholder_service.generate_storyboard_image(frame)
                                     if ph_result['success']:
                                         storyboard_data['storyboards'][i]['image_url'] = ph_result['image_url']
                                         storyboard_data['storyboards'][i]['is_placeholder'] = True
@@ -437,6 +424,34 @@ def generate_storyboards(request):
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+def _complete_storyboards(results, total):
+    """Results sorted by scene_index; scenes without one are reported as failed"""
+    storyboards = {result['scene_index']: result for result in results}
+    return [
+        storyboards.get(index) or {'scene_index': index, 'error': 'Storyboard generation stopped', 'storyboard': None}
+        for index in range(total)
+    ]
+
+
+def _storyboard_stream(results, total):
+    """One JSON line per finished scene, then a summary line"""
+    seen = set()
+    success_count = 0
+    for result in results:
+        seen.add(result['scene_index'])
+        success_count += result['error'] is None
+        yield json.dumps({'type': 'storyboard', **result}, ensure_ascii=False) + '\n'
+    for index in range(total):
+        if index not in seen:
+            yield json.dumps({'type': 'storyboard', 'scene_index': index, 'error': 'Storyboard generation stopped', 'storyboard': None}, ensure_ascii=False) + '\n'
+    yield json.dumps({
+        'type': 'done',
+        'total': total,
+        'success_count': success_count,
+        'error_count': total - success_count
+    }) + '\n'
+
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def generate_all_storyboards(request):
@@ -465,69 +480,31 @@ def generate_all_storyboards(request):
             }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
         
         try:
-            dalle_service = DalleService()
-            if not dalle_service.available:
-                return Response({
-                    'status': 'error',
-                    'message': 'DALL-E    . OPENAI_API_KEY .'
-                }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+            clients = providers.get_clients()
         except Exception as e:
+            logger.error(f"AI clients unavailable: {e}")
+            clients = None
+        if not clients or not clients.image_service_available:
             return Response({
                 'status': 'error',
-                'message': '    '
+                'message': 'DALL-E    . OPENAI_API_KEY .'
             }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
         
-        #   
-        storyboards = []
-        success_count = 0
-        error_count = 0
+        # Scenes run concurrently (STORYBOARD_CONCURRENCY at a time)
+        results = storyboard_fanout.iter_storyboards(scenes, style, clients=clients)
         
-        #     
-        for i, scene in enumerate(scenes):
-            try:
-                #      (  )
-                shot_data = {
-                    'shot_number': 1,
-                    'shot_type': "",
-                    'description': scene.get('action') or scene.get('description', ''),
-                    'camera_angle': "",
-                    'camera_movement': "",
-                    'duration': "5",
-                    'scene_info': scene
-                }
-                
-                #    GeminiService  
-                gemini_service = GeminiService()
-                gemini_service.style = style  #  
-                storyboard_data = gemini_service.generate_storyboards_from_shot(shot_data)
-                
-                if 'error' in storyboard_data:
-                    logger.error(f" {i+1}   : {storyboard_data['error']}")
-                    storyboards.append({
-                        'scene_index': i,
-                        'error': storyboard_data['error'],
-                        'storyboard': None
-                    })
-                    error_count += 1
-                else:
-                    #    
-                    storyboard_result = storyboard_data.get('storyboards', [{}])[0] if storyboard_data.get('storyboards') else {}
-                    storyboards.append({
-                        'scene_index': i,
-                        'error': None,
-                        'storyboard': storyboard_result
-                    })
-                    success_count += 1
-                    logger.info(f" {i+1}   ")
-                
-            except Exception as e:
-                logger.error(f" {i+1}   : {str(e)}")
-                storyboards.append({
-                    'scene_index': i,
-                    'error': str(e),
-                    'storyboard': None
-                })
-                error_count += 1
+        if request.data.get('stream') or request.query_params.get('stream'):
+            # One NDJSON line per scene as it finishes
+            response = StreamingHttpResponse(
+                _storyboard_stream(results, len(scenes)),
+                content_type='application/x-ndjson'
+            )
+            response['Cache-Control'] = 'no-cache'
+            response['X-Accel-Buffering'] = 'no'
+            return response
+        
+        storyboards = _complete_storyboards(results, len(scenes))
+        success_count = sum(1 for storyboard in storyboards if storyboard['error'] is None)
         
         return Response({
             'status': 'success',
@@ -535,7 +512,7 @@ def generate_all_storyboards(request):
                 'storyboards': storyboards,
                 'total': len(scenes),
                 'success_count': success_count,
-                'error_count': error_count
+                'error_count': len(storyboards) - success_count
             }
         }, status=status.HTTP_200_OK)
         
@@ -579,8 +556,8 @@ def regenerate_storyboard_image(request):
             }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
             
         try:
-            image_service = DalleService()
-            if not image_service.available:
+            image_service = providers.get_clients().image_service
+            if not image_service or not image_service.available:
                 return Response({
                     'status': 'error',
                     'message': 'DALL-E    . OPENAI_API_KEY .'
@@ -593,24 +570,9 @@ def regenerate_storyboard_image(request):
         
         #  
         if use_async:
-            #  ID 
-            task_id = str(uuid.uuid4())
-            
-            #    
-            async_generator = AsyncImageGenerator()
-            
-            #      
-            storyboard_data = {
-                'storyboards': [frame_data]
-            }
-            
-            #     
-            def generate_single_image():
-                async_generator.generate_storyboard_images_async(storyboard_data, task_id)
-            
-            thread = threading.Thread(target=generate_single_image)
-            thread.daemon = True
-            thread.start()
+            # One-frame job on the storyboard_images queue (image_jobs)
+            job = image_jobs.create_job(request.user, [frame_data], style=style, draft_mode=draft_mode)
+            task_id = str(job.id)
             
             return Response({
                 'status': 'success',
@@ -644,6 +606,24 @@ def regenerate_storyboard_image(request):
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+@require_GET
+def storyboard_blob(request, name):
+    """Stored storyboard image by content hash (see blob_store)"""
+    if not blob_store.BLOB_NAME_RE.match(name):
+        raise Http404
+    path = blob_store.blob_path(name)
+    if path is None:
+        # Remote storage: a fresh (signed) URL of the object
+        storage = blob_store.get_storage()
+        if not storage.exists(blob_store.storage_name(name)):
+            raise Http404
+        return HttpResponseRedirect(storage.url(blob_store.storage_name(name)))
+    try:
+        return media.serve_file(request, path, cache_control=media.IMMUTABLE_CACHE_CONTROL)
+    except FileNotFoundError:
+        raise Http404
+
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def download_storyboard_image(request):
@@ -687,6 +667,24 @@ def download_storyboard_image(request):
                     'message': 'base64     .'
                 }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
         
+        #    (blob_store)
+        blob_name = blob_store.parse_blob_url(image_url)
+        if blob_name:
+            try:
+                with blob_store.open_blob(blob_name) as f:
+                    image_data = f.read()
+            except FileNotFoundError:
+                return Response({
+                    'status': 'error',
+                    'message': '   .'
+                }, status=status.HTTP_404_NOT_FOUND)
+            
+            file_extension = os.path.splitext(blob_name)[1]
+            safe_title = "".join(c for c in frame_title if c.isalnum() or c in (' ', '-', '_')).rstrip()
+            http_response = HttpResponse(image_data, content_type=media.content_type_for(blob_name))
+            http_response['Content-Disposition'] = f'attachment; filename="{safe_title}{file_extension}"'
+            return http_response
+        
         # URL  
         try:
             response = requests.get(image_url, timeout=30)
@@ -1858,19 +1856,13 @@ def generate_storyboard_images_async(request):
                 'message': '  .'
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        #  ID 
-        task_id = str(uuid.uuid4())
-        
-        #    
-        async_generator = AsyncImageGenerator()
-        
-        #     
-        def generate_images():
-            async_generator.generate_storyboard_images_async(storyboard_data, task_id)
-        
-        thread = threading.Thread(target=generate_images)
-        thread.daemon = True
-        thread.start()
+        job = image_jobs.create_job(
+            request.user,
+            storyboard_data['storyboards'],
+            style=request.data.get('style', 'minimal'),
+            draft_mode=request.data.get('draft_mode', True),
+        )
+        task_id = str(job.id)
         
         return Response({
             'status': 'success',
@@ -1893,16 +1885,21 @@ def check_image_generation_status(request, task_id):
          .
     """
     try:
-        async_generator = AsyncImageGenerator()
-        status_data = async_generator.get_generation_status(task_id)
+        try:
+            job = StoryboardImageJob.objects.get(id=task_id, user=request.user)
+        except (StoryboardImageJob.DoesNotExist, ValueError, ValidationError):
+            return Response({
+                'status': 'success',
+                'task_status': {'status': 'not_found'}
+            }, status=status.HTTP_200_OK)
         
-        if status_data.get('status') == 'completed':
+        status_data = image_jobs.job_payload(job)
+        if job.status == 'completed':
             #     
-            result = async_generator.get_generation_result(task_id)
             return Response({
                 'status': 'success',
                 'task_status': status_data,
-                'result': result
+                'result': image_jobs.job_result(job)
             }, status=status.HTTP_200_OK)
         else:
             #      
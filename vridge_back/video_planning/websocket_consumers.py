@@ -7,8 +7,10 @@ import logging
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
 from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
 from django.utils import timezone
-from .models import VideoPlanning, VideoPlanningCollaboration, VideoPlanningAIPrompt
+from . import collaboration, image_jobs
+from .models import StoryboardImageJob, VideoPlanning, VideoPlanningCollaboration, VideoPlanningAIPrompt
 from .ai_prompt_engine import PromptOptimizationService
 
 logger = logging.getLogger(__name__)
@@ -36,6 +38,12 @@ class VideoPlanningCollaborationConsumer(AsyncWebsocketConsumer):
                 await self.close(code=4003)
                 return
             
+            #   (patch    )
+            self.can_edit = await self.check_edit_permission()
+            self.debouncer = collaboration.get_debouncer()
+            collaboration.join(self.planning_id)
+            self.joined = True
+            
             #  
             await self.channel_layer.group_add(
                 self.room_group_name,
@@ -73,6 +81,11 @@ class VideoPlanningCollaborationConsumer(AsyncWebsocketConsumer):
                 self.channel_name
             )
             
+            # Last editor here: save now and free the in-memory values
+            if getattr(self, 'joined', False) and collaboration.leave(self.planning_id):
+                await self.debouncer.flush(self.planning_id)
+                collaboration.forget(self.planning_id)
+            
             #   
             if hasattr(self, 'user') and self.user.is_authenticated:
                 await self.channel_layer.group_send(
@@ -99,6 +112,10 @@ class VideoPlanningCollaborationConsumer(AsyncWebsocketConsumer):
             #   
             if message_type == 'planning_update':
                 await self.handle_planning_update(data)
+            elif message_type == 'planning_patch':
+                await self.handle_planning_patch(data)
+            elif message_type == 'planning_sync':
+                await self.handle_planning_sync(data)
             elif message_type == 'real_time_comment':
                 await self.handle_real_time_comment(data)
             elif message_type == 'cursor_position':
@@ -128,13 +145,16 @@ class VideoPlanningCollaborationConsumer(AsyncWebsocketConsumer):
             field_name = data.get('field_name')
             
             #  
-            can_edit = await self.check_edit_permission()
-            if not can_edit:
+            if not self.can_edit:
                 await self.send_error("  .")
                 return
             
             #  
-            await self.update_planning_content(update_type, field_name, content)
+            version = await self.update_planning_content(update_type, field_name, content)
+            if version is None:
+                await self.send_error("    .")
+                return
+            self.debouncer.schedule(self.planning_id)
             
             #   
             await self.channel_layer.group_send(
@@ -144,6 +164,7 @@ class VideoPlanningCollaborationConsumer(AsyncWebsocketConsumer):
                     'update_type': update_type,
                     'field_name': field_name,
                     'content': content,
+                    'version': version,
                     'updated_by': self.user.username,
                     'updated_by_id': self.user.id,
                     'timestamp': timezone.now().isoformat()
@@ -154,6 +175,80 @@ class VideoPlanningCollaborationConsumer(AsyncWebsocketConsumer):
             logger.error(f"   : {str(e)}")
             await self.send_error("    .")
     
+    async def handle_planning_patch(self, data):
+        """JSON Patch of one field against the version the client has"""
+        field_name = data.get('field_name')
+        client_id = data.get('client_id')
+        if not self.can_edit:
+            await self.send_error("  .")
+            return
+        
+        try:
+            version = await database_sync_to_async(collaboration.apply)(
+                self.planning_id, field_name, data.get('ops'), data.get('version'), self.user.id
+            )
+        except collaboration.PatchConflict as e:
+            await self.send(text_data=json.dumps({
+                'type': 'planning_patch_conflict',
+                'field_name': field_name,
+                'client_id': client_id,
+                'version': e.version,
+                'resync': e.needs_resync,
+                'entries': [] if e.needs_resync else e.entries,
+                'timestamp': timezone.now().isoformat()
+            }))
+            return
+        except collaboration.PatchError as e:
+            await self.send_error(str(e))
+            return
+        except Exception as e:
+            # Lock timeout, database error: the editor stays connected and can resync
+            logger.error(f"Planning patch of {self.planning_id}/{field_name} failed: {str(e)}")
+            await self.send_error("Could not apply the patch, please resync")
+            return
+        
+        self.debouncer.schedule(self.planning_id)
+        await self.send(text_data=json.dumps({
+            'type': 'planning_patch_ack',
+            'field_name': field_name,
+            'client_id': client_id,
+            'version': version,
+            'timestamp': timezone.now().isoformat()
+        }))
+        await self.channel_layer.group_send(
+            self.room_group_name,
+            {
+                'type': 'planning_patched',
+                'field_name': field_name,
+                'ops': data['ops'],
+                'version': version,
+                'updated_by': self.user.username,
+                'updated_by_id': self.user.id,
+                'sender_channel': self.channel_name,
+                'timestamp': timezone.now().isoformat()
+            }
+        )
+    
+    async def handle_planning_sync(self, data):
+        """Current value and version of a field (on join or after a conflict)"""
+        field_name = data.get('field_name')
+        if field_name not in collaboration.PATCH_FIELDS:
+            await self.send_error(f"Field {field_name!r} cannot be patched")
+            return
+        try:
+            version, content = await database_sync_to_async(collaboration.get_field)(self.planning_id, field_name)
+        except Exception as e:
+            logger.error(f"Planning sync of {self.planning_id}/{field_name} failed: {str(e)}")
+            await self.send_error("Could not load the field, please retry")
+            return
+        await self.send(text_data=json.dumps({
+            'type': 'planning_sync',
+            'field_name': field_name,
+            'version': version,
+            'content': content,
+            'timestamp': timezone.now().isoformat()
+        }))
+    
     async def handle_real_time_comment(self, data):
         """ /"""
         try:
@@ -337,6 +432,19 @@ class VideoPlanningCollaborationConsumer(AsyncWebsocketConsumer):
                 'update_type': event['update_type'],
                 'field_name': event['field_name'],
                 'content': event['content'],
+                'version': event['version'],
+                'updated_by': event['updated_by'],
+                'timestamp': event['timestamp']
+            }))
+    
+    async def planning_patched(self, event):
+        """Patch of another connection; the sender already has its ack"""
+        if event['sender_channel'] != self.channel_name:
+            await self.send(text_data=json.dumps({
+                'type': 'planning_patched',
+                'field_name': event['field_name'],
+                'ops': event['ops'],
+                'version': event['version'],
                 'updated_by': event['updated_by'],
                 'timestamp': event['timestamp']
             }))
@@ -483,35 +591,15 @@ class VideoPlanningCollaborationConsumer(AsyncWebsocketConsumer):
     
     @database_sync_to_async
     def update_planning_content(self, update_type, field_name, content):
-        """  """
+        """  (  );   None"""
         try:
-            planning = VideoPlanning.objects.get(id=self.planning_id)
-            
-            if update_type == 'story':
-                if field_name == 'selected_story':
-                    planning.selected_story = content
-                elif field_name == 'stories':
-                    planning.stories = content
-            elif update_type == 'scene':
-                if field_name == 'selected_scene':
-                    planning.selected_scene = content
-                elif field_name == 'scenes':
-                    planning.scenes = content
-            elif update_type == 'shot':
-                if field_name == 'selected_shot':
-                    planning.selected_shot = content
-                elif field_name == 'shots':
-                    planning.shots = content
-            elif update_type == 'storyboard':
-                if field_name == 'storyboards':
-                    planning.storyboards = content
-            
-            planning.save()
-            return True
-            
+            version = collaboration.apply(
+                self.planning_id, field_name, [{'op': 'replace', 'path': '', 'value': content}], user_id=self.user.id
+            )
         except Exception as e:
             logger.error(f"   : {str(e)}")
-            return False
+            return None
+        return version
     
     @database_sync_to_async
     def save_real_time_comment(self, comment_text, target_section, position_data):
@@ -730,4 +818,42 @@ class VideoPlanningNotificationConsumer(AsyncWebsocketConsumer):
             'prompt_type': event['prompt_type'],
             'result_summary': event['result_summary'],
             'timestamp': event['timestamp']
-        }))
\ No newline at end of file
+        }))
+
+
+class StoryboardImageJobConsumer(AsyncWebsocketConsumer):
+    """Pushes image_jobs updates of one storyboard image job to its owner"""
+
+    async def connect(self):
+        self.job_id = self.scope['url_route']['kwargs']['job_id']
+        self.user = self.scope["user"]
+        if not self.user.is_authenticated:
+            await self.close(code=4001)
+            return
+
+        payload = await self.job_payload()
+        if payload is None:
+            await self.close(code=4003)
+            return
+
+        self.job_group_name = image_jobs.group_name(self.job_id)
+        await self.channel_layer.group_add(self.job_group_name, self.channel_name)
+        await self.accept()
+
+        # Current state first, so a late subscriber does not wait for the next frame
+        await self.send(text_data=json.dumps({"result": payload}))
+
+    async def disconnect(self, close_code):
+        if hasattr(self, 'job_group_name'):
+            await self.channel_layer.group_discard(self.job_group_name, self.channel_name)
+
+    @database_sync_to_async
+    def job_payload(self):
+        try:
+            job = StoryboardImageJob.objects.get(id=self.job_id, user=self.user)
+        except (StoryboardImageJob.DoesNotExist, ValidationError):
+            return None
+        return image_jobs.job_payload(job)
+
+    async def storyboard_images(self, event):
+        await self.send(text_data=json.dumps({"result": event["job"]}))
@@ -12,4 +12,8 @@ websocket_urlpatterns = [
     #   WebSocket
     re_path(r'ws/notifications/$', 
             websocket_consumers.VideoPlanningNotificationConsumer.as_asgi()),
-]
\ No newline at end of file
+
+    # Storyboard image job progress (image_jobs)
+    re_path(r'ws/storyboard-images/(?P<job_id>[0-9a-f-]+)/$',
+            websocket_consumers.StoryboardImageJobConsumer.as_asgi()),
+]